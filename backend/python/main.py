@@ -1,7 +1,14 @@
 import asyncio
 import logging
 
-from src.config.logging_config import setup_logging
+try:
+    import uvloop
+except ImportError:
+    # uvloopが使えない環境（Windowsなど）では標準のイベントループを使用する
+    uvloop = None
+
+from src.config.logging_config import setup_logging  # protobufより先に読み込む
+from google.protobuf.internal import api_implementation
 from src.grpc_server import start_grpc_server
 from src.web_api import WebAPI
 
@@ -9,6 +16,9 @@ from src.web_api import WebAPI
 setup_logging()
 logger = logging.getLogger(__name__)
 
+if api_implementation.Type() == "python":
+    logger.warning("protobuf is running with the pure-Python implementation")
+
 
 async def main():
     try:
@@ -31,4 +41,7 @@ async def main():
 
 
 if __name__ == "__main__":
+    # gRPCサーバーとWebサーバーの両方でlibuvベースの高速なイベントループを使用する
+    if uvloop is not None:
+        uvloop.install()
     asyncio.run(main())
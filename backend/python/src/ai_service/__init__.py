@@ -4,7 +4,7 @@ from typing import Optional, List
 from enum import Enum
 import logging
 
-from src.ai_service.api_keys import API_KEYS
+from src.ai_service.api_keys import get_api_keys
 from src.ai_service.services.open_ai import OpenAIService, OpenAIModel
 from src.ai_service.services.google_ai import GoogleAIService, GoogleAIModel
 from src.ai_service.services.anthropic_ai import AnthropicAIService, AnthropicModel
@@ -33,23 +33,23 @@ async def create_ai_service(service_type: AIServiceType, models: Optional[List[E
     """
     try:
         if service_type == AIServiceType.OPENAI:
-            api_key = API_KEYS.get('OPENAI_API_KEY')
+            api_key = get_api_keys().get('OPENAI_API_KEY')
             return await OpenAIService.create_with_models(api_key, models)
 
         elif service_type == AIServiceType.GOOGLEAI:
-            api_key = API_KEYS.get('GOOGLE_API_KEY')
+            api_key = get_api_keys().get('GOOGLE_API_KEY')
             return await GoogleAIService.create_with_models(api_key, models)
 
         elif service_type == AIServiceType.ANTHROPIC:
-            api_key = API_KEYS.get('ANTHROPIC_API_KEY')
+            api_key = get_api_keys().get('ANTHROPIC_API_KEY')
             return await AnthropicAIService.create_with_models(api_key, models)
 
         elif service_type == AIServiceType.MISTRAL:
-            api_key = API_KEYS.get('MISTRAL_API_KEY')
+            api_key = get_api_keys().get('MISTRAL_API_KEY')
             return await MistralAIService.create_with_models(api_key, models)
 
     except ValueError as e:
-        logger.error(f"Failed to initialize {service_type.value}: {str(e)}")
+        logger.error("Failed to initialize %s: %s", service_type.value, e)
         return None
 
     return None
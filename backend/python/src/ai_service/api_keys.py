@@ -1,27 +1,38 @@
 # src/ai_service/api_keys.py
 
 import os
+from functools import lru_cache
 from pathlib import Path
+from typing import Dict
 
+SECRETS_DIR = Path("/app/secrets")
+SECRETS_PATH = SECRETS_DIR / ".api_keys"
 
-def load_api_keys():
-    """ API keysを読み込む """
-    keys = {}
-
-    secrets_path = Path("/app/secrets/.api_keys")
 
-    if secrets_path.exists():
-        with open(secrets_path, "r") as f:
-            for line in f:
-                if "=" in line:
-                    key, value = line.strip().split("=", 1)
-                    keys[key] = value
-    else:
-        if Path("/app/secrets").exists():
+def load_api_keys() -> Dict[str, str]:
+    """ API keysを読み込む """
+    try:
+        # ファイル全体を一度で読み込み、まとめてデコードしてから解析する
+        data = SECRETS_PATH.read_bytes().decode()
+    except FileNotFoundError:
+        if SECRETS_DIR.exists():
             print("Contents of /app/secrets:")
-            print(os.listdir("/app/secrets"))
+            print(os.listdir(SECRETS_DIR))
+        return {}
 
+    keys = {}
+    for line in data.splitlines():
+        key, sep, value = line.strip().partition("=")
+        if sep:
+            keys[key] = value
     return keys
 
 
-API_KEYS = load_api_keys()
+@lru_cache(maxsize=1)
+def get_api_keys() -> Dict[str, str]:
+    """ API keysを取得する（初回呼び出し時のみファイルを読み込み、以降はキャッシュを返す）
+
+    Returns:
+        Dict[str, str]: APIキー名と値の辞書
+    """
+    return load_api_keys()
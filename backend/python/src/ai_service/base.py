@@ -1,24 +1,142 @@
 # src/ai_service/base.py
 
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from dataclasses import asdict
+from enum import Enum
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable, Generic, TypeVar
+import asyncio
+import os
+import random
 import time
 import uuid
 import traceback
 import logging
 
+import httpx
+
 from src.proto.drawing_pb2 import DrawingData, ShapeRecognitionServer
 from src.database.repositories.results_repository import ResultsRepository
 from src.database.repositories.result_details_repository import ResultDetailsRepository
 from src.database.repositories.error_logs_repository import ErrorLogsRepository
-from src.ai_service.prompt_manager import PromptManager
+from src.database.batch_writer import BatchWriter
+from src.ai_service import prompt_manager
+from src.ai_service.batch import BatchProcessor
+from src.ai_service.llm_cache import LLMCache, make_cache_key
+from src.ai_service.resilience import CircuitBreaker, call_with_retry
 
 logger = logging.getLogger(__name__)
 
+# 結果ID・エラーID生成用の乱数生成器
+# IDごとにos.urandom（システムコール）を呼ばないよう、プロセスごとに一度だけシードする。
+# 暗号学的な強度はないため、内部の識別子以外には使用しないこと
+_id_random = random.Random(os.urandom(32))
+if hasattr(os, "register_at_fork"):
+    # fork後の子プロセスで同じIDが生成されないよう再シードする
+    os.register_at_fork(after_in_child=lambda: _id_random.seed(os.urandom(32)))
+
+
+def _fast_uuid4() -> str:
+    """ UUID v4形式のIDを生成
+
+    Returns:
+        str: UUID文字列
+    """
+    return str(uuid.UUID(int=_id_random.getrandbits(128), version=4))
+
+
+# AIクライアントのHTTP接続プールの上限
+HTTP_MAX_CONNECTIONS = 64
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 32
+
+C = TypeVar("C")
+
+
+def pooled_http_client() -> httpx.AsyncClient:
+    """ 接続数の上限を設定したAIクライアント用のHTTPクライアントを作成
+
+    Returns:
+        httpx.AsyncClient: HTTPクライアント
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        )
+    )
+
+
+class ClientCache(Generic[C]):
+    """ APIキーごとにAIクライアントを共有するキャッシュ（接続プールを再利用し、TLSハンドシェイクを減らす） """
+
+    # 作成されたすべてのキャッシュ（close_allでまとめて閉じる）
+    _instances: List["ClientCache"] = []
+
+    def __init__(
+        self,
+        factory: Callable[[str], C],
+        close: Callable[[C], Awaitable[None]] = lambda client: client.close(),
+    ):
+        """
+        Args:
+            factory (Callable[[str], C]): APIキーからクライアントを作成する関数
+            close (Callable[[C], Awaitable[None]]): クライアントの接続を閉じるコルーチン関数
+        """
+        self._factory = factory
+        self._close = close
+        self._clients: Dict[str, C] = {}
+        ClientCache._instances.append(self)
+
+    def get(self, api_key: str) -> C:
+        """ APIキーに対応する共有クライアントを取得（未作成の場合は作成）
+
+        Args:
+            api_key (str): APIキー
+        Returns:
+            C: クライアント
+        """
+        client = self._clients.get(api_key)
+        if client is None:
+            client = self._factory(api_key)
+            self._clients[api_key] = client
+        return client
+
+    async def close(self) -> None:
+        """ 共有クライアントの接続をすべて閉じる """
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await self._close(client)
+
+    @classmethod
+    async def close_all(cls) -> None:
+        """ すべてのキャッシュの共有クライアントの接続を閉じる """
+        await asyncio.gather(*(cache.close() for cache in cls._instances))
+
+
+_JSON_FENCE = "```json"
+_FENCE = "```"
+
+
+def extract_json_text(response: str) -> str:
+    """ レスポンスからJSON部分を取り出す
+    ```json ... ``` のコードブロックがあればその中身を、なければ全体を返す
+
+    Args:
+        response (str): AIのレスポンス
+    Returns:
+        str: JSON文字列
+    """
+    # レスポンス全体をstrip()でコピーせず、元の文字列上でフェンスを探して切り出した部分だけを整形する
+    start = response.find(_JSON_FENCE)
+    if start < 0:
+        return response.strip()
+    start += len(_JSON_FENCE)
+    end = response.find(_FENCE, start)
+    return response[start:end if end >= 0 else None].strip()
+
 
 class AIService(ABC):
     api_key: str
-    prompt_manager: PromptManager
     results_repository: ResultsRepository
     result_details_repository: ResultDetailsRepository
     error_logs_repository: ErrorLogsRepository
@@ -27,12 +145,58 @@ class AIService(ABC):
     async def create(cls, api_key: str):
         self = cls.__new__(cls)
         self.api_key = api_key
-        self.prompt_manager = PromptManager()
         self.results_repository = ResultsRepository()
         self.result_details_repository = ResultDetailsRepository()
         self.error_logs_repository = ErrorLogsRepository()
+        # 結果・エラーログはレスポンスを待たせないよう、キューに溜めてまとめて書き込む
+        self._result_writer = BatchWriter("result", self._write_results)
+        self._error_log_writer = BatchWriter(
+            "error log", self.error_logs_repository.insert_error_logs
+        )
+        # Trueの場合はキューを使わず、呼び出し元のコンテキスト（トランザクション）内で直接保存する
+        self.write_through = False
+        self._shape_index_source = None
+        self._shape_index = {}
+        self._system_prompt_source = None
+        self._system_prompt = ""
+        self.response_cache = LLMCache()
+        self._breakers: Dict[Enum, CircuitBreaker] = {}
+        # AI APIへの同時リクエスト数と1秒あたりのリクエスト数を制限する（再試行も1回として数える）
+        self.request_limiter = BatchProcessor(
+            max_concurrency=int(os.getenv("AI_MAX_CONCURRENCY", "10")),
+            rate_limit=float(os.getenv("AI_RATE_LIMIT", "100")),
+        )
         return self
 
+    def _get_system_prompt(self, shape_infos: List[Dict[str, str]]) -> str:
+        """ システムプロンプトを取得
+        同じリストが渡された場合は前回生成したプロンプトを再利用する
+
+        Args:
+            shape_infos (List[Dict[str, str]]): 形状情報
+        Returns:
+            str: システムプロンプト
+        """
+        if shape_infos is not self._system_prompt_source:
+            self._system_prompt = prompt_manager.create_system_prompt(shape_infos)
+            self._system_prompt_source = shape_infos
+        return self._system_prompt
+
+    def _get_shape_index(self, shape_infos: List[Dict[str, str]]) -> Dict[str, Dict[str, str]]:
+        """ shape_idをキーとした形状情報の辞書を取得
+        同じリストが渡された場合は前回構築した辞書を再利用する
+
+        Args:
+            shape_infos (List[Dict[str, str]]): 形状情報
+        Returns:
+            Dict[str, Dict[str, str]]: shape_idと形状情報の辞書
+        """
+        # 元のリストへの参照を保持して比較するため、idの再利用による誤判定は起きない
+        if shape_infos is not self._shape_index_source:
+            self._shape_index = {s["shape_id"]: s for s in shape_infos}
+            self._shape_index_source = shape_infos
+        return self._shape_index
+
     def prepare_prompt(
         self, drawing: DrawingData, shape_infos: List[Dict[str, str]], lang: str = "ja"
     ) -> Dict[str, str]:
@@ -45,10 +209,10 @@ class AIService(ABC):
         Returns:
             Dict[str, str]: システムプロンプトとユーザープロンプト
         """
-        drawing_info = self.prompt_manager.prepare_drawing_info(drawing)
+        drawing_info = prompt_manager.prepare_drawing_info(drawing)
         return {
-            "system": self.prompt_manager.create_system_prompt(shape_infos, lang),
-            "user": self.prompt_manager.create_data_prompt(drawing_info),
+            "system": prompt_manager.create_system_prompt(shape_infos, lang),
+            "user": prompt_manager.create_data_prompt(drawing_info),
         }
 
     @abstractmethod
@@ -63,6 +227,90 @@ class AIService(ABC):
         """
         pass
 
+    async def call_ai_api_cached(self, system_prompt: str, user_prompt: str) -> Optional[str]:
+        """ 同じプロンプト・モデル設定のレスポンスはキャッシュから返し、それ以外はAI APIを呼び出す
+
+        Args:
+            system_prompt (str): システムプロンプト
+            user_prompt (str): ユーザープロンプト
+        Returns:
+            Optional[str]: APIのレスポンス
+        """
+        if not self.models:
+            return await self.call_ai_api(system_prompt, user_prompt)
+
+        key = make_cache_key({
+            "service": type(self).__name__,
+            "models": [
+                [model.value, asdict(self.model_configs[model])]
+                for model in self.models
+                if model in self.model_configs
+            ],
+            "system": system_prompt,
+            "user": user_prompt,
+        })
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            self.current_model, response = cached
+            return response
+
+        response = await self.call_ai_api(system_prompt, user_prompt)
+        if response:
+            self.response_cache.set(key, (self.current_model, response))
+        return response
+
+    async def _call_models_concurrently(
+        self, call_model: Callable[[Enum, Any], Awaitable[Optional[str]]]
+    ) -> Optional[str]:
+        """ 設定された全モデルを同時に呼び出し、最初に成功したレスポンスを返す
+
+        モデルを順番にフォールバックすると待ち時間が各モデルの合計になるため、
+        全モデルを並行して呼び出し、最初に得られたレスポンスを採用して残りはキャンセルする
+        各モデルは一時的なエラー（429・5xx・接続エラー）の場合のみ指数バックオフで再試行する
+        API呼び出しは1回ごと（再試行を含む）にrequest_limiterの同時実行数とレート制限の範囲内で実行する
+
+        Args:
+            call_model (Callable[[Enum, Any], Awaitable[Optional[str]]]): モデルとその設定を受け取り、
+                レスポンスを返すコルーチン関数
+        Returns:
+            Optional[str]: 最初に成功したレスポンス（全モデルが失敗した場合はNone）
+        """
+        tasks: Dict[asyncio.Task, Enum] = {}
+        for model in self.models:
+            config = self.model_configs.get(model)
+            if not config:
+                continue
+            # 連続して失敗しているモデルは一定時間呼び出さない
+            breaker = self._breakers.setdefault(model, CircuitBreaker())
+            if not breaker.allow():
+                logger.warning("Skipping model %s: circuit open", model.value)
+                continue
+            task = asyncio.create_task(call_with_retry(
+                lambda model=model, config=config: self.request_limiter.run(call_model, model, config),
+                breaker,
+            ))
+            tasks[task] = model
+
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # 同時に完了した場合はモデルリストの順番を優先
+                for task in [t for t in tasks if t in done]:
+                    model = tasks[task]
+                    try:
+                        response = task.result()
+                    except Exception as e:
+                        logger.error("Error with model %s: %s", model.value, e)
+                        continue
+                    if response:
+                        self.current_model = model
+                        return response
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+
     @property
     @abstractmethod
     def model_name(self) -> str:
@@ -92,16 +340,16 @@ class AIService(ABC):
         例外が発生した場合は、エラーメッセージを含むShapeRecognitionServerを返す
         """
         start_time = time.time()
-        result_id = str(uuid.uuid4())
+        result_id = _fast_uuid4()
 
         try:
             # 描画情報と特徴量を含めてプロンプトを準備
-            drawing_info = self.prompt_manager.prepare_drawing_info(drawing, features)
-            system_prompt = self.prompt_manager.create_system_prompt(shape_infos)
-            user_prompt = self.prompt_manager.create_data_prompt(drawing_info)
+            drawing_info = prompt_manager.prepare_drawing_info(drawing, features)
+            system_prompt = self._get_system_prompt(shape_infos)
+            user_prompt = prompt_manager.create_data_prompt(drawing_info)
 
             # AI APIを呼び出し
-            response = await self.call_ai_api(system_prompt, user_prompt)
+            response = await self.call_ai_api_cached(system_prompt, user_prompt)
             if not response:
                 return self.create_error_response("No response from AI service")
 
@@ -110,15 +358,64 @@ class AIService(ABC):
             if not result:
                 return self.create_error_response("Failed to parse response")
 
-            # 結果をデータベースに保存
-            await self.results_repository.insert_result({
+            # 結果の保存はレスポンスを待たせないようキュー経由でまとめて実行
+            await self._enqueue_result(
+                result_id,
+                drawing,
+                result,
+                response,
+                int((time.time() - start_time) * 1000),
+            )
+
+            return result
+
+        except Exception as e:
+            error_id = _fast_uuid4()
+            # エラーログの保存を待たずにエラーレスポンスを返す
+            # キューが満杯の場合はエラーログを失わないよう、その場でデータベースに保存する
+            error_log = {
+                "error_id": error_id,
+                "result_id": result_id,
+                "drawing_id": drawing.drawing_id,
+                "scene_id": drawing.scene_id,
+                "error_type": type(e).__name__,
+                "error_message": str(e),
+                "stack_trace": traceback.format_exc(),
+            }
+            if self.write_through or not self._error_log_writer.put(error_log):
+                try:
+                    await self.error_logs_repository.insert_error_logs([error_log])
+                except Exception as log_error:
+                    logger.error("Error saving error log: %s", log_error)
+            logger.error("Error in recognize_shape: %s", e)
+            return self.create_error_response(str(e), error_id)
+
+    async def _enqueue_result(
+        self,
+        result_id: str,
+        drawing: DrawingData,
+        result: ShapeRecognitionServer,
+        response: str,
+        process_time_ms: int,
+    ) -> None:
+        """ 判定結果を書き込みキューに追加
+        キューが満杯の場合は結果を失わないよう、その場でデータベースに保存する
+
+        Args:
+            result_id (str): 結果ID
+            drawing (DrawingData): 描画データ
+            result (ShapeRecognitionServer): AI判定結果
+            response (str): APIのレスポンス
+            process_time_ms (int): 処理時間（ミリ秒）
+        """
+        item = (
+            {
                 "result_id": result_id,
                 "drawing_id": drawing.drawing_id,
                 "shape_id": result.shape_id,
                 "success": True
-            })
-
-            await self.result_details_repository.insert_detail({
+            },
+            {
                 "result_id": result_id,
                 "drawing_id": drawing.drawing_id,
                 "scene_id": drawing.scene_id,
@@ -126,28 +423,31 @@ class AIService(ABC):
                 "success": True,
                 "score": result.score,
                 "reasoning": result.reasoning,
-                "process_time_ms": int((time.time() - start_time) * 1000),
+                "process_time_ms": process_time_ms,
                 "model_name": self.model_name,
                 "api_response": response,
                 "error_message": "",
                 "client_id": drawing.client_id
-            })
+            },
+        )
+        if self.write_through or not self._result_writer.put(item):
+            await self._write_results([item])
 
-            return result
+    async def close(self) -> None:
+        """ キューに溜まった判定結果とエラーログをすべてデータベースに保存する
+        """
+        await asyncio.gather(self._result_writer.aclose(), self._error_log_writer.aclose())
 
-        except Exception as e:
-            error_id = str(uuid.uuid4())
-            await self.error_logs_repository.insert_error_log({
-                "error_id": error_id,
-                "result_id": result_id,
-                "drawing_id": drawing.drawing_id,
-                "scene_id": drawing.scene_id,
-                "error_type": type(e).__name__,
-                "error_message": str(e),
-                "stack_trace": traceback.format_exc(),
-            })
-            logger.error(f"Error in recognize_shape: {e}")
-            return self.create_error_response(str(e), error_id)
+    async def _write_results(self, items: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> None:
+        """ 溜まった判定結果をまとめてデータベースに保存
+
+        result_detailsはresultsを外部キーで参照するため、resultsを先に挿入する
+
+        Args:
+            items (List[Tuple[Dict[str, Any], Dict[str, Any]]]): resultsとresult_detailsのデータの組
+        """
+        await self.results_repository.insert_results([result for result, _ in items])
+        await self.result_details_repository.insert_details([detail for _, detail in items])
 
     @abstractmethod
     async def parse_response(
@@ -177,6 +477,6 @@ class AIService(ABC):
         """
         return ShapeRecognitionServer(
             success=False,
-            result_id=error_id if error_id else str(uuid.uuid4()),
+            result_id=error_id if error_id else _fast_uuid4(),
             error_message=message
         )
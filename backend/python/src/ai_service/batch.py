@@ -0,0 +1,63 @@
+# src/ai_service/batch.py
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Iterable, List, TypeVar
+
+T = TypeVar("T")
+
+
+class BatchProcessor:
+    """ AI APIの呼び出しを同時実行数とレート制限の範囲内で実行するクラス """
+
+    def __init__(self, max_concurrency: int = 10, rate_limit: float = 100):
+        """
+        Args:
+            max_concurrency (int): 同時に実行する呼び出しの上限
+            rate_limit (float): 1秒あたりの呼び出し回数の上限
+        """
+        self.max_concurrency = max_concurrency
+        self.rate_limit = rate_limit
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # トークンバケット（上限まで溜まったトークンを1呼び出しごとに1つ消費する）
+        self._tokens = float(rate_limit)
+        self._updated_at = time.monotonic()
+
+    async def _acquire_token(self) -> None:
+        """ レート制限のトークンを1つ取得（不足している場合は補充されるまで待機） """
+        while True:
+            now = time.monotonic()
+            self._tokens = min(
+                self.rate_limit, self._tokens + (now - self._updated_at) * self.rate_limit
+            )
+            self._updated_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate_limit)
+
+    async def run(self, task: Callable[..., Awaitable[T]], *args: Any) -> T:
+        """ 同時実行数とレート制限の範囲内で1件の呼び出しを実行
+
+        Args:
+            task (Callable[..., Awaitable[T]]): 実行するコルーチン関数
+            *args: コルーチン関数に渡す引数
+        Returns:
+            T: コルーチン関数の戻り値
+        """
+        async with self._semaphore:
+            await self._acquire_token()
+            return await task(*args)
+
+    async def run_batch(self, task: Callable[[Any], Awaitable[T]], inputs: Iterable[Any]) -> List[Any]:
+        """ 複数の入力をまとめて並行実行
+
+        Args:
+            task (Callable[[Any], Awaitable[T]]): 各入力に対して実行するコルーチン関数
+            inputs (Iterable[Any]): 入力のリスト
+        Returns:
+            List[Any]: 入力と同じ順番の結果のリスト（失敗した入力は例外オブジェクト）
+        """
+        return await asyncio.gather(
+            *(self.run(task, item) for item in inputs), return_exceptions=True
+        )
@@ -0,0 +1,31 @@
+# src/ai_service/llm_cache.py
+
+import hashlib
+from typing import Any, Dict
+
+import orjson
+
+from src.utils.ttl_cache import TTLCache
+
+
+def make_cache_key(payload: Dict[str, Any]) -> str:
+    """ キャッシュキーを生成
+
+    Args:
+        payload (Dict[str, Any]): キーに含める値（モデル・プロンプト・設定）
+    Returns:
+        str: SHA-256のハッシュ文字列
+    """
+    return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+class LLMCache(TTLCache):
+    """ AIのレスポンスをキャッシュするクラス（TTL付きのLRU） """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        """
+        Args:
+            maxsize (int): 保持する最大件数
+            ttl (float): 有効期限（秒）
+        """
+        super().__init__(maxsize=maxsize, ttl=ttl)
@@ -1,73 +1,55 @@
 # src/ai_service/prompt_manager.py
 
-from typing import List, Dict, Any
+from functools import lru_cache
+from typing import List, Dict, Any, Tuple
 from src.proto.drawing_pb2 import DrawingData
-
-
-class PromptManager:
-    @staticmethod
-    def prepare_drawing_info(drawing: DrawingData, features: Dict[str, Any]) -> Dict[str, Any]:
-        """描画データの情報を整形
-
-        Args:
-            drawing (DrawingData): 描画データ
-            features (Dict[str, Any]): 特徴量
-        Returns:
-            Dict[str, Any]: 描画データの情
-        """
-        drawing_info = {
-            "draw_lines": [
-                {
-                    "positions": [[pos.x, pos.y, pos.z] for pos in line.positions],
-                    "width": line.width,
-                    "color": (
-                        f"#{int(line.color.r*255):02x}{int(line.color.g*255):02x}{int(line.color.b*255):02x}"
-                        if line.color
-                        else None
-                    ),
-                }
-                for line in drawing.draw_lines
-            ],
-            "center": {"x": drawing.center.x, "y": drawing.center.y, "z": drawing.center.z},
-        }
-
-        global_features = features.get("global_features", {})
-        drawing_info.update(
-            {
-                "total_strokes": global_features.get("total_strokes", 0),
-                "total_points": global_features.get("total_points", 0),
-                "features": {
-                    "global": features.get("global_features", {}),
-                    "strokes": features.get("strokes", []),
-                },
-            }
-        )
-
-        return drawing_info
-
-    @staticmethod
-    def create_system_prompt(shape_infos: List[Dict[str, str]]) -> str:
-        """システムプロンプトを作成（英語リクエスト & 日本語レスポンス）
-
-        Args:
-            shape_infos (List[Dict[str, str]]): 形状情報
-        Returns:
-            str: システムプロンプト
-        """
-        shape_list = [shape["shape_id"] for shape in shape_infos]
-        shapes_desc = [
-            f"{shape['shape_id']}: {shape['name_en']} - {shape['description_en']}"
-            for shape in shape_infos
-        ]
-
-        # 負例の説明を維持
-        negative_examples = [
-            f"Note: {shape['negative_examples']['en']} are NOT {shape['name_en']}s "
-            + f"and should score below {shape['negative_examples']['score_threshold']}%"
-            for shape in shape_infos
-        ]
-
-        return f"""You are an AI for shape recognition in a 3D VR application.
+from src.features.feature_extractor import positions_to_array
+
+# (shape_id, name_en, description_en, 負例(en), 負例のスコア閾値)
+ShapeKey = Tuple[str, str, str, str, Any]
+
+
+def _shape_key(shape: Dict[str, Any]) -> ShapeKey:
+    """形状情報からシステムプロンプトのキャッシュキーを作成
+
+    Args:
+        shape (Dict[str, Any]): 形状情報
+    Returns:
+        ShapeKey: プロンプトの生成に必要な値のみを持つハッシュ可能なタプル
+    """
+    negative_examples = shape["negative_examples"]
+    return (
+        shape["shape_id"],
+        shape["name_en"],
+        shape["description_en"],
+        str(negative_examples["en"]),
+        negative_examples["score_threshold"],
+    )
+
+
+@lru_cache(maxsize=64)
+def _build_system_prompt(shape_keys: Tuple[ShapeKey, ...]) -> str:
+    """システムプロンプトを生成（同じ形状の組み合わせではキャッシュを返す）
+
+    Args:
+        shape_keys (Tuple[ShapeKey, ...]): 形状情報のキャッシュキー
+    Returns:
+        str: システムプロンプト
+    """
+    shape_list = [shape_id for shape_id, *_ in shape_keys]
+    shapes_desc = [
+        f"{shape_id}: {name_en} - {description_en}"
+        for shape_id, name_en, description_en, _, _ in shape_keys
+    ]
+
+    # 負例の説明を維持
+    negative_examples = [
+        f"Note: {negative_en} are NOT {name_en}s "
+        + f"and should score below {score_threshold}%"
+        for _, name_en, _, negative_en, score_threshold in shape_keys
+    ]
+
+    return f"""You are an AI for shape recognition in a 3D VR application.
 Identify which of the following shapes the user has drawn in space:
 {", ".join(shapes_desc)}
 
@@ -85,40 +67,121 @@ Notes:
     Choose only one shape_id from the provided list: [{", ".join(shape_list)}].
     Score represents confidence level (higher = more confident).
     Score must be between 0-100 (Do not exceed this range).
-    If the shape resembles a negative example, assign a score below {shape_infos[0]['negative_examples']['score_threshold']}%.
+    If the shape resembles a negative example, assign a score below {shape_keys[0][4]}%.
     Keep the reason concise (one sentence).
     Ensure response is fully in Japanese only.
     Strictly follow the exact JSON format.
     Do not create new shape IDs.
 """
 
-    @staticmethod
-    def create_data_prompt(drawing_info: Dict[str, Any]) -> str:
-        """描画データのプロンプトを作成（英語）
 
-        Args:
-            drawing_info (Dict[str, Any]): 描画データの情報
-        Returns:
-            str: 描画データのプロンプト
-        """
-        global_features = drawing_info["features"]["global"]
-        strokes_info = drawing_info["features"]["strokes"]
-        prompt = f"""Analyze the following drawing data:
+def _color_to_hex(color) -> str:
+    """色情報を#rrggbb形式の文字列に変換
+
+    RGBを1つの整数に詰めてから一度だけフォーマットする
+
+    Args:
+        color: Colorメッセージ（0-1の範囲）
+    Returns:
+        str: #rrggbb形式の色
+    """
+    packed = (int(color.r * 255) << 16) | (int(color.g * 255) << 8) | int(color.b * 255)
+    return f"#{packed:06x}"
+
+
+# 描画データプロンプトの固定部分（リクエスト毎にテンプレートを組み立てない）
+_DATA_PROMPT_HEADER = """Analyze the following drawing data:
 
 Global Features:
-- Total Strokes: {drawing_info['total_strokes']}
-- Total Points: {drawing_info['total_points']}
-- Aspect Ratio: {global_features['aspect_ratio']:.3f}
-- Centroid: x={global_features['centroid']['x']:.3f}, y={global_features['centroid']['y']:.3f}, z={global_features['centroid']['z']:.3f}
+- Total Strokes: {total_strokes}
+- Total Points: {total_points}
+- Aspect Ratio: {aspect_ratio:.3f}
+- Centroid: x={cx:.3f}, y={cy:.3f}, z={cz:.3f}
 
 Stroke Details:"""
-        for i, stroke in enumerate(strokes_info, 1):
-            prompt += f"""
+
+# ストロークごとのプロンプトのテンプレート
+_STROKE_TEMPLATE = """
 Stroke {i}:
-- Point Count: {stroke['points_count']}
-- Bounding Box: width={stroke['bounding_box']['width']:.3f}, height={stroke['bounding_box']['height']:.3f}, depth={stroke['bounding_box']['depth']:.3f}
-- Start Point: x={stroke['start_point']['x']:.3f}, y={stroke['start_point']['y']:.3f}, z={stroke['start_point']['z']:.3f}
-- End Point: x={stroke['end_point']['x']:.3f}, y={stroke['end_point']['y']:.3f}, z={stroke['end_point']['z']:.3f}
-- Total Length: {stroke['total_length']:.3f}
-- Is Closed: {'Yes' if stroke['is_closed'] else 'No'}"""
-        return prompt
+- Point Count: {s[points_count]}
+- Bounding Box: width={s[bounding_box][width]:.3f}, height={s[bounding_box][height]:.3f}, depth={s[bounding_box][depth]:.3f}
+- Start Point: x={s[start_point][x]:.3f}, y={s[start_point][y]:.3f}, z={s[start_point][z]:.3f}
+- End Point: x={s[end_point][x]:.3f}, y={s[end_point][y]:.3f}, z={s[end_point][z]:.3f}
+- Total Length: {s[total_length]:.3f}
+- Is Closed: {closed}"""
+
+
+def prepare_drawing_info(drawing: DrawingData, features: Dict[str, Any]) -> Dict[str, Any]:
+    """描画データの情報を整形
+
+    Args:
+        drawing (DrawingData): 描画データ
+        features (Dict[str, Any]): 特徴量
+    Returns:
+        Dict[str, Any]: 描画データの情
+    """
+    drawing_info = {
+        "draw_lines": [
+            {
+                "positions": positions_to_array(line).tolist(),
+                "width": line.width,
+                "color": _color_to_hex(line.color) if line.color else None,
+            }
+            for line in drawing.draw_lines
+        ],
+        "center": {"x": drawing.center.x, "y": drawing.center.y, "z": drawing.center.z},
+    }
+
+    global_features = features.get("global_features", {})
+    drawing_info.update(
+        {
+            "total_strokes": global_features.get("total_strokes", 0),
+            "total_points": global_features.get("total_points", 0),
+            "features": {
+                "global": features.get("global_features", {}),
+                "strokes": features.get("strokes", []),
+            },
+        }
+    )
+
+    return drawing_info
+
+
+def create_system_prompt(shape_infos: List[Dict[str, str]]) -> str:
+    """システムプロンプトを作成（英語リクエスト & 日本語レスポンス）
+
+    Args:
+        shape_infos (List[Dict[str, str]]): 形状情報
+    Returns:
+        str: システムプロンプト
+    """
+    return _build_system_prompt(tuple(_shape_key(shape) for shape in shape_infos))
+
+
+def create_data_prompt(drawing_info: Dict[str, Any]) -> str:
+    """描画データのプロンプトを作成（英語）
+
+    Args:
+        drawing_info (Dict[str, Any]): 描画データの情報
+    Returns:
+        str: 描画データのプロンプト
+    """
+    global_features = drawing_info["features"]["global"]
+    strokes_info = drawing_info["features"]["strokes"]
+    centroid = global_features["centroid"]
+    parts = [
+        _DATA_PROMPT_HEADER.format(
+            total_strokes=drawing_info["total_strokes"],
+            total_points=drawing_info["total_points"],
+            aspect_ratio=global_features["aspect_ratio"],
+            cx=centroid["x"],
+            cy=centroid["y"],
+            cz=centroid["z"],
+        )
+    ]
+    # 文字列の連結を繰り返さず、ストロークごとの断片をまとめて結合する
+    parts.extend(
+        _STROKE_TEMPLATE.format(i=i, s=stroke, closed="Yes" if stroke["is_closed"] else "No")
+        for i, stroke in enumerate(strokes_info, 1)
+    )
+    return "".join(parts)
@@ -0,0 +1,110 @@
+# src/ai_service/resilience.py
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# リトライの設定（0.3秒から倍々で待機し、最大2秒）
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.3
+RETRY_MAX_DELAY = 2.0
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    """ 例外からHTTPステータスコードを取得（各SDKで属性名が異なる）
+
+    Args:
+        error (BaseException): 例外
+    Returns:
+        Optional[int]: ステータスコード（取得できない場合はNone）
+    """
+    for attr in ("status_code", "http_status", "code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """ 再試行で回復する可能性のあるエラーか判定
+    429・5xx・接続エラー・タイムアウトは再試行し、それ以外の4xxなどは再試行しない
+
+    Args:
+        error (BaseException): 例外
+    Returns:
+        bool: 再試行する場合True
+    """
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = _status_code(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    name = type(error).__name__
+    return "Connection" in name or "Timeout" in name
+
+
+class CircuitBreaker:
+    """ 連続して失敗しているモデルへの呼び出しを一定時間止めるサーキットブレーカー """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        """
+        Args:
+            failure_threshold (int): 呼び出しを止めるまでの連続失敗回数
+            reset_timeout (float): 呼び出しを止める時間（秒）
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        """ 呼び出し可能か判定（停止時間が過ぎた場合は再度試す）
+
+        Returns:
+            bool: 呼び出し可能な場合True
+        """
+        if self.failures < self.failure_threshold:
+            return True
+        return time.monotonic() - self.opened_at >= self.reset_timeout
+
+    def record_success(self) -> None:
+        """ 成功を記録し、失敗回数をリセット """
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        """ 失敗を記録（閾値に達した場合は停止時刻を更新） """
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+async def call_with_retry(call: Callable[[], Awaitable[T]], breaker: CircuitBreaker) -> T:
+    """ 再試行可能なエラーの場合は指数バックオフで再試行しながら呼び出す
+
+    Args:
+        call (Callable[[], Awaitable[T]]): 呼び出すコルーチン関数
+        breaker (CircuitBreaker): 呼び出し先のサーキットブレーカー
+    Returns:
+        T: 呼び出し結果
+    Raises:
+        Exception: 再試行しても失敗した場合、または再試行できないエラーの場合
+    """
+    delay = RETRY_BASE_DELAY
+    for attempt in range(1, RETRY_ATTEMPTS + 1):
+        try:
+            result = await call()
+        except Exception as e:
+            breaker.record_failure()
+            if attempt == RETRY_ATTEMPTS or not is_retryable(e) or not breaker.allow():
+                raise
+            logger.warning("Retrying after error (attempt %s): %s", attempt, e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RETRY_MAX_DELAY)
+        else:
+            breaker.record_success()
+            return result
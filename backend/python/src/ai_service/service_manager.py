@@ -7,8 +7,8 @@ from typing import List, Dict, Any, Optional, Union
 
 from src.proto.drawing_pb2 import ShapeRecognitionServer
 
-from src.ai_service.api_keys import API_KEYS
-from src.ai_service.base import AIService
+from src.ai_service.api_keys import get_api_keys
+from src.ai_service.base import AIService, ClientCache
 from src.ai_service.services.open_ai import OpenAIService, OpenAIModel
 from src.ai_service.services.google_ai import GoogleAIService, GoogleAIModel
 from src.ai_service.services.anthropic_ai import AnthropicAIService, AnthropicModel
@@ -26,34 +26,47 @@ class DrawingGroup(Enum):
 class AIServiceManager:
     """複数のAIサービスを管理するクラス"""
 
-    async def __init__(self):
-        self.services: Dict[DrawingGroup, AIService] = {}
+    def __init__(self, services: Dict[DrawingGroup, AIService]):
+        self.services: Dict[DrawingGroup, AIService] = services
 
-        # Aグループのサービスを初期化（gpt-3.5-turbo-0125）
-        self.services[DrawingGroup.GROUP_A] = await OpenAIService.create_with_models(
-            API_KEYS.get("OPENAI_API_KEY"), [OpenAIModel.GPT35TURBO]
-        )
-
-        # Bグループのサービスを初期化（gemini-1.5-pro）
-        self.services[DrawingGroup.GROUP_B] = await GoogleAIService.create_with_models(
-            API_KEYS.get("GOOGLE_API_KEY"), [GoogleAIModel.GEMINI15_PRO]
-        )
+    @classmethod
+    async def create(cls) -> "AIServiceManager":
+        """ 各グループのAIサービスを並行して初期化し、インスタンスを生成
 
-        # BOTHグループのサービスを初期化（mistral-large-latest）
-        self.services[DrawingGroup.GROUP_BOTH] = await MistralAIService.create_with_models(
-            API_KEYS.get("MISTRAL_API_KEY"), [MistralAIModel.MINISTRAL_LARGE]
+        Returns:
+            AIServiceManager: 初期化済みのインスタンス
+        """
+        api_keys = get_api_keys()
+        service_a, service_b, service_both = await asyncio.gather(
+            # Aグループのサービスを初期化（gpt-3.5-turbo-0125）
+            OpenAIService.create_with_models(
+                api_keys.get("OPENAI_API_KEY"), [OpenAIModel.GPT35TURBO]
+            ),
+            # Bグループのサービスを初期化（gemini-1.5-pro）
+            GoogleAIService.create_with_models(
+                api_keys.get("GOOGLE_API_KEY"), [GoogleAIModel.GEMINI15_PRO]
+            ),
+            # BOTHグループのサービスを初期化（mistral-large-latest）
+            MistralAIService.create_with_models(
+                api_keys.get("MISTRAL_API_KEY"), [MistralAIModel.MINISTRAL_LARGE]
+            ),
         )
+        self = cls({
+            DrawingGroup.GROUP_A: service_a,
+            DrawingGroup.GROUP_B: service_b,
+            DrawingGroup.GROUP_BOTH: service_both,
+        })
 
         logger.info("Initialized services:")
         for group, service in self.services.items():
-            logger.info(f"Group {group.value}: {service.model_name}")
-
-    @classmethod
-    async def create(cls):
-        self = cls.__new__(cls)
-        await self.__init__()
+            logger.info("Group %s: %s", group.value, service.model_name)
         return self
 
+    async def close(self) -> None:
+        """ 各サービスの書き込み待ちの結果を保存し、共有しているAIクライアントの接続を閉じる """
+        await asyncio.gather(*(service.close() for service in self.services.values()))
+        await ClientCache.close_all()
+
     @staticmethod
     def _calculate_point_density(features: Dict[str, Any]) -> float:
         """特徴量からpoint_densityを計算
@@ -97,10 +110,9 @@ class AIServiceManager:
             DrawingGroup: 分類されたグループ
         """
         global_features = features.get("global_features", {})
-        strokes = features.get("strokes", [])
 
         total_points = global_features.get("total_points", 0)
-        total_length = sum(stroke.get("total_length", 0) for stroke in strokes)
+        total_length = global_features.get("total_length", 0)
         point_density = total_points / total_length if total_length > 0 else 0
         total_strokes = global_features.get("total_strokes", 0)
 
@@ -133,16 +145,16 @@ class AIServiceManager:
             # 対応するサービスを取得
             service = self.services.get(group)
             if not service:
-                logger.error(f"No service found for group {group}")
+                logger.error("No service found for group %s", group)
                 return ShapeRecognitionServer(
                     success=False, error_message=f"No AI service configured for group {group.value}"
                 )
 
-            # 単一サービスでの処理
+            # 単一サービスでの処理（AI APIのレート制限は各サービスがAPI呼び出しごとに行う）
             result = await service.recognize_shape(drawing_data, shapes, features)
             return result
         except Exception as e:
-            logger.error(f"Error in process_drawing: {e}")
+            logger.error("Error in process_drawing: %s", e)
             return ShapeRecognitionServer(
                 success=False,
                 error_message=f"Error processing with {group.value} service: {str(e)}",
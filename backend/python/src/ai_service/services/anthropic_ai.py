@@ -1,18 +1,24 @@
 # src/ai_service/services/anthropic_ai.py
 
 import logging
-import json
 from enum import Enum
+from types import MappingProxyType
 from typing import List, Dict, Optional
 from dataclasses import dataclass
 
 from anthropic import AsyncAnthropic
 
-from src.ai_service.base import AIService
+from src.ai_service.base import AIService, ClientCache, extract_json_text, pooled_http_client
 from src.proto.drawing_pb2 import ShapeRecognitionServer
+from src.utils import json_io
 
 logger = logging.getLogger(__name__)
 
+# APIキーごとに共有するクライアント
+_CLIENTS: ClientCache[AsyncAnthropic] = ClientCache(
+    lambda api_key: AsyncAnthropic(api_key=api_key, http_client=pooled_http_client())
+)
+
 
 class AnthropicModel(Enum):
     """Anthropicのモデル"""
@@ -22,7 +28,7 @@ class AnthropicModel(Enum):
     CLAUDE3_OPUS = "claude-3-opus-20240229"
 
 
-@dataclass
+@dataclass(frozen=True)
 class ModelConfig:
     """モデルの設定"""
 
@@ -33,11 +39,11 @@ class ModelConfig:
 
 class AnthropicAIService(AIService):
     """Anthropic AIサービス"""
-    MODELS_CONFIGS = {
+    MODELS_CONFIGS = MappingProxyType({
         AnthropicModel.CLAUDE35_SONNET: ModelConfig(),
         AnthropicModel.CLAUDE35_HAIKU: ModelConfig(),
         AnthropicModel.CLAUDE3_OPUS: ModelConfig(),
-    }
+    })
 
     @classmethod
     async def create(cls, api_key: str):
@@ -70,10 +76,10 @@ class AnthropicAIService(AIService):
             self.models = []
             return self
 
-        self.client = AsyncAnthropic(api_key=self.api_key)
+        self.client = _CLIENTS.get(self.api_key)
         self.enabled = True
         self.models = models
-        self.model_configs = cls.MODELS_CONFIGS.copy()
+        self.model_configs = cls.MODELS_CONFIGS
         return self
 
     @property
@@ -97,27 +103,37 @@ class AnthropicAIService(AIService):
         if not self.enabled:
             return None
 
-        for model in self.models:
-            config = self.model_configs.get(model)
-            if not config:
-                continue
-
-            try:
-                self.current_model = model
-                response = await self.client.messages.create(
-                    model=model.value,
-                    max_tokens=config.max_tokens,
-                    temperature=config.temperature,
-                    system=system_prompt,
-                    messages=[{"role": "user", "content": user_prompt}],
-                )
-                return response.content[0].text
+        # メッセージは全モデルで共通のため一度だけ作成する
+        messages = [{"role": "user", "content": user_prompt}]
+        return await self._call_models_concurrently(
+            lambda model, config: self._call_model(model, config, system_prompt, messages)
+        )
+
+    async def _call_model(
+        self,
+        model: AnthropicModel,
+        config: ModelConfig,
+        system_prompt: str,
+        messages: List[Dict[str, str]],
+    ) -> Optional[str]:
+        """ 単一のモデルでAI APIを呼び出す
 
-            except Exception as e:
-                logger.error(f"Error with model {model.value}: {str(e)}")
-                continue
-
-        return None
+        Args:
+            model (AnthropicModel): 使用するモデル
+            config (ModelConfig): モデルの設定
+            system_prompt (str): システムプロンプト
+            messages (List[Dict[str, str]]): ユーザープロンプトのメッセージ
+        Returns:
+            Optional[str]: AIからのレスポンス
+        """
+        response = await self.client.messages.create(
+            model=model.value,
+            max_tokens=config.max_tokens,
+            temperature=config.temperature,
+            system=system_prompt,
+            messages=messages,
+        )
+        return response.content[0].text
 
     async def parse_response(
         self, response: str, shape_infos: List[Dict[str, str]], result_id: str
@@ -135,12 +151,10 @@ class AnthropicAIService(AIService):
         例外が発生した場合は、エラーメッセージを含むShapeRecognitionServerを返す
         """
         try:
-            json_text = response.strip()
-            if "```json" in json_text:
-                json_text = json_text.split("```json")[1].split("```")[0].strip()
+            json_text = extract_json_text(response)
 
-            result = json.loads(json_text)
-            shape_info = next((s for s in shape_infos if s["shape_id"] == result["shape_id"]), None)
+            result = json_io.loads(json_text)
+            shape_info = self._get_shape_index(shape_infos).get(result["shape_id"])
 
             if not shape_info:
                 raise ValueError(f"Invalid shape ID: {result['shape_id']}")
@@ -152,9 +166,9 @@ class AnthropicAIService(AIService):
                 score=int(result["score"]),
                 reasoning=result["reason"],
                 model_name=self.model_name,
-                api_response=json.dumps(result),
+                api_response=json_text,
             )
 
         except Exception as e:
-            logger.error(f"Error parsing response: {str(e)}")
+            logger.error("Error parsing response: %s", e)
             return self.create_error_response(str(e))
@@ -1,16 +1,16 @@
 # src/ai_service/services/google_ai.py
 
 from enum import Enum
-from typing import List, Dict, Optional
+from types import MappingProxyType
+from typing import Any, List, Dict, Optional
 import logging
-import json
 from dataclasses import dataclass
 
 import google.generativeai as genai
 
-from src.ai_service.api_keys import API_KEYS
 from src.ai_service.base import AIService
 from src.proto.drawing_pb2 import ShapeRecognitionServer
+from src.utils import json_io
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +23,7 @@ class GoogleAIModel(Enum):
     GEMINI15_PRO = "gemini-1.5-pro"
 
 
-@dataclass
+@dataclass(frozen=True)
 class ModelConfig:
     """モデルの設定"""
 
@@ -35,10 +35,21 @@ class ModelConfig:
 class GoogleAIService(AIService):
     """Google AIのサービス"""
 
-    MODELS_CONFIGS = {
+    MODELS_CONFIGS = MappingProxyType({
         GoogleAIModel.GEMINI20_FLASH: ModelConfig(),
         GoogleAIModel.GEMINI15_FLASH: ModelConfig(),
         GoogleAIModel.GEMINI15_PRO: ModelConfig(),
+    })
+
+    # レスポンスのJSONスキーマ（リクエストごとに再生成しないようクラス定数とする）
+    RESPONSE_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "shape_id": {"type": "string"},
+            "score": {"type": "integer"},
+            "reason": {"type": "string"},
+        },
+        "required": ["shape_id", "score", "reason"],
     }
 
     @classmethod
@@ -70,7 +81,18 @@ class GoogleAIService(AIService):
         genai.configure(api_key=self.api_key)
         self.enabled = True
         self.models = models
-        self.model_configs = cls.MODELS_CONFIGS.copy()
+        self._model_instances = {model: genai.GenerativeModel(model.value) for model in models}
+        self.model_configs = cls.MODELS_CONFIGS
+        # 生成設定はモデルごとに固定のため初期化時に一度だけ作成する
+        self._generation_configs = {
+            model: genai.GenerationConfig(
+                temperature=self.model_configs[model].temperature,
+                response_mime_type="application/json",
+                response_schema=cls.RESPONSE_SCHEMA,
+            )
+            for model in models
+            if model in self.model_configs
+        }
         self.current_model = models[0]
         return self
 
@@ -98,47 +120,34 @@ class GoogleAIService(AIService):
         if not self.enabled:
             return None
 
-        for model in self.models:
-            config = self.model_configs.get(model)
-            if not config:
-                continue
-
-            try:
-                self.current_model = model
-                model_instance = genai.GenerativeModel(model.value)
-
-                schema = {
-                    "type": "object",
-                    "properties": {
-                        "shape_id": {"type": "string"},
-                        "score": {"type": "integer"},
-                        "reason": {"type": "string"},
-                    },
-                    "required": ["shape_id", "score", "reason"],
-                }
-
-                response = model_instance.generate_content(
-                    [
-                        {"role": "user", "parts": [system_prompt]},
-                        {"role": "model", "parts": ["了解しました。"]},
-                        {"role": "user", "parts": [user_prompt]},
-                    ],
-                    generation_config=genai.GenerationConfig(
-                        temperature=config.temperature,
-                        response_mime_type="application/json",
-                        response_schema=schema,
-                    ),
-                )
-
-                response_text = response.candidates[0].content.parts[0].text
-                if response_text:
-                    return response_text
-
-            except Exception as e:
-                logger.error(f"Error with model {model.value}: {str(e)}")
-                continue
-
-        return None
+        # 会話内容は全モデルで共通のため一度だけ作成する
+        contents = [
+            {"role": "user", "parts": [system_prompt]},
+            {"role": "model", "parts": ["了解しました。"]},
+            {"role": "user", "parts": [user_prompt]},
+        ]
+        return await self._call_models_concurrently(
+            lambda model, config: self._call_model(model, config, contents)
+        )
+
+    async def _call_model(
+        self, model: GoogleAIModel, config: ModelConfig, contents: List[Dict[str, Any]]
+    ) -> Optional[str]:
+        """単一のモデルでAPIを呼び出す
+
+        Args:
+            model: 使用するモデル
+            config: モデルの設定
+            contents: システムプロンプトとユーザプロンプトを含む会話内容
+        Returns:
+            str: AIからのレスポンス
+        """
+        response = await self._model_instances[model].generate_content_async(
+            contents,
+            generation_config=self._generation_configs[model],
+        )
+
+        return response.candidates[0].content.parts[0].text
 
     async def parse_response(
         self, response: str, shape_infos: List[Dict[str, str]], result_id: str
@@ -156,9 +165,9 @@ class GoogleAIService(AIService):
         """
         try:
             json_text = response.strip()
-            result = json.loads(json_text)
+            result = json_io.loads(json_text)
 
-            shape_info = next((s for s in shape_infos if s["shape_id"] == result["shape_id"]), None)
+            shape_info = self._get_shape_index(shape_infos).get(result["shape_id"])
 
             if not shape_info:
                 raise ValueError(f"Invalid shape ID: {result['shape_id']}")
@@ -170,9 +179,9 @@ class GoogleAIService(AIService):
                 score=int(result["score"]),
                 reasoning=result["reason"],
                 model_name=self.model_name,
-                api_response=json.dumps(result),
+                api_response=json_text,
             )
 
         except Exception as e:
-            logger.error(f"Error parsing response: {str(e)}")
+            logger.error("Error parsing response: %s", e)
             return self.create_error_response(str(e))
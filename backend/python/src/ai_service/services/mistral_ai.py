@@ -1,19 +1,25 @@
 # src/ai_service/services/mistral_ai.py
 
 import logging
-import json
 from enum import Enum
+from types import MappingProxyType
 from typing import List, Dict, Optional
 from dataclasses import dataclass
 
-from mistralai.client import MistralClient
+from mistralai.async_client import MistralAsyncClient
 from mistralai.models.chat_completion import ChatMessage
 
-from src.ai_service.base import AIService
+from src.ai_service.base import AIService, ClientCache, extract_json_text
 from src.proto.drawing_pb2 import ShapeRecognitionServer
+from src.utils import json_io
 
 logger = logging.getLogger(__name__)
 
+# APIキーごとに共有するクライアント
+_CLIENTS: ClientCache[MistralAsyncClient] = ClientCache(
+    lambda api_key: MistralAsyncClient(api_key=api_key)
+)
+
 
 class MistralAIModel(Enum):
     """Mistral AIのモデル"""
@@ -22,7 +28,7 @@ class MistralAIModel(Enum):
     MINISTRAL_8B = "ministral-8b-latest"
 
 
-@dataclass
+@dataclass(frozen=True)
 class ModelConfig:
     """モデルの設定"""
 
@@ -33,10 +39,10 @@ class ModelConfig:
 
 class MistralAIService(AIService):
     """Mistral AIのサービス"""
-    MODELS_CONFIGS = {
+    MODELS_CONFIGS = MappingProxyType({
         MistralAIModel.MINISTRAL_LARGE: ModelConfig(),
         MistralAIModel.MINISTRAL_8B: ModelConfig(),
-    }
+    })
 
     @classmethod
     async def create(cls, api_key: str):
@@ -64,10 +70,10 @@ class MistralAIService(AIService):
             self.models = []
             return self
 
-        self.client = MistralClient(api_key=self.api_key)
+        self.client = _CLIENTS.get(self.api_key)
         self.enabled = True
         self.models = models
-        self.model_configs = cls.MODELS_CONFIGS.copy()
+        self.model_configs = cls.MODELS_CONFIGS
         return self
 
     @property
@@ -95,31 +101,34 @@ class MistralAIService(AIService):
         if not self.enabled:
             return None
 
-        for model in self.models:
-            config = self.model_configs.get(model)
-            if not config:
-                continue
-
-            try:
-                self.current_model = model
-                messages = [
-                    ChatMessage(role="system", content=system_prompt),
-                    ChatMessage(role="user", content=user_prompt),
-                ]
+        # メッセージは全モデルで共通のため一度だけ作成する
+        messages = [
+            ChatMessage(role="system", content=system_prompt),
+            ChatMessage(role="user", content=user_prompt),
+        ]
+        return await self._call_models_concurrently(
+            lambda model, config: self._call_model(model, config, messages)
+        )
 
-                response = await self.client.chat(
-                    model=model.value,
-                    messages=messages,
-                    temperature=config.temperature,
-                    max_tokens=config.max_tokens,
-                )
-                return response.choices[0].message.content
+    async def _call_model(
+        self, model: MistralAIModel, config: ModelConfig, messages: List[ChatMessage]
+    ) -> Optional[str]:
+        """単一のモデルでAI APIを呼び出す
 
-            except Exception as e:
-                logger.error(f"Error with model {model.value}: {str(e)}")
-                continue
-
-        return None
+        Args:
+            model (MistralAIModel): 使用するモデル
+            config (ModelConfig): モデルの設定
+            messages (List[ChatMessage]): システムプロンプトとユーザープロンプトのメッセージ
+        Returns:
+            Optional[str]: AIからのレスポンス
+        """
+        response = await self.client.chat(
+            model=model.value,
+            messages=messages,
+            temperature=config.temperature,
+            max_tokens=config.max_tokens,
+        )
+        return response.choices[0].message.content
 
     async def parse_response(
         self, response: str, shape_infos: List[Dict[str, str]], result_id: str
@@ -137,12 +146,10 @@ class MistralAIService(AIService):
         例外が発生した場合はエラーレスポンスを返す
         """
         try:
-            json_text = response.strip()
-            if "```json" in json_text:
-                json_text = json_text.split("```json")[1].split("```")[0].strip()
+            json_text = extract_json_text(response)
 
-            result = json.loads(json_text)
-            shape_info = next((s for s in shape_infos if s["shape_id"] == result["shape_id"]), None)
+            result = json_io.loads(json_text)
+            shape_info = self._get_shape_index(shape_infos).get(result["shape_id"])
 
             if not shape_info:
                 raise ValueError(f"Invalid shape ID: {result['shape_id']}")
@@ -154,9 +161,9 @@ class MistralAIService(AIService):
                 score=int(result["score"]),
                 reasoning=result["reason"],
                 model_name=self.model_name,
-                api_response=json.dumps(result),
+                api_response=json_text,
             )
 
         except Exception as e:
-            logger.error(f"Error parsing response: {str(e)}")
+            logger.error("Error parsing response: %s", e)
             return self.create_error_response(str(e))
@@ -1,19 +1,24 @@
 # src/ai_service/services/open_ai.py
 
 import logging
-import json
 from enum import Enum
+from types import MappingProxyType
 from typing import List, Dict, Optional
 from dataclasses import dataclass
 
-from openai import OpenAI
+from openai import AsyncOpenAI
 
-from src.ai_service.api_keys import API_KEYS
-from src.ai_service.base import AIService
+from src.ai_service.base import AIService, ClientCache, extract_json_text, pooled_http_client
 from src.proto.drawing_pb2 import ShapeRecognitionServer
+from src.utils import json_io
 
 logger = logging.getLogger(__name__)
 
+# APIキーごとに共有するクライアント
+_CLIENTS: ClientCache[AsyncOpenAI] = ClientCache(
+    lambda api_key: AsyncOpenAI(api_key=api_key, http_client=pooled_http_client())
+)
+
 
 class OpenAIModel(Enum):
     """OpenAIのモデル"""
@@ -24,7 +29,7 @@ class OpenAIModel(Enum):
     GPT35TURBO = "gpt-3.5-turbo-0125"
 
 
-@dataclass
+@dataclass(frozen=True)
 class ModelConfig:
     """モデルの設定"""
 
@@ -35,12 +40,12 @@ class ModelConfig:
 
 class OpenAIService(AIService):
     """OpenAIのサービス"""
-    MODELS_CONFIGS = {
+    MODELS_CONFIGS = MappingProxyType({
         OpenAIModel.GPT4o: ModelConfig(),
         OpenAIModel.GPT4oMINI: ModelConfig(),
         OpenAIModel.GPT4oTURBO: ModelConfig(),
         OpenAIModel.GPT35TURBO: ModelConfig(),
-    }
+    })
 
     @classmethod
     async def create(cls, api_key: str):
@@ -68,10 +73,10 @@ class OpenAIService(AIService):
             self.models = []
             return self
 
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = _CLIENTS.get(self.api_key)
         self.enabled = True
         self.models = models
-        self.model_configs = cls.MODELS_CONFIGS.copy()
+        self.model_configs = cls.MODELS_CONFIGS
         self.current_model = models[0]
         return self
 
@@ -100,29 +105,35 @@ class OpenAIService(AIService):
         if not self.enabled:
             return None
 
-        # 各モデルでAPIを呼び出し、最も確信度の高い結果を返す
-        for model in self.models:
-            config = self.model_configs.get(model)
-            if not config:
-                continue
-            try:
-                self.current_model = model
-                completion = self.client.chat.completions.create(
-                    model=model.value,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt},
-                    ],
-                    max_tokens=config.max_tokens,
-                    temperature=config.temperature,
-                    timeout=config.timeout,
-                )
-                return completion.choices[0].message.content
-
-            except Exception as e:
-                logger.error(f"Error with model {model.value}: {str(e)}")
-                continue
-        return None
+        # メッセージは全モデルで共通のため一度だけ作成する
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+        return await self._call_models_concurrently(
+            lambda model, config: self._call_model(model, config, messages)
+        )
+
+    async def _call_model(
+        self, model: OpenAIModel, config: ModelConfig, messages: List[Dict[str, str]]
+    ) -> Optional[str]:
+        """単一のモデルでAPIを呼び出す
+
+        Args:
+            model: 使用するモデル
+            config: モデルの設定
+            messages: システムプロンプトとユーザプロンプトのメッセージ
+        Returns:
+            str: AIからのレスポンス
+        """
+        completion = await self.client.chat.completions.create(
+            model=model.value,
+            messages=messages,
+            max_tokens=config.max_tokens,
+            temperature=config.temperature,
+            timeout=config.timeout,
+        )
+        return completion.choices[0].message.content
 
     async def parse_response(
         self, response: str, shape_infos: List[Dict[str, str]], result_id: str
@@ -139,13 +150,11 @@ class OpenAIService(AIService):
         例外が発生した場合は、エラーメッセージを含むShapeRecognitionServerを返す
         """
         try:
-            json_text = response.strip()
-            if "```json" in json_text:
-                json_text = json_text.split("```json")[1].split("```")[0].strip()
+            json_text = extract_json_text(response)
 
-            result = json.loads(json_text)
+            result = json_io.loads(json_text)
 
-            shape_info = next((s for s in shape_infos if s["shape_id"] == result["shape_id"]), None)
+            shape_info = self._get_shape_index(shape_infos).get(result["shape_id"])
 
             if not shape_info:
                 raise ValueError(f"Invalid shape ID: {result['shape_id']}")
@@ -157,8 +166,8 @@ class OpenAIService(AIService):
                 score=int(result["score"]),
                 reasoning=result["reason"],
                 model_name=self.model_name,
-                api_response=json.dumps(result),
+                api_response=json_text,
             )
         except Exception as e:
-            logger.error(f"Error parsing response: {str(e)}")
+            logger.error("Error parsing response: %s", e)
             return self.create_error_response(str(e))
@@ -1,17 +1,46 @@
 # src/config/logging_config.py
+import atexit
 import logging
+import os
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+# protobufはC実装（upb）のランタイムを使用する（純Python実装はメッセージの生成・シリアライズが遅い）
+# protobufのimportより前に設定する必要があるため、起動時に最初に読み込まれるこのモジュールで設定する
+os.environ.setdefault("PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION", "upb")
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_listener: Optional[QueueListener] = None
+
+
+def _stop_listener():
+    """ キューに残っているログを出力し、リスナーを停止する """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
 
 
 def setup_logging(log_level=logging.INFO):
+    global _listener
     root = logging.getLogger()
-    if root.handlers:
-        for handler in root.handlers:
-            root.removeHandler(handler)
-
-    logging.basicConfig(
-        level=log_level,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        stream=sys.stdout,  # 明示的にstdoutを指定
-        force=True,  # 既存の設定を上書き
-    )
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    _stop_listener()
+
+    # 出力は別スレッドのリスナーで行い、イベントループのスレッドがstdoutへの書き込みで止まらないようにする
+    stream_handler = logging.StreamHandler(sys.stdout)  # 明示的にstdoutを指定
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(log_level)
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+atexit.register(_stop_listener)
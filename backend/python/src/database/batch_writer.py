@@ -0,0 +1,101 @@
+# src/database/batch_writer.py
+
+import asyncio
+import contextvars
+import logging
+from typing import Any, Awaitable, Callable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# 実行中の書き込みタスク（GCで破棄されないよう参照を保持）
+_writer_tasks: Set[asyncio.Task] = set()
+
+
+class BatchWriter:
+    """ 書き込みデータをキューに溜め、まとめてDBに書き込むクラス
+    呼び出し元はDB書き込みの完了を待たずに処理を続けられる
+    """
+
+    def __init__(
+        self,
+        name: str,
+        write: Callable[[List[Any]], Awaitable[Any]],
+        maxsize: int = 1024,
+        batch_size: int = 64,
+    ):
+        """
+        Args:
+            name (str): ログ出力用の名前
+            write (Callable[[List[Any]], Awaitable[Any]]): まとめた書き込みデータを保存するコルーチン関数
+            maxsize (int): キューに溜められる最大件数
+            batch_size (int): 1回の書き込みでまとめる最大件数
+        """
+        self.name = name
+        self.write = write
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        # キューは作成時のイベントループに紐づくため、ループごとに作成する
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def put(self, item: Any) -> bool:
+        """ 書き込みデータをキューに追加
+        キューが満杯の場合は追加せずFalseを返すため、呼び出し元で直接書き込むなどして対応する
+
+        Args:
+            item (Any): 書き込みデータ
+        Returns:
+            bool: キューに追加できた場合True
+        """
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            self._queue = asyncio.Queue(maxsize=self.maxsize)
+            self._loop = loop
+            # 呼び出し元のコンテキスト（トランザクション中の接続など）を引き継がないよう、
+            # 書き込みタスクは空のコンテキストで開始する
+            task = contextvars.Context().run(loop.create_task, self._consume(self._queue))
+            self._task = task
+            _writer_tasks.add(task)
+            task.add_done_callback(_writer_tasks.discard)
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            logger.warning("%s queue is full", self.name)
+            return False
+
+    async def _consume(self, queue: asyncio.Queue) -> None:
+        """ キューに溜まった書き込みデータをまとめて書き込む
+
+        Args:
+            queue (asyncio.Queue): 書き込みデータのキュー
+        """
+        while True:
+            items = [await queue.get()]
+            while len(items) < self.batch_size and not queue.empty():
+                items.append(queue.get_nowait())
+            try:
+                await self.write(items)
+            except Exception as e:
+                logger.error("Error writing %s %s entries: %s", len(items), self.name, e)
+            finally:
+                for _ in items:
+                    queue.task_done()
+
+    async def aclose(self) -> None:
+        """ キューに溜まった書き込みデータをすべて書き込み、書き込みタスクを終了する
+        """
+        queue, task = self._queue, self._task
+        if queue is None or task is None or self._loop is not asyncio.get_running_loop():
+            return
+        if not task.done():
+            await queue.join()
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._queue = None
+        self._loop = None
+        self._task = None
@@ -3,14 +3,26 @@
 import os
 import aiomysql
 import asyncio
-from typing import Optional
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# アイドル状態の接続がサーバー側で切断されないようにするためのping間隔（秒）
+KEEPALIVE_INTERVAL = 60
+
+# transaction()を開始したタスクとその接続
+# asyncio.gather・create_taskで作成したタスクにもコンテキストがコピーされるため、開始したタスクを記録して区別する
+_transaction_conn: ContextVar[Optional[Tuple[asyncio.Task, aiomysql.Connection]]] = ContextVar(
+    "transaction_conn", default=None
+)
+
 
 class DatabaseConnection:
     _pool: Optional[aiomysql.Pool] = None
+    _keepalive_task: Optional[asyncio.Task] = None
 
     @classmethod
     async def get_pool(cls) -> aiomysql.Pool:
@@ -23,26 +35,126 @@ class DatabaseConnection:
                     db=os.getenv("DB_NAME", "vrdb01"),
                     user=os.getenv("DB_USER", "db_user"),
                     password=os.getenv("DB_PASSWORD", "db_pass"),
-                    maxsize=5,
+                    minsize=int(os.getenv("DB_POOL_MIN", "4")),
+                    maxsize=int(os.getenv("DB_POOL_MAX", "32")),
+                    pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "600")),
+                    connect_timeout=5,
+                    echo=False,
                     autocommit=True
                 )
+                cls._keepalive_task = asyncio.create_task(cls._keepalive())
             except Exception as e:
-                logger.error(f"Failed to create connection pool: {e}")
+                logger.error("Failed to create connection pool: %s", e)
                 raise
         return cls._pool
 
     @classmethod
-    async def execute_query(cls, query: str, params: tuple = None):
-        """ クエリを実行する """
+    async def _keepalive(cls):
+        """ 定期的にSELECT 1を実行し、接続を維持する """
+        while True:
+            await asyncio.sleep(KEEPALIVE_INTERVAL)
+            if cls._pool is None:
+                return
+            try:
+                async with cls._pool.acquire() as conn:
+                    await conn.ping(reconnect=True)
+                    async with conn.cursor() as cur:
+                        await cur.execute("SELECT 1")
+            except Exception as e:
+                logger.warning("Database keepalive failed: %s", e)
+
+    @classmethod
+    @asynccontextmanager
+    async def acquire(cls) -> AsyncIterator[aiomysql.Connection]:
+        """ クエリを実行する接続を取得する
+        transaction()の中ではその接続を、それ以外ではプールの接続を返す
+
+        Yields:
+            aiomysql.Connection: データベース接続
+        Raises:
+            RuntimeError: transaction()の中で作成した別のタスクから呼び出された場合
+        """
+        owner = _transaction_conn.get()
+        if owner is not None:
+            task, conn = owner
+            # aiomysqlの接続は複数のタスクから同時にクエリを実行できないため、開始したタスク以外には渡さない
+            if task is not asyncio.current_task():
+                raise RuntimeError(
+                    "The transaction connection cannot be used from a task created inside transaction()"
+                )
+            yield conn
+            return
         pool = await cls.get_pool()
         async with pool.acquire() as conn:
+            yield conn
+
+    @classmethod
+    @asynccontextmanager
+    async def transaction(cls, rollback: bool = False) -> AsyncIterator[aiomysql.Connection]:
+        """ 1つの接続でトランザクションを実行する
+        ブロック内のクエリ（リポジトリ経由を含む）はすべてこの接続で実行される
+        接続はトランザクションを開始したタスクでのみ使用でき、ブロック内で作成したタスクからクエリを実行するとエラーになる
+
+        Args:
+            rollback (bool): Trueの場合は成功時もロールバックする（書き込みを残さずに実行する場合に使用）
+        Yields:
+            aiomysql.Connection: トランザクション中の接続
+        """
+        pool = await cls.get_pool()
+        async with pool.acquire() as conn:
+            await conn.begin()
+            token = _transaction_conn.set((asyncio.current_task(), conn))
+            try:
+                yield conn
+            except BaseException:
+                await conn.rollback()
+                raise
+            else:
+                if rollback:
+                    await conn.rollback()
+                else:
+                    await conn.commit()
+            finally:
+                _transaction_conn.reset(token)
+
+    @classmethod
+    async def execute_query(cls, query: str, params: tuple = None):
+        """ クエリを実行する """
+        async with cls.acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cur:
                 await cur.execute(query, params)
                 return await cur.fetchall()
 
+    @classmethod
+    async def stream_query(
+        cls, query: str, params: tuple = None, chunk_size: int = 500
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """ クエリを実行し、結果を少しずつ取得しながら1行ずつ返す
+        サーバーサイドカーソルを使うため、全件をメモリに読み込まない
+
+        Args:
+            query (str): SQLクエリ
+            params (tuple, optional): クエリパラメータ。デフォルトはNone
+            chunk_size (int): 一度に取得する行数
+        Yields:
+            Dict[str, Any]: クエリ結果の行
+        """
+        async with cls.acquire() as conn:
+            async with conn.cursor(aiomysql.SSDictCursor) as cur:
+                await cur.execute(query, params)
+                while True:
+                    rows = await cur.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield row
+
     @classmethod
     async def close_pool(cls):
         """ コネクションプールをクローズする """
+        if cls._keepalive_task:
+            cls._keepalive_task.cancel()
+            cls._keepalive_task = None
         if cls._pool:
             cls._pool.close()
             await cls._pool.wait_closed()
@@ -1,5 +1,5 @@
 import logging
-from typing import Any, Optional
+from typing import Any, AsyncIterator, Optional, Sequence
 from ..connection import DatabaseConnection
 
 logger = logging.getLogger(__name__)
@@ -20,7 +20,26 @@ class BaseRepository:
         try:
             return await DatabaseConnection.execute_query(query, params)
         except Exception as e:
-            logger.error(f"Query execution failed: {str(e)}")
+            logger.error("Query execution failed: %s", e)
+            raise
+
+    async def stream_query(
+        self, query: str, params: tuple = None, chunk_size: int = 500
+    ) -> AsyncIterator[dict[str, Any]]:
+        """ クエリを実行し、結果を1行ずつ返す（全件をメモリに読み込まない）
+
+        Args:
+            query (str): SQLクエリ
+            params (tuple, optional): クエリパラメータ。デフォルトはNone
+            chunk_size (int): 一度に取得する行数
+        Yields:
+            dict[str, Any]: クエリ結果の行
+        """
+        try:
+            async for row in DatabaseConnection.stream_query(query, params, chunk_size):
+                yield row
+        except Exception as e:
+            logger.error("Streaming query failed: %s", e)
             raise
 
     async def execute_one(self, query: str, params: tuple = None) -> Optional[dict[str, Any]]:
@@ -45,11 +64,28 @@ class BaseRepository:
             int: 更新された行数
         """
         try:
-            pool = await DatabaseConnection.get_pool()
-            async with pool.acquire() as conn:
+            async with DatabaseConnection.acquire() as conn:
                 async with conn.cursor() as cur:
                     await cur.execute(query, params)
                     return cur.rowcount
         except Exception as e:
-            logger.error(f"Update execution failed: {str(e)}")
+            logger.error("Update execution failed: %s", e)
+            raise
+
+    async def execute_many(self, query: str, params_list: Sequence[Any]) -> int:
+        """ 同じクエリを複数のパラメータでまとめて実行し、更新行数を返す
+
+        Args:
+            query (str): SQLクエリ
+            params_list (Sequence[Any]): クエリパラメータのリスト
+        Returns:
+            int: 更新された行数
+        """
+        try:
+            async with DatabaseConnection.acquire() as conn:
+                async with conn.cursor() as cur:
+                    await cur.executemany(query, params_list)
+                    return cur.rowcount
+        except Exception as e:
+            logger.error("Batch update execution failed: %s", e)
             raise
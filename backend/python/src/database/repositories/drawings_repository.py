@@ -1,14 +1,32 @@
 # src/database/repositories/drawings_repository.py
 
-import json
-from typing import Dict, Any, List, Optional
+import logging
+from typing import Dict, Any, AsyncIterator, List, Optional
+
+import pymysql
 
 from .base_repository import BaseRepository
+from src.utils import json_io
+
+logger = logging.getLogger(__name__)
+
+# この点数を超えるdraw_linesはスレッドでJSONに変換・圧縮する（小さいデータはスレッド切り替えの方が高コスト）
+THREAD_DUMP_MIN_POINTS = 2000
+# JSON列にバイナリ文字セットの文字列を保存しようとした場合のMySQLのエラーコード
+# aiomysqlはbytesを_binary X'…'として送るため、JSON列への圧縮データの挿入はこのエラーになる
+ER_INVALID_JSON_CHARSET = 3144
+# JSON列に不正なJSONを保存しようとした場合のMySQLのエラーコード（文字列として送られた場合）
+ER_INVALID_JSON_TEXT = 3140
+_JSON_COLUMN_ERRORS = (ER_INVALID_JSON_CHARSET, ER_INVALID_JSON_TEXT)
 
 
 class DrawingsRepository(BaseRepository):
     """ 描画データのテーブル操作を行うリポジトリ """
 
+    # draw_linesがJSON型のままのデータベース（mysql/migrations未実行）の場合True
+    # 圧縮したデータを保存できないため、JSON文字列のまま保存する
+    _json_draw_lines = False
+
     async def insert_drawings(self, drawing_data: Dict[str, Any]) -> str:
         """ 描画データを挿入
 
@@ -28,20 +46,41 @@ class DrawingsRepository(BaseRepository):
                 %(use_ai)s, %(client_id)s, %(client_info)s, %(metadata)s
             )
         """
+        draw_lines = drawing_data["draw_lines"]
+        total_points = sum(len(line["positions"]) for line in draw_lines)
+        # draw_linesは最も大きいフィールドのため、zstdで圧縮してDBとの転送量を減らす
+        if DrawingsRepository._json_draw_lines:
+            draw_lines_data = json_io.dumps(draw_lines)
+        elif total_points > THREAD_DUMP_MIN_POINTS:
+            draw_lines_data = await json_io.dumps_compressed_in_thread(draw_lines)
+        else:
+            draw_lines_data = json_io.dumps_compressed(draw_lines)
+
         params = {
             "drawing_id": drawing_data["drawing_id"],
             "scene_id": drawing_data["scene_id"],
             "draw_timestamp": drawing_data["draw_timestamp"],
-            "draw_lines": json.dumps(drawing_data["draw_lines"]),
+            "draw_lines": draw_lines_data,
             "center_x": drawing_data["center_x"],
             "center_y": drawing_data["center_y"],
             "center_z": drawing_data["center_z"],
             "use_ai": drawing_data["use_ai"],
             "client_id": drawing_data["client_id"],
-            "client_info": json.dumps(drawing_data["client_info"]),
-            "metadata": json.dumps(drawing_data.get("metadata", {})),
+            "client_info": json_io.dumps(drawing_data["client_info"]),
+            "metadata": json_io.dumps(drawing_data.get("metadata", {})),
         }
-        await self.execute_update(query, params)
+        try:
+            await self.execute_update(query, params)
+        except pymysql.err.MySQLError as e:
+            if DrawingsRepository._json_draw_lines or not e.args or e.args[0] not in _JSON_COLUMN_ERRORS:
+                raise
+            logger.warning(
+                "drawings.draw_lines is still a JSON column, storing uncompressed JSON "
+                "(apply mysql/migrations/001_draw_lines_to_mediumblob.sql)"
+            )
+            DrawingsRepository._json_draw_lines = True
+            params["draw_lines"] = json_io.dumps(draw_lines)
+            await self.execute_update(query, params)
         return drawing_data["drawing_id"]
 
     async def get_drawings(self) -> List[Dict[str, Any]]:
@@ -61,8 +100,36 @@ class DrawingsRepository(BaseRepository):
         """
         return await self.execute_query(query)
 
-    async def get_drawing(self, drawing_id: str) -> Optional[Dict[str, Any]]:
-        """ 任意のdrawing_idの描画データを取得 """
+    async def iter_drawings(self) -> AsyncIterator[Dict[str, Any]]:
+        """ 描画データを全て取得（一覧を全件メモリに読み込まず、1件ずつ返す）
+
+        Yields:
+            Dict[str, Any]: 描画データ
+        """
+        query = """
+        SELECT
+            drawing_id,
+            draw_timestamp,
+            created_at,
+            use_ai
+        FROM drawings
+        ORDER BY created_at DESC;
+        """
+        async for row in self.stream_query(query):
+            yield row
+
+    async def get_drawing(
+        self, drawing_id: str, parse_draw_lines: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        """ 任意のdrawing_idの描画データを取得
+
+        Args:
+            drawing_id (str): 描画ID
+            parse_draw_lines (bool): draw_linesをパースするか。
+                Falseの場合は展開済みのJSON文字列（strまたはbytes）をパースせずに返す
+        Returns:
+            Optional[Dict[str, Any]]: 描画データ
+        """
         query = """
             SELECT *
             FROM drawings
@@ -70,8 +137,11 @@ class DrawingsRepository(BaseRepository):
         """
         result = await self.execute_one(query, (drawing_id,))
         if result:
-            if isinstance(result["draw_lines"], str):
-                result["draw_lines"] = json.loads(result["draw_lines"])
-            result["metadata"] = json.loads(result.get("metadata") or "{}")
-            result["client_info"] = json.loads(result.get("client_info") or "{}")
+            # 移行前の行は圧縮されていないJSONのため、decompressはそのまま返す
+            if isinstance(result["draw_lines"], (str, bytes, bytearray)):
+                draw_lines = json_io.decompress(result["draw_lines"])
+                # 最も大きいフィールドのため、返却するだけの場合はパースしない
+                result["draw_lines"] = json_io.loads(draw_lines) if parse_draw_lines else draw_lines
+            result["metadata"] = json_io.loads(result.get("metadata") or "{}")
+            result["client_info"] = json_io.loads(result.get("client_info") or "{}")
         return result
@@ -1,31 +1,33 @@
 # src/database/repositories/error_logs_repository.py
 
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 from .base_repository import BaseRepository
 
 
 class ErrorLogsRepository(BaseRepository):
     """ エラーログのテーブル操作を行うリポジトリ """
-    async def insert_error_log(self, error_log: Dict[str, Any]) -> str:
-        """ エラーログを挿入する
+    INSERT_QUERY = """
+        INSERT INTO error_logs (
+            error_id, result_id, drawing_id, scene_id,
+            error_type, error_message, stack_trace
+        ) VALUES (
+            %(error_id)s, %(result_id)s, %(drawing_id)s,
+            %(scene_id)s, %(error_type)s, %(error_message)s,
+            %(stack_trace)s
+        )
+    """
+
+    @staticmethod
+    def _to_params(error_log: Dict[str, Any]) -> Dict[str, Any]:
+        """ エラーログデータをクエリパラメータに変換する
 
         Args:
             error_log (Dict[str, Any]): エラーログデータ
         Returns:
-            str: エラーログID
-        """
-        query = """
-            INSERT INTO error_logs (
-                error_id, result_id, drawing_id, scene_id,
-                error_type, error_message, stack_trace
-            ) VALUES (
-                %(error_id)s, %(result_id)s, %(drawing_id)s,
-                %(scene_id)s, %(error_type)s, %(error_message)s,
-                %(stack_trace)s
-            )
+            Dict[str, Any]: クエリパラメータ
         """
-        params = {
+        return {
             "error_id": error_log["error_id"],
             "result_id": error_log.get("result_id"),
             "drawing_id": error_log.get("drawing_id"),
@@ -34,5 +36,28 @@ class ErrorLogsRepository(BaseRepository):
             "error_message": error_log["error_message"],
             "stack_trace": error_log.get("stack_trace")
         }
-        await self.execute_update(query, params)
+
+    async def insert_error_log(self, error_log: Dict[str, Any]) -> str:
+        """ エラーログを挿入する
+
+        Args:
+            error_log (Dict[str, Any]): エラーログデータ
+        Returns:
+            str: エラーログID
+        """
+        await self.execute_update(self.INSERT_QUERY, self._to_params(error_log))
         return error_log["error_id"]
+
+    async def insert_error_logs(self, error_logs: List[Dict[str, Any]]) -> int:
+        """ 複数のエラーログをまとめて挿入する
+
+        Args:
+            error_logs (List[Dict[str, Any]]): エラーログデータのリスト
+        Returns:
+            int: 挿入された行数
+        """
+        if not error_logs:
+            return 0
+        return await self.execute_many(
+            self.INSERT_QUERY, [self._to_params(error_log) for error_log in error_logs]
+        )
@@ -1,8 +1,8 @@
 # src/database/repositories/features_repository.py
 
-import json
 from typing import Dict, Any, Optional
 from .base_repository import BaseRepository
+from src.utils import json_io
 
 
 class FeaturesRepository(BaseRepository):
@@ -36,7 +36,7 @@ class FeaturesRepository(BaseRepository):
             "drawing_id": feature_data["drawing_id"],
             "total_strokes": feature_data["total_strokes"],
             "total_points": feature_data["total_points"],
-            "features": json.dumps(feature_data["features"])
+            "features": json_io.dumps(feature_data["features"])
         }
         await self.execute_update(query, params)
         return feature_data["feature_id"]
@@ -62,5 +62,5 @@ class FeaturesRepository(BaseRepository):
         """
         result = await self.execute_one(query, (drawing_id,))
         if result and isinstance(result["features"], str):
-            result["features"] = json.loads(result["features"])
+            result["features"] = json_io.loads(result["features"])
         return result
@@ -1,39 +1,64 @@
 # src/database/repositories/result_details_repository.py
 
-import json
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 from .base_repository import BaseRepository
+from src.utils import json_io
 
 
 class ResultDetailsRepository(BaseRepository):
     """ リザルト詳細のテーブル操作を行うリポジトリ """
-    async def insert_detail(self, log_data: Dict[str, Any]) -> str:
-        """ リザルト詳細を挿入
+    INSERT_QUERY = """
+        INSERT INTO result_details (
+            result_id, drawing_id, scene_id,
+            shape_id, success, score,
+            reasoning, process_time_ms,
+            model_name, api_response,
+            error_message, client_id
+        ) VALUES (
+            %(result_id)s, %(drawing_id)s, %(scene_id)s,
+            %(shape_id)s, %(success)s, %(score)s,
+            %(reasoning)s, %(process_time_ms)s,
+            %(model_name)s, %(api_response)s,
+            %(error_message)s, %(client_id)s
+        )
+    """
+
+    @staticmethod
+    def _to_params(log_data: Dict[str, Any]) -> Dict[str, Any]:
+        """ リザルト詳細データをクエリパラメータに変換
 
         Args:
             log_data (Dict[str, Any]): リザルト詳細データ
         Returns:
-            str: リザルトID
-        """
-        query = """
-            INSERT INTO result_details (
-                result_id, drawing_id, scene_id,
-                shape_id, success, score,
-                reasoning, process_time_ms,
-                model_name, api_response,
-                error_message, client_id
-            ) VALUES (
-                %(result_id)s, %(drawing_id)s, %(scene_id)s,
-                %(shape_id)s, %(success)s, %(score)s,
-                %(reasoning)s, %(process_time_ms)s,
-                %(model_name)s, %(api_response)s,
-                %(error_message)s, %(client_id)s
-            )
+            Dict[str, Any]: クエリパラメータ
         """
         params = log_data.copy()
         if "api_response" in params:
-            params["api_response"] = json.dumps(params["api_response"])
+            params["api_response"] = json_io.dumps(params["api_response"])
+        return params
 
-        await self.execute_update(query, params)
+    async def insert_detail(self, log_data: Dict[str, Any]) -> str:
+        """ リザルト詳細を挿入
+
+        Args:
+            log_data (Dict[str, Any]): リザルト詳細データ
+        Returns:
+            str: リザルトID
+        """
+        await self.execute_update(self.INSERT_QUERY, self._to_params(log_data))
         return log_data["result_id"]
+
+    async def insert_details(self, details: List[Dict[str, Any]]) -> int:
+        """ 複数のリザルト詳細をまとめて挿入
+
+        Args:
+            details (List[Dict[str, Any]]): リザルト詳細データのリスト
+        Returns:
+            int: 挿入された行数
+        """
+        if not details:
+            return 0
+        return await self.execute_many(
+            self.INSERT_QUERY, [self._to_params(log_data) for log_data in details]
+        )
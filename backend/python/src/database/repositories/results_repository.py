@@ -1,34 +1,59 @@
 # src/database/repositories/results_repository.py
 
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 from .base_repository import BaseRepository
 
 
 class ResultsRepository(BaseRepository):
     """ リザルトのテーブル操作を行うリポジトリ """
-    async def insert_result(self, result_data: Dict[str, Any]) -> str:
-        """ リザルトを挿入
+    INSERT_QUERY = """
+        INSERT INTO results (
+            result_id, drawing_id, shape_id,
+            success
+        ) VALUES (
+            %(result_id)s, %(drawing_id)s, %(shape_id)s,
+            %(success)s
+        )
+    """
+
+    @staticmethod
+    def _to_params(result_data: Dict[str, Any]) -> Dict[str, Any]:
+        """ リザルトデータをクエリパラメータに変換
 
         Args:
             result_data (Dict[str, Any]): リザルトデータ
         Returns:
-            str: リザルトID
-        """
-        query = """
-            INSERT INTO results (
-                result_id, drawing_id, shape_id,
-                success
-            ) VALUES (
-                %(result_id)s, %(drawing_id)s, %(shape_id)s,
-                %(success)s
-            )
+            Dict[str, Any]: クエリパラメータ
         """
-        params = {
+        return {
             "result_id": result_data["result_id"],
             "drawing_id": result_data["drawing_id"],
             "shape_id": result_data["shape_id"],
             "success": result_data["success"]
         }
-        await self.execute_update(query, params)
+
+    async def insert_result(self, result_data: Dict[str, Any]) -> str:
+        """ リザルトを挿入
+
+        Args:
+            result_data (Dict[str, Any]): リザルトデータ
+        Returns:
+            str: リザルトID
+        """
+        await self.execute_update(self.INSERT_QUERY, self._to_params(result_data))
         return result_data["result_id"]
+
+    async def insert_results(self, results: List[Dict[str, Any]]) -> int:
+        """ 複数のリザルトをまとめて挿入
+
+        Args:
+            results (List[Dict[str, Any]]): リザルトデータのリスト
+        Returns:
+            int: 挿入された行数
+        """
+        if not results:
+            return 0
+        return await self.execute_many(
+            self.INSERT_QUERY, [self._to_params(result_data) for result_data in results]
+        )
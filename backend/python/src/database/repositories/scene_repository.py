@@ -1,13 +1,16 @@
 # src/database/repositories/scene_repository.py
 
-import json
 from typing import Dict, Any, Optional
 
 from .base_repository import BaseRepository
+from src.utils import json_io
+from src.utils.ttl_cache import async_ttl_cache
 
 
 class SceneRepository(BaseRepository):
     """ シーンのテーブル操作を行うリポジトリ """
+    # マスタデータのため取得結果をキャッシュする
+    @async_ttl_cache(maxsize=1024, ttl=300)
     async def get_scene_by_id(self, scene_id: str) -> Optional[Dict[str, Any]]:
         """ 任意のscene_idのシーンを取得
 
@@ -26,5 +29,10 @@ class SceneRepository(BaseRepository):
         """
         result = await self.execute_one(query, (scene_id,))
         if result and result["shapes_list"]:
-            result["shapes_list"] = json.loads(result["shapes_list"])
+            result["shapes_list"] = json_io.loads(result["shapes_list"])
         return result
+
+    @classmethod
+    def clear_cache(cls) -> None:
+        """ マスタデータのキャッシュを削除する（マスタデータの更新時に呼び出す） """
+        cls.get_scene_by_id.cache.clear()
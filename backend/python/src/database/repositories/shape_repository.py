@@ -1,16 +1,19 @@
 # src/database/repositories/shape_repository.py
 
 import logging
-import json
 from typing import Dict, Any, List, Optional
 
 from .base_repository import BaseRepository
+from src.utils import json_io
+from src.utils.ttl_cache import async_ttl_cache
 
 logger = logging.getLogger(__name__)
 
 
 class ShapeRepository(BaseRepository):
     """ 形状のテーブル操作を行うリポジトリ """
+    # mstr_shapes・mstr_scenesはほとんど更新されないマスタデータのため、取得結果をキャッシュする
+    @async_ttl_cache(maxsize=1024, ttl=300)
     async def get_shape_info_by_id(self, shape_id: str) -> Optional[Dict[str, Any]]:
         """
         指定された shape_id に対応する情報（prefab_name, threshold）を取得する
@@ -28,42 +31,75 @@ class ShapeRepository(BaseRepository):
             """
         return await self.execute_one(query, (shape_id,))
 
+    @async_ttl_cache(maxsize=1024, ttl=300)
     async def get_available_shapes(self, scene_id: str) -> List[Dict[str, Any]]:
         """ 指定されたシーンIDに関連する形状情報を取得する
 
         Args:
             scene_id (str): シーンID
         Returns:
-            List[Dict[str, Any]]: 形状情報のリスト
+            List[Dict[str, Any]]: 形状情報のリスト（JSON列はパース済みの状態でキャッシュされる）
         """
-        # シーンのshapes_listを取得
-        scene_query = "SELECT shapes_list FROM mstr_scenes WHERE scene_id = %s"
-        scene_data = await self.execute_one(scene_query, (scene_id,))
-
-        if not scene_data:
-            return []
-
-        shape_ids = json.loads(scene_data['shapes_list'])
-        if not shape_ids:
-            return []
-
-        # shape_idsに対応する形状情報を取得
-        placeholders = ', '.join(['%s'] * len(shape_ids))
-        shapes_query = f"""
+        # shapes_listをJSON_TABLEで展開して形状マスタと結合し、1回のクエリで取得する
+        # （形状数に関わらずSQL文が同一になるため、サーバー側の解析結果も再利用しやすい）
+        query = """
             SELECT
                 shape_id, prefab_name, threshold,
                 name_ja, name_en, description_ja, description_en,
                 positive_examples, negative_examples
             FROM mstr_shapes
-            WHERE shape_id IN ({placeholders})
+            WHERE shape_id IN (
+                SELECT t.shape_id
+                FROM mstr_scenes sc,
+                    JSON_TABLE(sc.shapes_list, '$[*]' COLUMNS (shape_id VARCHAR(50) PATH '$')) AS t
+                WHERE sc.scene_id = %s
+            )
             """
-        results = await self.execute_query(shapes_query, tuple(shape_ids))
-
-        # JSON文字列をPythonオブジェクトに変換
+        results = await self.execute_query(query, (scene_id,))
         for result in results:
-            if isinstance(result.get("positive_examples"), str):
-                result["positive_examples"] = json.loads(result["positive_examples"])
-            if isinstance(result.get("negative_examples"), str):
-                result["negative_examples"] = json.loads(result["negative_examples"])
-
+            self._parse_examples(result)
         return results
+
+    async def get_shapes_by_scene(self) -> Dict[str, List[Dict[str, Any]]]:
+        """ 全シーンの利用可能な形状情報を1回のクエリで取得する
+        シーンごとにget_available_shapesを呼ぶ代わりに、起動時にまとめて読み込む場合に使用する
+
+        Returns:
+            Dict[str, List[Dict[str, Any]]]: シーンIDをキーとした形状情報のリスト
+        """
+        query = """
+            SELECT
+                sc.scene_id,
+                s.shape_id, s.prefab_name, s.threshold,
+                s.name_ja, s.name_en, s.description_ja, s.description_en,
+                s.positive_examples, s.negative_examples
+            FROM mstr_scenes sc,
+                JSON_TABLE(sc.shapes_list, '$[*]' COLUMNS (shape_id VARCHAR(50) PATH '$')) AS t
+            JOIN mstr_shapes s ON s.shape_id = t.shape_id
+            """
+        shapes_by_scene: Dict[str, List[Dict[str, Any]]] = {}
+        for result in await self.execute_query(query):
+            scene_id = result.pop("scene_id")
+            shapes_by_scene.setdefault(scene_id, []).append(self._parse_examples(result))
+        return shapes_by_scene
+
+    @staticmethod
+    def _parse_examples(result: Dict[str, Any]) -> Dict[str, Any]:
+        """ 形状情報のJSON文字列の列をPythonオブジェクトに変換
+
+        Args:
+            result (Dict[str, Any]): 形状情報（その場で変換する）
+        Returns:
+            Dict[str, Any]: 変換後の形状情報
+        """
+        if isinstance(result.get("positive_examples"), str):
+            result["positive_examples"] = json_io.loads(result["positive_examples"])
+        if isinstance(result.get("negative_examples"), str):
+            result["negative_examples"] = json_io.loads(result["negative_examples"])
+        return result
+
+    @classmethod
+    def clear_cache(cls) -> None:
+        """ マスタデータのキャッシュを削除する（マスタデータの更新時に呼び出す） """
+        cls.get_shape_info_by_id.cache.clear()
+        cls.get_available_shapes.cache.clear()
@@ -0,0 +1,105 @@
+# src/features/_dp_numba.py
+
+import numpy as np
+from numba import njit
+
+# カーネルはnogilで実行され、ストローク単位の並列化はFeatureExtractorのスレッドプールで行う
+# （parallel=Trueにすると複数スレッドから同時に呼び出した場合に、
+#   TBB・OpenMPのない環境で使われるworkqueueのスレッド層がプロセスを終了させるため使用しない）
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def _segment_distance2(pts, i, lo, hi):
+    """ 点と線分の距離の2乗を計算（線分の外側の点は近い方の端点との距離）
+
+    Args:
+        pts (np.ndarray): 点列（形状は(N, 3)）
+        i (int): 点のインデックス
+        lo (int): 線分の始点のインデックス
+        hi (int): 線分の終点のインデックス
+    Returns:
+        float: 点と線分の距離の2乗
+    """
+    ax, ay, az = pts[lo, 0], pts[lo, 1], pts[lo, 2]
+    vx, vy, vz = pts[hi, 0] - ax, pts[hi, 1] - ay, pts[hi, 2] - az
+    px, py, pz = pts[i, 0] - ax, pts[i, 1] - ay, pts[i, 2] - az
+
+    length2 = vx * vx + vy * vy + vz * vz
+    dot = px * vx + py * vy + pz * vz
+    if length2 == 0.0 or dot <= 0.0:
+        # 始点の外側（または線分の長さが0）
+        return px * px + py * py + pz * pz
+    if dot >= length2:
+        # 終点の外側
+        qx, qy, qz = pts[i, 0] - pts[hi, 0], pts[i, 1] - pts[hi, 1], pts[i, 2] - pts[hi, 2]
+        return qx * qx + qy * qy + qz * qz
+
+    # 線分を含む直線との垂直距離（|p×v|^2 / |v|^2）
+    cx = py * vz - pz * vy
+    cy = pz * vx - px * vz
+    cz = px * vy - py * vx
+    return (cx * cx + cy * cy + cz * cz) / length2
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def _argmax_dist(pts, lo, hi):
+    """ 区間内で線分から最も遠い点を探索
+
+    Args:
+        pts (np.ndarray): 点列（形状は(N, 3)）
+        lo (int): 区間の始点のインデックス
+        hi (int): 区間の終点のインデックス
+    Returns:
+        Tuple[int, float]: 最も遠い点のインデックスと距離の2乗
+    """
+    dmax = -1.0
+    index = lo + 1
+    for i in range(lo + 1, hi):
+        d = _segment_distance2(pts, i, lo, hi)
+        if d > dmax:
+            dmax = d
+            index = i
+    return index, dmax
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def dp_mask(pts, eps2):
+    """ Douglas-Peuckerアルゴリズムで残す点のマスクを計算
+
+    Args:
+        pts (np.ndarray): 点列（形状は(N, 3)のfloat32のC連続配列）
+        eps2 (float): 許容誤差の2乗
+    Returns:
+        np.ndarray: 残す点をTrueとしたマスク（形状は(N,)）
+    """
+    n = pts.shape[0]
+    keep = np.zeros(n, dtype=np.bool_)
+    if n == 0:
+        return keep
+    keep[0] = True
+    keep[n - 1] = True
+
+    # 区間のスタック（区間の数は点の数を超えない）
+    stack = np.empty((n, 2), dtype=np.int64)
+    stack[0, 0] = 0
+    stack[0, 1] = n - 1
+    top = 1
+    while top > 0:
+        top -= 1
+        lo = stack[top, 0]
+        hi = stack[top, 1]
+        if hi - lo < 2:
+            continue
+
+        index, dmax = _argmax_dist(pts, lo, hi)
+
+        if dmax > eps2:
+            keep[index] = True
+            stack[top, 0] = lo
+            stack[top, 1] = index
+            stack[top + 1, 0] = index
+            stack[top + 1, 1] = hi
+            top += 2
+
+    return keep
+
@@ -1,111 +1,178 @@
 # src/features/feature_extractor.py
 
-from typing import List, Dict, Any
+import asyncio
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
-from dataclasses import dataclass
 
-@dataclass
-class Point3D:
-    x: float
-    y: float
-    z: float
+try:
+    from src.features._dp_numba import dp_mask
+except ImportError:
+    # numbaがインストールされていない場合はNumPy版の実装を使用する
+    dp_mask = None
+
+
+def positions_to_array(line) -> np.ndarray:
+    """ protobufのLineの点列を(N, 3)の配列に変換
+    点ごとのdictを作らず、座標を直接配列に読み込む
+
+    Args:
+        line: ストローク（protobufのLine）
+    Returns:
+        np.ndarray: 点列（形状は(N, 3)）
+    """
+    positions = line.positions
+    return np.fromiter(
+        (v for p in positions for v in (p.x, p.y, p.z)),
+        dtype=np.float32,
+        count=3 * len(positions),
+    ).reshape(-1, 3)
+
+
+# この点数を超えるストロークはスレッドで計算する（短いストロークはスレッド切り替えの方が高コスト）
+THREAD_MIN_POINTS = 2000
+
+# 大域的特徴量の計算用に、ストロークの特徴量に一時的に持たせる簡略化後の点列のキー
+_PTS_KEY = "_pts"
 
 
 class FeatureExtractor:
-    def __init__(self, epsilon: float = 0.01):
+    # 閉じたストロークと判定する始点と終点の距離の閾値
+    CLOSED_THRESHOLD = 0.05
+
+    def __init__(self, epsilon: float = 0.01, max_workers: Optional[int] = None):
         """ 特徴量抽出器の初期化
 
         Args:
             epsilon (float): Douglas-Peuckerアルゴリズムの許容誤差
+            max_workers (Optional[int]): ストロークを並列に処理するスレッド数（Noneの場合はCPU数に応じて決定）
         """
         self.epsilon = epsilon
+        # ストロークごとの計算はNumPy・numbaの処理中にGILを解放するため、スレッドで並列に実行できる
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="feature")
+
+    def close(self) -> None:
+        """ ストロークの計算に使うスレッドプールを終了 """
+        self._executor.shutdown(wait=True)
 
-    def extract_features(self, drawing_data) -> Dict[str, Any]:
+    async def extract_features(self, drawing_data) -> Dict[str, Any]:
         """ 描画データから特徴量を抽出
+        点数の多いストロークはスレッドプールで並列に計算し、イベントループを止めない
 
         Args:
             drawing_data: 描画データ
         Returns:
             Dict[str, Any]: 抽出された特徴
         """
-        stroke_features = []
-        for line in drawing_data.draw_lines:
-            positions = [
-                {"x": pos.x, "y": pos.y, "z": pos.z} for pos in line.positions
-                ]
-            features = self.calculate_stroke_features(positions)
-            stroke_features.append(features)
+        # 各ストロークの座標はdictを経由せず、protobufから直接配列に読み込む
+        loop = asyncio.get_running_loop()
+        stroke_features: List[Optional[Dict[str, Any]]] = []
+        offloaded = {}
+        for index, line in enumerate(drawing_data.draw_lines):
+            if len(line.positions) > THREAD_MIN_POINTS:
+                offloaded[index] = loop.run_in_executor(
+                    self._executor, self._stroke_features_from_proto, line
+                )
+                stroke_features.append(None)
+            else:
+                stroke_features.append(self._stroke_features_from_proto(line))
+        if offloaded:
+            for index, features in zip(offloaded, await asyncio.gather(*offloaded.values())):
+                stroke_features[index] = features
 
         global_features = self.calculate_global_features(stroke_features)
+        # 配列はJSONに保存しないため、大域的特徴量の計算後に取り除く
+        for features in stroke_features:
+            features.pop(_PTS_KEY, None)
 
         return {
             "strokes": stroke_features,
             "global_features": global_features
         }
 
-    def distance_point_to_line(
-            self,
-            point: Point3D,
-            line_start: Point3D,
-            line_end: Point3D
-            ) -> float:
-        """ 点と線分の距離を計算
+    @staticmethod
+    def segment_distances_squared(
+            points: np.ndarray,
+            start: np.ndarray,
+            end: np.ndarray
+            ) -> np.ndarray:
+        """ 各点と線分の距離の2乗をまとめて計算（線分の外側の点は近い方の端点との距離）
+        大小の比較だけであれば2乗のまま比較でき、sqrtを省略できる
 
         Args:
-            point (Point3D): 点
-            line_start (Point3D): 線分の始点
-            line_end (Point3D): 線分の終点
+            points (np.ndarray): 点列（形状は(N, 3)）
+            start (np.ndarray): 線分の始点
+            end (np.ndarray): 線分の終点
         Returns:
-            float: 点と線分の距離
+            np.ndarray: 各点と線分の距離の2乗（形状は(N,)）
         """
-        if line_start.x == line_end.x and line_start.y == line_end.y and line_start.z == line_end.z:
-            return float(np.sqrt((point.x - line_start.x)**2 +
-                        (point.y - line_start.y)**2 +
-                        (point.z - line_start.z)**2))
-
-        numerator = float(np.abs(
-            (line_end.x - line_start.x) * (line_start.y - point.y) -
-            (line_start.x - point.x) * (line_end.y - line_start.y)
-        ))
-        denominator = float(np.sqrt(
-            (line_end.x - line_start.x)**2 +
-            (line_end.y - line_start.y)**2 +
-            (line_end.z - line_start.z)**2
-        ))
-        return numerator / denominator
-
-    def douglas_peucker(
-            self,
-            points: List[Point3D],
-            epsilon: float
-            ) -> List[Point3D]:
+        diff = points - start
+        length2 = float((end - start) @ (end - start))
+        if length2 == 0:
+            return (diff * diff).sum(axis=1)
+
+        d = (end - start) / math.sqrt(length2)
+        # 線分の延長上で端点からはみ出している長さ（内側の点は0）
+        s = -(diff @ d)
+        t = (points - end) @ d
+        h = np.maximum.reduce([s, t, np.zeros(len(points), dtype=points.dtype)])
+        # 線分を含む直線との垂直距離
+        c = np.cross(diff, d)
+        return h * h + (c * c).sum(axis=1)
+
+    @classmethod
+    def segment_distances(cls, points: np.ndarray, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+        """ 各点と線分の距離をまとめて計算（線分の外側の点は近い方の端点との距離）
+
+        Args:
+            points (np.ndarray): 点列（形状は(N, 3)）
+            start (np.ndarray): 線分の始点
+            end (np.ndarray): 線分の終点
+        Returns:
+            np.ndarray: 各点と線分の距離（形状は(N,)）
+        """
+        return np.sqrt(cls.segment_distances_squared(points, start, end))
+
+    def douglas_peucker(self, pts: np.ndarray, epsilon: float) -> np.ndarray:
         """ Douglas-Peuckerアルゴリズムによる点列の簡略化
+        再帰の代わりに区間のスタックと残す点のマスクを使い、長いストロークでも再帰上限に達しない
 
         Args:
-            points (List[Point3D]): 点列
+            pts (np.ndarray): 点列（形状は(N, 3)）
             epsilon (float): 許容誤差
         Returns:
-            List[Point3D]: 簡略化された点列
+            np.ndarray: 簡略化された点列（形状は(M, 3)）
         """
-        if len(points) <= 2:
-            return points
-
-        # 最大距離とそのインデックスを見つける
-        dmax = 0
-        index = 0
-        for i in range(1, len(points) - 1):
-            d = self.distance_point_to_line(points[i], points[0], points[-1])
-            if d > dmax:
-                index = i
-                dmax = d
-
-        # 再帰的に処理
-        if dmax > epsilon:
-            rec_results1 = self.douglas_peucker(points[:index + 1], epsilon)
-            rec_results2 = self.douglas_peucker(points[index:], epsilon)
-            return rec_results1[:-1] + rec_results2
-        else:
-            return [points[0], points[-1]]
+        n = len(pts)
+        # 両端の点は必ず残すため、2点以下では削減できる点がない
+        if n <= 2:
+            return pts
+
+        # 距離は2乗のまま許容誤差の2乗と比較する
+        eps2 = epsilon * epsilon
+        if dp_mask is not None:
+            # JITコンパイルしたカーネルで計算
+            return pts[dp_mask(np.ascontiguousarray(pts, dtype=np.float32), eps2)]
+
+        keep = np.zeros(n, dtype=bool)
+        keep[0] = keep[-1] = True
+        stack = [(0, n - 1)]
+        while stack:
+            lo, hi = stack.pop()
+            if hi - lo < 2:
+                continue
+
+            # 区間の両端を結ぶ線分と、間の各点との距離をまとめて計算
+            distances2 = self.segment_distances_squared(pts[lo + 1:hi], pts[lo], pts[hi])
+            offset = int(np.argmax(distances2))
+            if distances2[offset] > eps2:
+                index = lo + 1 + offset
+                keep[index] = True
+                stack.append((lo, index))
+                stack.append((index, hi))
+
+        return pts[keep]
 
     def calculate_stroke_features(
             self,
@@ -116,60 +183,105 @@ class FeatureExtractor:
         Args:
             positions (List[Dict[str, float]]): ストロークの点列
         Returns:
-            Dict[str, Any]: ストロークの特
+            Dict[str, Any]: ストロークの特徴量
         """
-        # Point3Dオブジェクトのリストに変換
-        points = [Point3D(p['x'], p['y'], p['z']) for p in positions]
+        if 0 < len(positions) <= 2:
+            return self._short_stroke_features(
+                [(p['x'], p['y'], p['z']) for p in positions]
+            )
+
+        pts = np.fromiter(
+            (v for p in positions for v in (p['x'], p['y'], p['z'])),
+            dtype=np.float32,
+            count=3 * len(positions),
+        ).reshape(-1, 3)
+        features = self._calculate_stroke_features(pts)
+        features.pop(_PTS_KEY, None)
+        return features
 
+    def _stroke_features_from_proto(self, line) -> Dict[str, Any]:
+        """ protobufのストロークから特徴量を計算
+
+        Args:
+            line: ストローク（protobufのLine）
+        Returns:
+            Dict[str, Any]: ストロークの特徴量
+        """
+        positions = line.positions
+        if 0 < len(positions) <= 2:
+            return self._short_stroke_features([(p.x, p.y, p.z) for p in positions])
+
+        return self._calculate_stroke_features(positions_to_array(line))
+
+    def _short_stroke_features(self, points: List[Tuple[float, float, float]]) -> Dict[str, Any]:
+        """ 1〜2点のストロークの特徴量を計算
+        タップなどの短いストロークは簡略化の必要がないため、NumPyを使わずに直接計算する
+
+        Args:
+            points (List[Tuple[float, float, float]]): ストロークの点列（1点または2点）
+        Returns:
+            Dict[str, Any]: ストロークの特徴量
+        """
+        points = [(float(x), float(y), float(z)) for x, y, z in points]
+        start, end = points[0], points[-1]
+        dx, dy, dz = end[0] - start[0], end[1] - start[1], end[2] - start[2]
+        distance2 = dx * dx + dy * dy + dz * dz
+        return {
+            "points_count": len(points),
+            "bounding_box": {
+                "width": abs(dx),
+                "height": abs(dy),
+                "depth": abs(dz)
+            },
+            "start_point": dict(zip("xyz", start)),
+            "end_point": dict(zip("xyz", end)),
+            "total_length": math.sqrt(distance2),
+            "is_closed": distance2 < self.CLOSED_THRESHOLD * self.CLOSED_THRESHOLD,
+            "simplified_points": [dict(zip("xyz", p)) for p in points],
+        }
+
+    def _calculate_stroke_features(self, pts: np.ndarray) -> Dict[str, Any]:
+        """ (N, 3)の配列から1つのストロークの特徴量を計算
+        計算はすべて配列で行い、JSONに保存するdictは最後に一度だけ作成する
+
+        Args:
+            pts (np.ndarray): ストロークの点列（形状は(N, 3)）
+        Returns:
+            Dict[str, Any]: ストロークの特徴量
+        """
         # 点列を簡略化
-        simplified_points = self.douglas_peucker(points, self.epsilon)
+        simplified_points = self.douglas_peucker(pts, self.epsilon)
 
         # バウンディングボックスの計算
-        x_coords = [p.x for p in points]
-        y_coords = [p.y for p in points]
-        z_coords = [p.z for p in points]
+        bbox = pts.max(axis=0) - pts.min(axis=0)
 
         # ストロークの長さを計算
-        total_length = 0.0
-        for i in range(len(points) - 1):
-            dx = points[i+1].x - points[i].x
-            dy = points[i+1].y - points[i].y
-            dz = points[i+1].z - points[i].z
-            total_length += float(np.sqrt(dx*dx + dy*dy + dz*dz))
+        diffs = np.diff(pts, axis=0)
+        total_length = float(np.sqrt((diffs * diffs).sum(axis=1)).sum())
 
         # 始点と終点が近いかチェック（閉じたストロークかどうか）
-        start = points[0]
-        end = points[-1]
-        threshold = 0.05    # 閾値
-        is_closed = float(np.sqrt(
-            (end.x - start.x)**2 +
-            (end.y - start.y)**2 +
-            (end.z - start.z)**2
-        )) < threshold
+        # 距離は2乗のまま閾値の2乗と比較する（sqrtとNumPyの呼び出しを避ける）
+        start_point = pts[0].tolist()
+        end_point = pts[-1].tolist()
+        dx, dy, dz = (e - s for e, s in zip(end_point, start_point))
+        is_closed = dx * dx + dy * dy + dz * dz < self.CLOSED_THRESHOLD * self.CLOSED_THRESHOLD
 
         features = {
             "points_count": len(simplified_points),
             "bounding_box": {
-                "width": float(max(x_coords) - min(x_coords)),
-                "height": float(max(y_coords) - min(y_coords)),
-                "depth": float(max(z_coords) - min(z_coords))
-            },
-            "start_point": {
-                "x": float(points[0].x),
-                "y": float(points[0].y),
-                "z": float(points[0].z)
-            },
-            "end_point": {
-                "x": float(points[-1].x),
-                "y": float(points[-1].y),
-                "z": float(points[-1].z)
+                "width": float(bbox[0]),
+                "height": float(bbox[1]),
+                "depth": float(bbox[2])
             },
+            "start_point": dict(zip("xyz", start_point)),
+            "end_point": dict(zip("xyz", end_point)),
             "total_length": total_length,
-            "is_closed": bool(is_closed),
+            "is_closed": is_closed,
             "simplified_points": [
-                {"x": float(p.x), "y": float(p.y), "z": float(p.z)}
-                for p in simplified_points
-            ]
+                {"x": x, "y": y, "z": z}
+                for x, y, z in simplified_points.tolist()
+            ],
+            _PTS_KEY: simplified_points,
         }
 
         return features
@@ -183,29 +295,28 @@ class FeatureExtractor:
         Returns:
             Dict[str, Any]: 大域的特徴量
         """
-        all_points = []
-        for stroke in strokes:
-            all_points.extend(
-                [Point3D(p['x'], p['y'], p['z'])
-                    for p in stroke['simplified_points']]
-            )
-
-        x_coords = [p.x for p in all_points]
-        y_coords = [p.y for p in all_points]
-        z_coords = [p.z for p in all_points]
+        # 簡略化後の点列を1つの配列にまとめ、統計量を一括で計算
+        all_points = np.concatenate([
+            stroke[_PTS_KEY] if _PTS_KEY in stroke
+            else np.array(
+                [[p['x'], p['y'], p['z']] for p in stroke['simplified_points']],
+                dtype=np.float32,
+            ).reshape(-1, 3)
+            for stroke in strokes
+        ])
 
-        width = float(max(x_coords) - min(x_coords))
-        height = float(max(y_coords) - min(y_coords))
+        extent = all_points.max(axis=0) - all_points.min(axis=0)
+        width = float(extent[0])
+        height = float(extent[1])
+        centroid = all_points.mean(axis=0, dtype=np.float64)
 
         features = {
             "total_strokes": len(strokes),
             "total_points": len(all_points),
+            # 分類処理で毎回合計しないよう、全ストロークの長さをここで集計しておく
+            "total_length": float(sum(stroke["total_length"] for stroke in strokes)),
             "aspect_ratio": float(width / height if height != 0 else 0),
-            "centroid": {
-                "x": float(sum(x_coords) / len(x_coords)),
-                "y": float(sum(y_coords) / len(y_coords)),
-                "z": float(sum(z_coords) / len(z_coords))
-            }
+            "centroid": dict(zip("xyz", centroid.tolist()))
         }
 
         return features
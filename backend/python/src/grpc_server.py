@@ -33,6 +33,7 @@ class GrpcService(DrawingServiceServicer):
     drawings_repository: DrawingsRepository
     shape_repository: ShapeRepository
     features_repository: FeaturesRepository
+    feature_extractor: FeatureExtractor
     ai_service_manager: AIServiceManager
     start_time: datetime
 
@@ -42,6 +43,7 @@ class GrpcService(DrawingServiceServicer):
         self.drawings_repository = DrawingsRepository()
         self.shape_repository = ShapeRepository()
         self.features_repository = FeaturesRepository()
+        self.feature_extractor = FeatureExtractor()
         self.ai_service_manager = await AIServiceManager.create()
         self.start_time = datetime.now()
         return self
@@ -61,7 +63,7 @@ class GrpcService(DrawingServiceServicer):
             saved_id = await self.drawings_repository.insert_drawings(drawing_data)
             return UploadResponse(success=True, message="", upload_id=saved_id)
         except Exception as e:
-            logger.error(f"Error uploading drawing: {e}")
+            logger.error("Error uploading drawing: %s", e)
             return UploadResponse(success=False, message=f"Error: {str(e)}", upload_id="")
 
     async def ProcessDrawing(self, request, context) -> ShapeRecognitionClient:
@@ -78,8 +80,7 @@ class GrpcService(DrawingServiceServicer):
                 return None
 
             # 特徴量を生成
-            feature_extractor = FeatureExtractor()
-            features = feature_extractor.extract_features(request)
+            features = await self.feature_extractor.extract_features(request)
 
             # 特徴量保存とAI処理を並行実行
             feature_id = str(uuid.uuid4())
@@ -101,7 +102,7 @@ class GrpcService(DrawingServiceServicer):
             # 両方の処理を待機
             ai_result, _ = await asyncio.gather(ai_task, save_task)
 
-            logger.info(f"AI Result: {ai_result}")
+            logger.info("AI Result: %s", ai_result)
 
             if not ai_result:
                 return ShapeRecognitionClient(
@@ -115,7 +116,7 @@ class GrpcService(DrawingServiceServicer):
 
             # shape_idに対応する形状情報が見つからない場合
             if not shape_info:
-                logger.error(f"Shape info not found for shape_id: {ai_result.shape_id}")
+                logger.error("Shape info not found for shape_id: %s", ai_result.shape_id)
                 return ShapeRecognitionClient(
                     success=False,
                     drawing_id=request.drawing_id,
@@ -149,7 +150,7 @@ class GrpcService(DrawingServiceServicer):
                 )
 
         except Exception as e:
-            logger.error(f"Error processing drawing: {e}")
+            logger.error("Error processing drawing: %s", e)
             await context.abort(grpc.StatusCode.INTERNAL, f"Internal error: {str(e)}")
             return None
 
@@ -193,7 +194,11 @@ async def start_grpc_server():
         options=[
             ("grpc.max_send_message_length", 50 * 1024 * 1024),
             ("grpc.max_receive_message_length", 50 * 1024 * 1024),
+            # 圧縮レベル（0: なし, 1: 低, 2: 中, 3: 高）
+            ("grpc.default_compression_level", 2),
         ],
+        # レスポンスをgzipで圧縮（クライアントがgzipで送信したリクエストも展開される）
+        compression=grpc.Compression.Gzip,
     )
 
     service = await GrpcService.create()
@@ -202,7 +207,7 @@ async def start_grpc_server():
     listen_addr = "[::]:50051"
     server.add_insecure_port(listen_addr)
 
-    logger.info(f"Starting gRPC server on {listen_addr}")
+    logger.info("Starting gRPC server on %s", listen_addr)
     await server.start()
     logger.info("gRPC server started successfully")
 
@@ -212,3 +217,6 @@ async def start_grpc_server():
         logger.info("gRPC server stopping...")
         await server.stop(0)
         logger.info("gRPC server stopped")
+    finally:
+        await service.ai_service_manager.close()
+        service.feature_extractor.close()
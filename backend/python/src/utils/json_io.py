@@ -0,0 +1,113 @@
+# src/utils/json_io.py
+
+import asyncio
+import threading
+from typing import Any, Union
+
+import orjson
+import zstandard
+
+# zstdの圧縮レベル（速度と圧縮率のバランスが良い3を使用）
+ZSTD_LEVEL = 3
+# zstdフレームの先頭のマジックナンバー（圧縮前の値と区別するために使用）
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# zstdの圧縮・展開オブジェクトはスレッド間で共有できないため、スレッドごとに保持する
+_zstd_local = threading.local()
+
+
+def dumps(obj: Any) -> str:
+    """ オブジェクトをJSON文字列に変換
+
+    MySQLのJSON列はバイナリ文字セットの値を受け付けないため、bytesではなくstrを返す
+
+    Args:
+        obj (Any): 変換するオブジェクト（numpyの数値・配列も可）
+    Returns:
+        str: JSON文字列
+    """
+    return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+async def dumps_in_thread(obj: Any) -> str:
+    """ 大きなオブジェクトをイベントループを止めずにJSON文字列に変換
+
+    Args:
+        obj (Any): 変換するオブジェクト
+    Returns:
+        str: JSON文字列
+    """
+    return await asyncio.to_thread(dumps, obj)
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """ JSON文字列をオブジェクトに変換
+
+    Args:
+        data (Union[str, bytes]): JSON文字列
+    Returns:
+        Any: 変換されたオブジェクト
+    """
+    return orjson.loads(data)
+
+
+def raw(data: Union[str, bytes]) -> orjson.Fragment:
+    """ JSON文字列をパースせず、そのままdumps()の出力に埋め込める形にする
+
+    Args:
+        data (Union[str, bytes]): JSON文字列
+    Returns:
+        orjson.Fragment: 埋め込み用のJSON断片
+    """
+    return orjson.Fragment(data)
+
+
+def _compressor() -> zstandard.ZstdCompressor:
+    """ 現在のスレッドの圧縮オブジェクトを取得 """
+    compressor = getattr(_zstd_local, "compressor", None)
+    if compressor is None:
+        compressor = _zstd_local.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    return compressor
+
+
+def _decompressor() -> zstandard.ZstdDecompressor:
+    """ 現在のスレッドの展開オブジェクトを取得 """
+    decompressor = getattr(_zstd_local, "decompressor", None)
+    if decompressor is None:
+        decompressor = _zstd_local.decompressor = zstandard.ZstdDecompressor()
+    return decompressor
+
+
+def dumps_compressed(obj: Any) -> bytes:
+    """ オブジェクトをJSONに変換し、zstdで圧縮
+
+    Args:
+        obj (Any): 変換するオブジェクト（numpyの数値・配列も可）
+    Returns:
+        bytes: zstdで圧縮したJSON
+    """
+    return _compressor().compress(orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY))
+
+
+async def dumps_compressed_in_thread(obj: Any) -> bytes:
+    """ 大きなオブジェクトをイベントループを止めずにJSONに変換し、zstdで圧縮
+
+    Args:
+        obj (Any): 変換するオブジェクト
+    Returns:
+        bytes: zstdで圧縮したJSON
+    """
+    return await asyncio.to_thread(dumps_compressed, obj)
+
+
+def decompress(data: Union[str, bytes]) -> Union[str, bytes]:
+    """ zstdで圧縮されたJSONを展開（圧縮されていない値はそのまま返す）
+
+    Args:
+        data (Union[str, bytes]): 圧縮されたJSON、または圧縮前のJSON文字列
+    Returns:
+        Union[str, bytes]: JSON文字列
+    """
+    if isinstance(data, (bytes, bytearray)) and data[:4] == ZSTD_MAGIC:
+        return _decompressor().decompress(data)
+    return data
@@ -0,0 +1,88 @@
+# src/utils/ttl_cache.py
+
+import functools
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class TTLCache:
+    """ 有効期限付きのLRUキャッシュ """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        """
+        Args:
+            maxsize (int): 保持する最大件数
+            ttl (float): 有効期限（秒）
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """ キャッシュから値を取得
+
+        Args:
+            key (Hashable): キャッシュキー
+        Returns:
+            Optional[Any]: キャッシュされた値。存在しないか期限切れの場合はNone
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.stats["misses"] += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """ キャッシュに値を保存（上限を超えた場合は最も古いものから削除）
+
+        Args:
+            key (Hashable): キャッシュキー
+            value (Any): 保存する値
+        """
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """ キャッシュを全て削除 """
+        self._entries.clear()
+
+
+def async_ttl_cache(maxsize: int = 1024, ttl: float = 300):
+    """ 非同期メソッドの結果を引数ごとにキャッシュするデコレータ
+    キャッシュはクラス全体で共有し、selfはキーに含めない。Noneの結果はキャッシュしない。
+    戻り値は呼び出し元間で共有されるため、変更しないこと
+
+    Args:
+        maxsize (int): 保持する最大件数
+        ttl (float): 有効期限（秒）
+    Returns:
+        Callable: デコレータ（ラップした関数のcache属性からTTLCacheを参照できる）
+    """
+    def decorator(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+        @functools.wraps(func)
+        async def wrapper(self, *args: Any, **kwargs: Any) -> T:
+            key = (args, tuple(sorted(kwargs.items()))) if kwargs else args
+            value = cache.get(key)
+            if value is None:
+                value = await func(self, *args, **kwargs)
+                if value is not None:
+                    cache.set(key, value)
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
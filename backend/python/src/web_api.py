@@ -1,81 +1,182 @@
 # src/web_api/web_api.py
 
+from typing import Any, Dict, Union
+
 from aiohttp import web
-import json
+import hmac
 import logging
-from datetime import datetime
+import os
 
 from src.database.repositories.drawings_repository import DrawingsRepository
+from src.database.repositories.scene_repository import SceneRepository
+from src.database.repositories.shape_repository import ShapeRepository
+from src.utils import json_io
 
 logger = logging.getLogger(__name__)
 
+# 一覧取得時にまとめて送信する行数
+STREAM_CHUNK_ROWS = 500
+# draw_linesのJSONがこのサイズ以上の描画データは、レスポンス全体を作らずに分割して送信する
+STREAM_MIN_BYTES = 1024 * 1024
+# 分割して送信する際の1回あたりのサイズ
+STREAM_CHUNK_BYTES = 64 * 1024
+# 管理用API（キャッシュ削除）の認証トークン（未設定の場合は管理用APIを公開しない）
+ADMIN_TOKEN_ENV = "ADMIN_API_TOKEN"
+
+
+def json_response(data: Dict[str, Any], status: int = 200) -> web.Response:
+    """ orjsonでシリアライズしたJSONレスポンスを作成（datetimeはISO形式で出力される）
+
+    Args:
+        data: レスポンスのデータ
+        status: HTTPステータスコード
+
+    Returns:
+        web.Response: レスポンス
+    """
+    return web.json_response(data, status=status, dumps=json_io.dumps)
+
 
 class WebAPI:
     def __init__(self):
         self.drawings_repository = DrawingsRepository()
+        self.admin_token = os.getenv(ADMIN_TOKEN_ENV, "")
         self.app = web.Application()
         self.setup_routes()
 
-    def datetime_handler(self, obj):
-        """datetimeオブジェクトをISO形式の文字列に変換
-
-        Args:
-            obj: datetimeオブジェクト
-        """
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
-
     def setup_routes(self):
         """ルーティングを設定"""
         self.app.router.add_get("/api/drawings", self.fetch_drawings)
         self.app.router.add_get("/api/drawings/{id}", self.fetch_drawing)
+        if self.admin_token:
+            self.app.router.add_post("/api/cache/clear", self.clear_master_cache)
         self.app.add_routes([web.static("/viewer", "/usr/share/nginx/html/frontend/public")])
 
-    async def fetch_drawings(self, request: web.Request) -> web.Response:
+    async def fetch_drawings(self, request: web.Request) -> web.StreamResponse:
         """ 描画データの一覧を取得
+        DBから取得した行を順次JSONに変換して送信し、一覧全体をメモリに保持しない
 
         Args:
             request: リクエスト情報
 
         Returns:
-            web.Response: レスポンス
+            web.StreamResponse: レスポンス
         """
+        drawings = None
         try:
-            drawings = await self.drawings_repository.get_drawings()
-            return web.json_response(
-                {"success": True, "data": drawings},
-                dumps=lambda obj: json.dumps(obj, default=self.datetime_handler),
-            )
-        except Exception as e:
-            logger.error(f"Error fetching drawings: {e}")
-            return web.json_response({"success": False, "error": str(e)}, status=500)
-
-    async def fetch_drawing(self, request: web.Request) -> web.Response:
+            try:
+                drawings = self.drawings_repository.iter_drawings()
+                # 最初の行の取得までに失敗した場合はエラーレスポンスを返す
+                first = await drawings.__anext__()
+            except StopAsyncIteration:
+                first = None
+            except Exception as e:
+                logger.error("Error fetching drawings: %s", e)
+                return json_response({"success": False, "error": str(e)}, status=500)
+
+            response = web.StreamResponse(headers={"Content-Type": "application/json"})
+            await response.prepare(request)
+            await response.write(b'{"success":true,"data":[')
+            if first is not None:
+                chunk = [json_io.dumps(first)]
+                separator = b""
+                try:
+                    async for drawing in drawings:
+                        chunk.append(json_io.dumps(drawing))
+                        if len(chunk) >= STREAM_CHUNK_ROWS:
+                            await response.write(separator + ",".join(chunk).encode())
+                            chunk, separator = [], b","
+                except Exception as e:
+                    # 送信開始後はステータスを変更できないため、ログに残して接続を切断する
+                    logger.error("Error streaming drawings: %s", e)
+                    raise
+                if chunk:
+                    await response.write(separator + ",".join(chunk).encode())
+            await response.write(b"]}")
+            await response.write_eof()
+            return response
+        finally:
+            # クライアントの切断や送信の失敗で中断した場合も、読み残した行のある接続をすぐにプールへ返す
+            if drawings is not None:
+                await drawings.aclose()
+
+    async def fetch_drawing(self, request: web.Request) -> web.StreamResponse:
         """ 特定の描画データを取得
 
         Args:
             request: リクエスト情報
 
         Returns:
-            web.Response: レスポンス
+            web.StreamResponse: レスポンス
         """
         try:
             drawing_id = request.match_info["id"]
-            drawing = await self.drawings_repository.get_drawing(drawing_id)
+            # draw_linesはDBのJSON文字列をパースせずにそのままレスポンスへ埋め込む
+            drawing = await self.drawings_repository.get_drawing(drawing_id, parse_draw_lines=False)
 
             if drawing is None:
-                return web.json_response(
-                    {"success": False, "error": "Drawing not found"}, status=404
-                )
-
-            return web.json_response(
-                {"success": True, "data": drawing},
-                dumps=lambda obj: json.dumps(obj, default=self.datetime_handler),
-            )
+                return json_response({"success": False, "error": "Drawing not found"}, status=404)
+
+            draw_lines = drawing.pop("draw_lines", None)
+            if draw_lines is not None and len(draw_lines) >= STREAM_MIN_BYTES:
+                return await self._stream_drawing(request, drawing, draw_lines)
+            if draw_lines is not None:
+                drawing["draw_lines"] = json_io.raw(draw_lines)
+
+            return json_response({"success": True, "data": drawing})
         except Exception as e:
-            logger.error(f"Error fetching drawing {drawing_id}: {e}")
-            return web.json_response({"success": False, "error": str(e)}, status=500)
+            logger.error("Error fetching drawing %s: %s", drawing_id, e)
+            return json_response({"success": False, "error": str(e)}, status=500)
+
+    async def _stream_drawing(
+        self, request: web.Request, drawing: Dict[str, Any], draw_lines: Union[str, bytes]
+    ) -> web.StreamResponse:
+        """ draw_linesの大きい描画データを分割して送信
+        draw_lines以外の項目を先に送信し、draw_linesのJSONは一定サイズごとに送信する
+
+        Args:
+            request: リクエスト情報
+            drawing: draw_lines以外の描画データ
+            draw_lines: draw_linesのJSON文字列
+
+        Returns:
+            web.StreamResponse: レスポンス
+        """
+        # 末尾の"}}"を外し、draw_linesを最後の項目として続ける
+        head = json_io.dumps({"success": True, "data": drawing})[:-2]
+        separator = "," if drawing else ""
+
+        response = web.StreamResponse(headers={"Content-Type": "application/json"})
+        await response.prepare(request)
+        await response.write(f'{head}{separator}"draw_lines":'.encode())
+        if isinstance(draw_lines, str):
+            for i in range(0, len(draw_lines), STREAM_CHUNK_BYTES):
+                await response.write(draw_lines[i:i + STREAM_CHUNK_BYTES].encode())
+        else:
+            view = memoryview(draw_lines)
+            for i in range(0, len(view), STREAM_CHUNK_BYTES):
+                await response.write(view[i:i + STREAM_CHUNK_BYTES])
+        await response.write(b"}}")
+        await response.write_eof()
+        return response
+
+    async def clear_master_cache(self, request: web.Request) -> web.Response:
+        """ マスタデータ（シーン・形状）のキャッシュを削除
+
+        Args:
+            request: リクエスト情報
+
+        Returns:
+            web.Response: レスポンス
+        """
+        # Authorization: Bearer <ADMIN_API_TOKEN> を指定したリクエストのみ受け付ける
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme != "Bearer" or not hmac.compare_digest(token.encode(), self.admin_token.encode()):
+            return json_response({"success": False, "error": "Unauthorized"}, status=401)
+        ShapeRepository.clear_cache()
+        SceneRepository.clear_cache()
+        logger.info("Master data cache cleared")
+        return json_response({"success": True})
 
     async def run(self, host: str = "0.0.0.0", port: int = 8080):
         """ サーバーを起動 
@@ -88,4 +189,4 @@ class WebAPI:
         await runner.setup()
         site = web.TCPSite(runner, host, port)
         await site.start()
-        logger.info(f"REST API server started on {host}:{port}")
+        logger.info("REST API server started on %s:%s", host, port)
@@ -0,0 +1,29 @@
+# tests/conftest.py
+
+import asyncio
+import pytest
+from pytest_asyncio import is_async_test
+
+try:
+    import uvloop
+except ImportError:
+    # uvloopが使えない環境（Windowsなど）では標準のイベントループを使用する
+    uvloop = None
+
+
+def pytest_configure(config):
+    """ 本番（main.py）と同じくuvloopのイベントループでテストを実行
+    pytest-asyncioは現在のイベントループポリシーでループを作成するため、フィクスチャを上書きせずにポリシーを設定する
+    """
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+
+def pytest_collection_modifyitems(items):
+    """ 非同期のテストもセッション全体で1つのイベントループを共有する（テストごとにループを生成しない）
+    非同期のフィクスチャのループはpyproject.tomlのasyncio_default_fixture_loop_scopeで指定する
+    """
+    session_loop = pytest.mark.asyncio(loop_scope="session")
+    for item in items:
+        if is_async_test(item):
+            item.add_marker(session_loop, append=False)
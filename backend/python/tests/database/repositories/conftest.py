@@ -0,0 +1,216 @@
+# tests/database/repositories/conftest.py
+
+import pytest
+from contextlib import asynccontextmanager
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Optional
+
+from src.database.connection import DatabaseConnection
+from src.database.repositories.drawings_repository import DrawingsRepository
+from src.database.repositories.error_logs_repository import ErrorLogsRepository
+from src.database.repositories.result_details_repository import ResultDetailsRepository
+from src.database.repositories.results_repository import ResultsRepository
+from src.database.repositories.scene_repository import SceneRepository
+from src.database.repositories.shape_repository import ShapeRepository
+
+# テストデータで共通のID
+_DRAWING_ID = "00000000-0000-0000-0000-000000000101"
+_RESULT_ID = "00000000-0000-0000-0000-000000000201"
+_ERROR_ID = "00000000-0000-0000-0000-000000000301"
+
+
+class FakeCursor:
+    """ aiomysqlのカーソルのスタブ
+    実行したクエリを記録し、rowsに設定した行を結果として返す
+    """
+
+    def __init__(self, db: "FakeDatabase"):
+        self._db = db
+        self.rowcount = 0
+        self._offset = 0
+
+    async def __aenter__(self) -> "FakeCursor":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._db.closed_cursors += 1
+
+    async def execute(self, query: str, params: Any = None) -> int:
+        # 呼び出し元が実行後にパラメータを書き換えても、実行時の値を検証できるようコピーして記録する
+        self._db.executed.append((query, dict(params) if isinstance(params, dict) else params))
+        if self._db.error is not None:
+            raise self._db.error
+        if self._db.check is not None:
+            self._db.check(params)
+        self.rowcount = self._db.rowcount
+        return self.rowcount
+
+    async def executemany(self, query: str, params_list: Any) -> int:
+        self._db.executed_many.append((query, list(params_list)))
+        if self._db.error is not None:
+            raise self._db.error
+        self.rowcount = self._db.rowcount
+        return self.rowcount
+
+    async def fetchall(self) -> List[Dict[str, Any]]:
+        return list(self._db.rows)
+
+    async def fetchmany(self, size: int) -> List[Dict[str, Any]]:
+        rows = self._db.rows[self._offset:self._offset + size]
+        self._offset += len(rows)
+        return list(rows)
+
+
+class FakeConnection:
+    """ aiomysqlの接続のスタブ（取得したカーソルの種類を記録する） """
+
+    def __init__(self, db: "FakeDatabase"):
+        self._db = db
+
+    def cursor(self, cursor_class: Optional[type] = None) -> FakeCursor:
+        self._db.cursor_classes.append(cursor_class)
+        return FakeCursor(self._db)
+
+
+class FakeDatabase:
+    """ DatabaseConnection.acquireが返す接続の差し替え先
+    テストごとに返す行・更新行数・例外を設定し、実行されたクエリを検証する
+    checkにはパラメータに応じて例外を送出する関数を設定できる
+    """
+
+    def __init__(self):
+        self.rows: List[Dict[str, Any]] = []
+        self.rowcount = 0
+        self.error: Optional[Exception] = None
+        self.check: Optional[Callable[[Any], None]] = None
+        self.executed: List[tuple] = []
+        self.executed_many: List[tuple] = []
+        self.cursor_classes: List[Optional[type]] = []
+        self.closed_cursors = 0
+        self.connection = FakeConnection(self)
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.connection
+
+
+@pytest.fixture
+def fake_db(monkeypatch) -> FakeDatabase:
+    """ リポジトリのクエリをFakeDatabaseで実行する（テスト終了時に自動で元に戻す） """
+    db = FakeDatabase()
+    monkeypatch.setattr(DatabaseConnection, "acquire", db.acquire)
+    return db
+
+
+@pytest.fixture(autouse=True)
+def _clear_master_cache():
+    """ マスタデータのキャッシュをテストごとに削除（他のテストの取得結果を返さないようにする） """
+    SceneRepository.clear_cache()
+    ShapeRepository.clear_cache()
+    yield
+    SceneRepository.clear_cache()
+    ShapeRepository.clear_cache()
+
+
+@pytest.fixture(scope="session")
+def drawings_repo():
+    """ テスト全体で共有する描画データのリポジトリ """
+    return DrawingsRepository()
+
+
+@pytest.fixture(scope="session")
+def error_logs_repo():
+    """ テスト全体で共有するエラーログのリポジトリ """
+    return ErrorLogsRepository()
+
+
+@pytest.fixture(scope="session")
+def result_details_repo():
+    """ テスト全体で共有するリザルト詳細のリポジトリ """
+    return ResultDetailsRepository()
+
+
+@pytest.fixture(scope="session")
+def results_repo():
+    """ テスト全体で共有するリザルトのリポジトリ """
+    return ResultsRepository()
+
+
+@pytest.fixture(scope="session")
+def scene_repo():
+    """ テスト全体で共有するシーンのリポジトリ """
+    return SceneRepository()
+
+
+@pytest.fixture(scope="session")
+def shape_repo():
+    """ テスト全体で共有する形状のリポジトリ """
+    return ShapeRepository()
+
+
+@pytest.fixture(scope="session")
+def mock_drawing_data():
+    """ テスト用の描画データを生成 """
+    return MappingProxyType({
+        "drawing_id": _DRAWING_ID,
+        "scene_id": "test_scene",
+        "draw_timestamp": 1705708800000,
+        "draw_lines": [
+            {
+                "positions": [{"x": 0.0, "y": 0.0, "z": 0.0}, {"x": 1.0, "y": 0.5, "z": 0.0}],
+                "width": 0.01,
+                "color": {"r": 1.0, "g": 0.0, "b": 0.0, "a": 1.0},
+            }
+        ],
+        "center_x": 0.0,
+        "center_y": 0.0,
+        "center_z": 0.0,
+        "use_ai": True,
+        "client_id": "test_client",
+        "client_info": {"type": 1, "device_id": "device123"},
+        "metadata": {"test_key": "test_value"},
+    })
+
+
+@pytest.fixture(scope="session")
+def mock_result_data():
+    """ テスト用のリザルトデータを生成 """
+    return MappingProxyType({
+        "result_id": _RESULT_ID,
+        "drawing_id": _DRAWING_ID,
+        "shape_id": "circle",
+        "success": True,
+    })
+
+
+@pytest.fixture(scope="session")
+def mock_result_detail_data():
+    """ テスト用のリザルト詳細データを生成 """
+    return MappingProxyType({
+        "result_id": _RESULT_ID,
+        "drawing_id": _DRAWING_ID,
+        "scene_id": "test_scene",
+        "shape_id": "circle",
+        "success": True,
+        "score": 95,
+        "reasoning": "Test AI reasoning",
+        "process_time_ms": 250,
+        "model_name": "test_model",
+        "api_response": {"shape_id": "circle", "score": 95},
+        "error_message": "",
+        "client_id": "test_client",
+    })
+
+
+@pytest.fixture(scope="session")
+def mock_error_log_data():
+    """ テスト用のエラーログデータを生成 """
+    return MappingProxyType({
+        "error_id": _ERROR_ID,
+        "result_id": _RESULT_ID,
+        "drawing_id": _DRAWING_ID,
+        "scene_id": "test_scene",
+        "error_type": "ValueError",
+        "error_message": "Test error",
+        "stack_trace": "Traceback ...",
+    })
@@ -1,99 +1,106 @@
 # tests/database/repositories/test_base_repository.py
 
+import aiomysql
 import pytest
-from unittest.mock import MagicMock, patch
 
 from src.database.repositories.base_repository import BaseRepository
 
+_ROWS = [
+    {"drawing_id": "00000000-0000-0000-0000-000000000001", "use_ai": True},
+    {"drawing_id": "00000000-0000-0000-0000-000000000002", "use_ai": False},
+    {"drawing_id": "00000000-0000-0000-0000-000000000003", "use_ai": True},
+]
 
-class TestBaseRepository:
-    def test_ensure_connection_success(self):
-        """ データベース接続の確立テスト - 成功ケース
-        - データベース接続が正常に確立されること
-        - 接続オブジェクトが正確に設定されること
-        """
-        mock_connection = MagicMock()
 
-        with patch(
-            "src.database.repositories.base_repository.DatabaseConnection.get_connection",
-            return_value=mock_connection,
-        ):
-            repository = BaseRepository()
+@pytest.fixture(scope="module")
+def repository():
+    """ モジュール内で共有するリポジトリ """
+    return BaseRepository()
 
-            assert repository.conn == mock_connection
 
-    def test_ensure_connection_failure(self):
-        """ データベース接続の確立テスト - 失敗ケース
-        - 接続失敗時にコネクションオブジェクトがNoneになること
-        - 例外が適切に処理されること
+class TestBaseRepository:
+    async def test_execute_query(self, repository, fake_db):
+        """ クエリ実行テスト
+        - 取得した全ての行が返されること
+        - クエリとパラメータがそのまま実行されること
+        - 辞書形式のカーソルが使われること
         """
-        with patch(
-            "src.database.repositories.base_repository.DatabaseConnection.get_connection",
-            side_effect=Exception("Connection failed"),
-        ):
-            repository = BaseRepository()
-
-            assert repository.conn is None
-
-    def test_execute_with_retry_success(self):
-        """ _execute_with_retryメソッドのテスト - 成功ケース
-        - 操作が正常に実行されること
-        - 期待する戻り値が返されること
-        - 操作が1回で成功すること
+        fake_db.rows = _ROWS
+
+        rows = await repository.execute_query("SELECT * FROM drawings WHERE use_ai = %s", (True,))
+
+        assert rows == _ROWS
+        assert fake_db.executed == [("SELECT * FROM drawings WHERE use_ai = %s", (True,))]
+        assert fake_db.cursor_classes == [aiomysql.DictCursor]
+        assert fake_db.closed_cursors == 1
+
+    @pytest.mark.parametrize(
+        "rows,expected",
+        [(_ROWS, _ROWS[0]), ([], None)],
+        ids=["found", "not_found"],
+    )
+    async def test_execute_one(self, repository, fake_db, rows, expected):
+        """ 1件取得テスト
+        - 最初の行が返されること
+        - 結果がない場合はNoneが返されること
         """
-        mock_connection = MagicMock()
+        fake_db.rows = rows
 
-        def test_operation(arg1, arg2):
-            return arg1 + arg2
+        assert await repository.execute_one("SELECT * FROM drawings") == expected
 
-        with patch(
-            "src.database.repositories.base_repository.DatabaseConnection.get_connection",
-            return_value=mock_connection,
-        ):
-            repository = BaseRepository()
+    async def test_execute_update(self, repository, fake_db):
+        """ 更新クエリ実行テスト
+        - 更新された行数が返されること
+        - クエリとパラメータがそのまま実行されること
+        """
+        fake_db.rowcount = 1
+        params = {"drawing_id": _ROWS[0]["drawing_id"]}
 
-            result = repository._execute_with_retry(test_operation, 2, 3)
+        count = await repository.execute_update("DELETE FROM drawings WHERE drawing_id = %(drawing_id)s", params)
 
-            assert result == 5
+        assert count == 1
+        assert fake_db.executed == [("DELETE FROM drawings WHERE drawing_id = %(drawing_id)s", params)]
 
-    def test_execute_with_retry_connection_failure(self):
-        """ _execute_with_retryメソッド - 接続失敗リトライテスト
-        - 複数回の接続失敗後に操作が成功すること
-        - リトライメカニズムが正常に動作すること
-        - 最終的に期待する結果が返されること
+    async def test_execute_many(self, repository, fake_db):
+        """ 一括更新クエリ実行テスト
+        - 全てのパラメータが1回のexecutemanyで実行されること
+        - 更新された行数が返されること
         """
-        # テスト用の操作関数
-        def test_operation():
-            return "success"
-
-        with patch(
-            "src.database.repositories.base_repository.DatabaseConnection.get_connection",
-            side_effect=[
-                Exception("First connection failed"),
-                Exception("Second connection failed"),
-                MagicMock(),  # 3回目の呼び出しで成功
-            ],
-        ):
-            repository = BaseRepository()
-
-            result = repository._execute_with_retry(test_operation)
-
-            assert result == "success"
-
-    def test_execute_with_retry_ultimate_failure(self):
-        """ _execute_with_retryメソッド - 最終的な接続失敗
-        - すべての接続試行が失敗した場合に例外が発生すること
-        - 例外メッセージが適切であること
+        fake_db.rowcount = 2
+        params_list = [{"drawing_id": row["drawing_id"]} for row in _ROWS[:2]]
+
+        count = await repository.execute_many("DELETE FROM drawings WHERE drawing_id = %(drawing_id)s", params_list)
+
+        assert count == 2
+        assert fake_db.executed == []
+        assert fake_db.executed_many == [("DELETE FROM drawings WHERE drawing_id = %(drawing_id)s", params_list)]
+
+    async def test_stream_query(self, repository, fake_db):
+        """ ストリーミング取得テスト
+        - chunk_sizeごとに取得した行が順番どおりに1行ずつ返されること
+        - サーバーサイドカーソルが使われること
         """
-        # テスト用の操作関数
-        def test_operation():
-            return "success"
-
-        with patch(
-            "src.database.repositories.base_repository.DatabaseConnection.get_connection",
-            side_effect=Exception("Connection always fails"),
-        ):
-            repository = BaseRepository()
-
-            with pytest.raises(Exception, match="Could not establish database connection"):
-                repository._execute_with_retry(test_operation)
+        fake_db.rows = _ROWS
+
+        rows = [row async for row in repository.stream_query("SELECT * FROM drawings", chunk_size=2)]
+
+        assert rows == _ROWS
+        assert fake_db.cursor_classes == [aiomysql.SSDictCursor]
+
+    @pytest.mark.parametrize(
+        "method,args",
+        [
+            ("execute_query", ("SELECT 1",)),
+            ("execute_update", ("DELETE FROM drawings",)),
+            ("execute_many", ("DELETE FROM drawings WHERE drawing_id = %s", [("id",)])),
+        ],
+        ids=["execute_query", "execute_update", "execute_many"],
+    )
+    async def test_error_is_raised(self, repository, fake_db, method, args):
+        """ クエリ失敗テスト
+        - データベースの例外が呼び出し元に送出されること
+        """
+        fake_db.error = RuntimeError("Query failed")
+
+        with pytest.raises(RuntimeError, match="Query failed"):
+            await getattr(repository, method)(*args)
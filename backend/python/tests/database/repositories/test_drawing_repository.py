@@ -1,247 +1,162 @@
 # tests/database/repositories/test_drawings_repository.py
 
-import json
-import uuid
+import pymysql
 import pytest
-from unittest.mock import MagicMock, patch
 from datetime import datetime
 
-from src.database.repositories.drawings_repository import DrawingsRepository
+from src.database.repositories.drawings_repository import DrawingsRepository, ER_INVALID_JSON_CHARSET
+from src.utils import json_io
 
+# テストデータの作成日時（値は検証しないため固定）
+_FIXED_NOW = datetime(2024, 1, 1, 0, 0, 0)
 
+# テスト内で使う任意のID
+_ARBITRARY_ID_1 = "00000000-0000-0000-0000-000000000001"
+_ARBITRARY_ID_2 = "00000000-0000-0000-0000-000000000002"
+
+_DRAW_LINES = [{"positions": [{"x": 0.0, "y": 0.0, "z": 0.0}], "width": 0.01, "color": None}]
+
+# get_drawingのテストでDBから返す描画データ（draw_linesは行ごとに設定する）
+_TEST_DRAWING = {
+    "drawing_id": "00000000-0000-0000-0000-000000000201",
+    "scene_id": "test_scene",
+    "draw_timestamp": 1705708800000,
+    "center_x": 0.0,
+    "center_y": 0.0,
+    "center_z": 0.0,
+    "use_ai": True,
+    "client_id": "test_client",
+    "client_info": json_io.dumps({"type": 1}),
+    "metadata": json_io.dumps({"test_key": "test_value"}),
+    "created_at": _FIXED_NOW,
+}
+
+_LIST_ROWS = [
+    {"drawing_id": _ARBITRARY_ID_1, "draw_timestamp": 1705708800000, "created_at": _FIXED_NOW, "use_ai": True},
+    {"drawing_id": _ARBITRARY_ID_2, "draw_timestamp": 1705708800001, "created_at": _FIXED_NOW, "use_ai": False},
+]
+
+
+@pytest.fixture
+def json_draw_lines_column(monkeypatch):
+    """ 移行前のデータベース（draw_linesがJSON型）かどうかの判定をテスト後に元に戻す """
+    monkeypatch.setattr(DrawingsRepository, "_json_draw_lines", False)
+
+
+@pytest.mark.usefixtures("json_draw_lines_column")
 class TestDrawingsRepository:
-    @pytest.fixture
-    def mock_drawing_data(self):
-        """ テスト用の描画データを生成 """
-        return {
-            "id": str(uuid.uuid4()),
-            "scene_id": "test_scene",
-            "client_id": "test_client",
-            "client_info": {
-                "type": 1,
-                "device_id": "device123",
-                "device_name": "Test Device",
-                "system_info": "Test System",
-                "app_version": "1.0.0",
-            },
-            "draw_timestamp": 1705708800000,
-            "data": {"draw_lines": []},
-            "center_x": 0.0,
-            "center_y": 0.0,
-            "center_z": 0.0,
-            "metadata": {"test_key": "test_value"},
-            "ai_processing": True,
-            "processed": False,
-        }
-
-    @pytest.fixture
-    def mock_connection_and_cursor(self):
-        """ モックされた接続とカーソルを生成 """
-        mock_connection = MagicMock()
-        mock_cursor = MagicMock()
-        mock_connection.cursor.return_value = mock_cursor
-        return mock_connection, mock_cursor
-
-    def test_insert_drawings(
-            self,
-            mock_drawing_data,
-            mock_connection_and_cursor
-            ):
+    async def test_insert_drawings(self, drawings_repo, mock_drawing_data, fake_db):
         """ 描画データの挿入テスト
-        - 挿入した描画IDが期待値と一致すること
-        - データベースへの挿入クエリが1回実行されること
-        - 挿入パラメータが正確であること
-        - トランザクションがコミットされること
-        - カーソルがクローズされること
+        - 挿入した描画IDが返されること
+        - 挿入クエリが1回実行されること
+        - draw_linesがzstdで圧縮されたJSONで保存されること
+        - client_info・metadataがJSON文字列で保存されること
+        """
+        drawing_id = await drawings_repo.insert_drawings(mock_drawing_data)
+
+        assert drawing_id == mock_drawing_data["drawing_id"]
+        assert len(fake_db.executed) == 1
+        query, params = fake_db.executed[0]
+        assert "INSERT INTO drawings" in query
+        assert params["drawing_id"] == mock_drawing_data["drawing_id"]
+        assert params["scene_id"] == "test_scene"
+        assert params["draw_timestamp"] == 1705708800000
+        assert params["draw_lines"][:4] == json_io.ZSTD_MAGIC
+        assert json_io.loads(json_io.decompress(params["draw_lines"])) == mock_drawing_data["draw_lines"]
+        assert params["use_ai"] is True
+        assert json_io.loads(params["client_info"]) == mock_drawing_data["client_info"]
+        assert json_io.loads(params["metadata"]) == mock_drawing_data["metadata"]
+
+    async def test_insert_drawings_into_json_column(self, drawings_repo, mock_drawing_data, fake_db):
+        """ 移行前のデータベースへの挿入テスト
+        - 圧縮したdraw_linesが拒否された場合、JSON文字列で挿入し直すこと
+        - 以降の挿入は最初からJSON文字列で行うこと
+        """
+        def reject_compressed(params):
+            # JSON型の列はバイナリ文字セットの文字列（aiomysqlが送るbytes）を受け付けない
+            if isinstance(params["draw_lines"], bytes):
+                raise pymysql.err.OperationalError(
+                    ER_INVALID_JSON_CHARSET,
+                    "Cannot create a JSON value from a string with CHARACTER SET 'binary'.",
+                )
+
+        fake_db.check = reject_compressed
+
+        await drawings_repo.insert_drawings(mock_drawing_data)
+        await drawings_repo.insert_drawings(mock_drawing_data)
+
+        draw_lines = [params["draw_lines"] for _, params in fake_db.executed]
+        assert isinstance(draw_lines[0], bytes)
+        assert draw_lines[1:] == [json_io.dumps(mock_drawing_data["draw_lines"])] * 2
+
+    async def test_insert_drawings_error(self, drawings_repo, mock_drawing_data, fake_db):
+        """ 挿入失敗テスト
+        - JSON列以外の原因のエラーはそのまま送出されること
         """
-        mock_connection, mock_cursor = mock_connection_and_cursor
-
-        with patch(
-            "src.database.repositories.drawings_repository.DatabaseConnection.get_connection",
-            return_value=mock_connection,
-        ):
-
-            def mock_ensure_connection(self):
-                self.conn = mock_connection
-
-            # モンキーパッチで_ensure_connectionメソッドを置き換え
-            original_method = DrawingsRepository._ensure_connection
-            DrawingsRepository._ensure_connection = mock_ensure_connection
-
-            try:
-                repository = DrawingsRepository()
-                result_id = repository.insert_drawings(mock_drawing_data)
-
-                assert result_id == mock_drawing_data["id"]
-                mock_cursor.execute.assert_called_once()
-
-                # クエリパラメータの検証
-                called_args = mock_cursor.execute.call_args[0]
-                assert "INSERT INTO drawings" in called_args[0]
-                params = called_args[1]
-
-                # パラメータの詳細検証
-                assert params["id"] == mock_drawing_data["id"]
-                assert params["scene_id"] == "test_scene"
-                assert params["client_id"] == "test_client"
-                assert params["client_info"] == json.dumps(
-                    mock_drawing_data["client_info"]
-                    )
-                assert params["draw_timestamp"] == 1705708800000
-                assert params["data"] == json.dumps(mock_drawing_data["data"])
-                assert params["center_x"] == 0.0
-                assert params["center_y"] == 0.0
-                assert params["center_z"] == 0.0
-                assert params["metadata"] == json.dumps(
-                    mock_drawing_data["metadata"]
-                    )
-                assert params["ai_processing"] is True
-                assert params["processed"] is False
-
-                mock_connection.commit.assert_called_once()
-                mock_cursor.close.assert_called_once()
-            finally:
-                DrawingsRepository._ensure_connection = original_method
-
-    @pytest.mark.asyncio
-    async def test_get_drawings(self, mock_connection_and_cursor):
+        fake_db.error = pymysql.err.IntegrityError(1062, "Duplicate entry")
+
+        with pytest.raises(pymysql.err.IntegrityError):
+            await drawings_repo.insert_drawings(mock_drawing_data)
+        assert len(fake_db.executed) == 1
+
+    async def test_get_drawings(self, drawings_repo, fake_db):
         """ 描画データの一覧取得テスト
-        - 描画データのリストが正常に取得されること
-        - 取得したデータの件数が期待値と一致すること
-        - 取得した描画のIDが正確であること
-        - 描画のタイムスタンプが正確であること
-        - データベース検索クエリが1回実行されること
-        - 全結果取得メソッドが1回呼ばれること
-        - カーソルがクローズされること
+        - 描画データのリストが取得されること
+        - 検索クエリが1回実行されること
         """
-        mock_connection, mock_cursor = mock_connection_and_cursor
-
-        # テストデータの準備
-        test_drawings = [
-            {
-                "id": str(uuid.uuid4()),
-                "draw_timestamp": 1705708800000,
-                "created_at": datetime.now(),
-                "ai_processing": True,
-                "processed": False,
-                "shape_id": "test_shape",
-            }
-        ]
-        mock_cursor.fetchall.return_value = test_drawings
-
-        with patch(
-            "src.database.repositories.drawings_repository.DatabaseConnection.get_connection",
-            return_value=mock_connection,
-        ):
-
-            def mock_ensure_connection(self):
-                self.conn = mock_connection
-
-            original_method = DrawingsRepository._ensure_connection
-            DrawingsRepository._ensure_connection = mock_ensure_connection
-
-            try:
-                repository = DrawingsRepository()
-                drawings = await repository.get_drawings()
-
-                assert len(drawings) == 1
-                assert drawings[0]["id"] == test_drawings[0]["id"]
-                assert drawings[0]["draw_timestamp"] == test_drawings[0][
-                    "draw_timestamp"
-                    ]
-                mock_cursor.execute.assert_called_once()
-                mock_cursor.fetchall.assert_called_once()
-                mock_cursor.close.assert_called_once()
-            finally:
-                DrawingsRepository._ensure_connection = original_method
-
-    @pytest.mark.asyncio
-    async def test_get_drawing(self, mock_connection_and_cursor):
+        fake_db.rows = _LIST_ROWS
+
+        drawings = await drawings_repo.get_drawings()
+
+        assert drawings == _LIST_ROWS
+        assert len(fake_db.executed) == 1
+
+    async def test_iter_drawings(self, drawings_repo, fake_db):
+        """ 描画データの一覧の逐次取得テスト
+        - 全ての描画データが順番どおりに返されること
+        """
+        fake_db.rows = _LIST_ROWS
+
+        drawings = [drawing async for drawing in drawings_repo.iter_drawings()]
+
+        assert drawings == _LIST_ROWS
+
+    @pytest.mark.parametrize(
+        "draw_lines",
+        [
+            json_io.dumps_compressed(_DRAW_LINES),
+            json_io.dumps(_DRAW_LINES).encode(),
+            json_io.dumps(_DRAW_LINES),
+        ],
+        ids=["compressed", "legacy_blob", "legacy_json_column"],
+    )
+    async def test_get_drawing(self, drawings_repo, fake_db, draw_lines):
         """ 特定の描画データ取得テスト
-        - 描画データが正常に取得されること
-        - 取得した描画のIDが正確であること
-        - データフィールドが正しく変換されること（辞書型）
-        - メタデータフィールドが正しく変換されること（辞書型）
-        - shape_idが正確であること
-        - データベース検索クエリが1回実行されること
-        - 結果取得メソッドが1回呼ばれること
-        - カーソルがクローズされること
+        - 圧縮されたdraw_linesと移行前の圧縮されていないdraw_linesのどちらもパースされること
+        - client_info・metadataが辞書に変換されること
         """
-        mock_connection, mock_cursor = mock_connection_and_cursor
-
-        # テストデータの準備
-        test_drawing_id = str(uuid.uuid4())
-        test_drawing = {
-            "id": test_drawing_id,
-            "draw_timestamp": 1705708800000,
-            "data": json.dumps({"draw_lines": []}),
-            "metadata": json.dumps({"test_key": "test_value"}),
-            "client_info": json.dumps({"type": 1}),
-            "center_x": 0.0,
-            "center_y": 0.0,
-            "center_z": 0.0,
-            "shape_id": "test_shape",
-            "confidence_score": 0.95,
-            "reasoning": "Test reasoning",
-        }
-        mock_cursor.fetchone.return_value = test_drawing
-
-        with patch(
-            "src.database.repositories.drawings_repository.DatabaseConnection.get_connection",
-            return_value=mock_connection,
-        ):
-
-            def mock_ensure_connection(self):
-                self.conn = mock_connection
-
-            original_method = DrawingsRepository._ensure_connection
-            DrawingsRepository._ensure_connection = mock_ensure_connection
-
-            try:
-                repository = DrawingsRepository()
-                drawing = await repository.get_drawing(test_drawing_id)
-
-                assert drawing is not None
-                assert drawing["id"] == test_drawing_id
-                assert isinstance(drawing["data"], dict)
-                assert isinstance(drawing["metadata"], dict)
-                assert drawing["shape_id"] == "test_shape"
-                mock_cursor.execute.assert_called_once()
-                mock_cursor.fetchone.assert_called_once()
-                mock_cursor.close.assert_called_once()
-            finally:
-                DrawingsRepository._ensure_connection = original_method
-
-    @pytest.mark.asyncio
-    async def test_get_drawing_not_found(self, mock_connection_and_cursor):
+        fake_db.rows = [dict(_TEST_DRAWING, draw_lines=draw_lines)]
+
+        drawing = await drawings_repo.get_drawing(_TEST_DRAWING["drawing_id"])
+
+        assert drawing["drawing_id"] == _TEST_DRAWING["drawing_id"]
+        assert drawing["draw_lines"] == _DRAW_LINES
+        assert drawing["metadata"] == {"test_key": "test_value"}
+        assert drawing["client_info"] == {"type": 1}
+        assert fake_db.executed[0][1] == (_TEST_DRAWING["drawing_id"],)
+
+    async def test_get_drawing_without_parsing(self, drawings_repo, fake_db):
+        """ draw_linesをパースしない描画データ取得テスト
+        - 展開済みのJSON文字列が返されること
+        """
+        fake_db.rows = [dict(_TEST_DRAWING, draw_lines=json_io.dumps_compressed(_DRAW_LINES))]
+
+        drawing = await drawings_repo.get_drawing(_TEST_DRAWING["drawing_id"], parse_draw_lines=False)
+
+        assert json_io.loads(drawing["draw_lines"]) == _DRAW_LINES
+
+    async def test_get_drawing_not_found(self, drawings_repo, fake_db):
         """ 存在しない描画データ取得テスト
-        - 存在しない描画IDで結果が取得できないこと（Noneが返されること）
-        - データベース検索クエリが1回実行されること
-        - 結果取得メソッドが1回呼ばれること
-        - カーソルがクローズされること
+        - Noneが返されること
         """
-        mock_connection, mock_cursor = mock_connection_and_cursor
-        mock_cursor.fetchone.return_value = None
-
-        with patch(
-            "src.database.repositories.drawings_repository.DatabaseConnection.get_connection",
-            return_value=mock_connection,
-        ):
-
-            def mock_ensure_connection(self):
-                self.conn = mock_connection
-
-            original_method = DrawingsRepository._ensure_connection
-            DrawingsRepository._ensure_connection = mock_ensure_connection
-
-            try:
-                repository = DrawingsRepository()
-                drawing = await repository.get_drawing(str(uuid.uuid4()))
-
-                # 検証
-                assert drawing is None
-                mock_cursor.execute.assert_called_once()
-                mock_cursor.fetchone.assert_called_once()
-                mock_cursor.close.assert_called_once()
-            finally:
-                DrawingsRepository._ensure_connection = original_method
+        assert await drawings_repo.get_drawing(_ARBITRARY_ID_1) is None
@@ -1,181 +1,166 @@
 # tests/database/test_connection.py
 
+import asyncio
 import os
 import pytest
-from unittest.mock import patch, MagicMock
-import mysql.connector
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, Mock
 
 from src.database.connection import DatabaseConnection
 
+
+class FakePool:
+    """ aiomysqlのコネクションプールのスタブ（acquireのたびに同じ接続を返す） """
+
+    def __init__(self):
+        self.conn = Mock()
+        self.conn.configure_mock(begin=AsyncMock(), commit=AsyncMock(), rollback=AsyncMock())
+        self.acquired = 0
+        self.close = Mock()
+        self.wait_closed = AsyncMock()
+
+    @asynccontextmanager
+    async def acquire(self):
+        self.acquired += 1
+        yield self.conn
+
+
+@pytest.fixture
+def fake_pool(mocker):
+    """ aiomysql.create_poolをスタブに差し替え、テストの前後でプールをリセット """
+    pool = FakePool()
+    create_pool = mocker.patch(
+        "src.database.connection.aiomysql.create_pool", AsyncMock(return_value=pool)
+    )
+    # キープアライブのタスクはテストでは実行しない
+    mocker.patch.object(DatabaseConnection, "_keepalive", AsyncMock())
+    DatabaseConnection._pool = None
+    DatabaseConnection._keepalive_task = None
+    yield pool, create_pool
+    DatabaseConnection._pool = None
+    DatabaseConnection._keepalive_task = None
+
+
 class TestDatabaseConnection:
-    @pytest.fixture(autouse=True)
-    def setup_method(self):
-        """各テスト前にデータベース接続インスタンスをリセット"""
-        DatabaseConnection._instance = None
-
-    @patch.dict(os.environ, {
-        "DB_ENV": "dev",
-        "DB_HOST": "test_host",
-        "DB_PORT": "3307",
-        "DB_NAME": "vrdb01",
-        "DB_USER": "test_user",
-        "DB_PASSWORD": "test_pass"
-    }, clear=True)
-    def test_get_connection_first_call(self):
-        """初回接続テスト
-        - 初回呼び出し時に新しいデータベース接続が作成されること
-        - 環境変数から取得した値が接続情報に使用されること
-        - 接続メソッドが正しいパラメータで呼び出されること
-        - コネクションプールが正しく設定されること
+    async def test_get_pool_first_call(self, mocker, fake_pool):
+        """ 初回のプール作成テスト
+        - 環境変数から取得した値でプールが作成されること
+        - 2回目以降は同じプールが返され、プールが1回だけ作成されること
         """
-        with patch("mysql.connector.connect") as mock_connect:
-            # モック接続オブジェクトの準備
-            mock_connection = MagicMock()
-            mock_connect.return_value = mock_connection
-            
-            # カーソルのモック作成
-            mock_cursor = MagicMock()
-            mock_connection.cursor.return_value = mock_cursor
-
-            # 接続メソッド呼び出し
-            connection = DatabaseConnection.get_connection()
-
-            # 接続パラメータの検証
-            mock_connect.assert_called_once_with(
-                host="test_host",
-                port=3306,
-                database="vrdb01",
-                user="test_user",
-                password="test_pass",
-                connection_timeout=10,
-                pool_name="vrdb_pool",
-                pool_size=5
-            )
-
-            # セッション設定の検証
-            mock_cursor.execute.assert_any_call(
-                "SET SESSION wait_timeout=28800"
-                )
-            mock_cursor.execute.assert_any_call("SET NAMES utf8mb4")
-            mock_cursor.close.assert_called_once()
-
-            # 返された接続オブジェクトの検証
-            assert connection == mock_connection
-
-    def test_get_connection_existing_connection(self):
-        """既存接続の再利用テスト
-        - 接続が有効な場合、後続の呼び出しで同じ接続インスタンスが返されること
-        - 既存の接続がアクティブな場合、接続が1回だけ作成されること
+        pool, create_pool = fake_pool
+        mocker.patch.dict(os.environ, {
+            "DB_HOST": "test_host",
+            "DB_NAME": "test_db",
+            "DB_USER": "test_user",
+            "DB_PASSWORD": "test_pass",
+            "DB_POOL_MIN": "2",
+            "DB_POOL_MAX": "8",
+            "DB_POOL_RECYCLE": "300",
+        }, clear=True)
+
+        first = await DatabaseConnection.get_pool()
+        second = await DatabaseConnection.get_pool()
+
+        assert first is second is pool
+        create_pool.assert_awaited_once()
+        kwargs = create_pool.call_args.kwargs
+        assert (kwargs["host"], kwargs["db"], kwargs["user"], kwargs["password"]) == (
+            "test_host", "test_db", "test_user", "test_pass"
+        )
+        assert (kwargs["minsize"], kwargs["maxsize"], kwargs["pool_recycle"]) == (2, 8, 300)
+        assert kwargs["autocommit"] is True
+
+    async def test_get_pool_with_default_values(self, mocker, fake_pool):
+        """ デフォルト値テスト
+        - 環境変数が設定されていない場合、デフォルト値でプールが作成されること
         """
-        with patch("mysql.connector.connect") as mock_connect:
-            # 有効な接続をモック
-            mock_connection = MagicMock()
-            mock_connection.is_connected.return_value = True
-            mock_connect.return_value = mock_connection
-
-            # セッション設定用のカーソルをモック
-            mock_cursor = MagicMock()
-            mock_connection.cursor.return_value = mock_cursor
-
-            # 最初の接続
-            first_connection = DatabaseConnection.get_connection()
-            # 2回目の接続
-            second_connection = DatabaseConnection.get_connection()
-
-            # 接続メソッドが1回だけ呼び出されたことを検証
-            mock_connect.assert_called_once()
-            # 同じ接続インスタンスが返されることを検証
-            assert first_connection == second_connection
-
-    def test_connection_timeout_handling(self):
-        """タイムアウト処理テスト
-        - 接続タイムアウトが発生した場合、適切に処理されること
-        - リトライロジックが正しく動作すること
+        _, create_pool = fake_pool
+        mocker.patch.dict(os.environ, clear=True)
+
+        await DatabaseConnection.get_pool()
+
+        kwargs = create_pool.call_args.kwargs
+        assert (kwargs["host"], kwargs["port"], kwargs["db"], kwargs["user"], kwargs["password"]) == (
+            "mysql", 3306, "vrdb01", "db_user", "db_pass"
+        )
+        assert (kwargs["minsize"], kwargs["maxsize"], kwargs["pool_recycle"]) == (4, 32, 600)
+
+    async def test_get_pool_failure(self, fake_pool):
+        """ プール作成失敗テスト
+        - 例外が呼び出し元に送出されること
+        - 失敗後もプールが未作成のままで、次の呼び出しで再作成されること
         """
-        with patch("mysql.connector.connect") as mock_connect, \
-                patch("time.sleep") as mock_sleep:
-            # タイムアウトエラーをシミュレート
-            mock_connect.side_effect = [
-                mysql.connector.errors.OperationalError(
-                    2013,  # CR_SERVER_LOST error number
-                    "Connection timed out"
-                ),
-                MagicMock()  # 2回目は成功
-            ]
-
-            # 接続の取得
-            DatabaseConnection.get_connection()
-
-            # 接続とリトライの検証
-            assert mock_connect.call_count == 2
-            assert mock_sleep.call_count == 1
-
-    def test_get_connection_retry_logic(self):
-        """接続リトライロジックテスト
-        - 接続が失敗した場合、リトライロジックが正しく動作すること
-        - メソッドが諦める前に複数回の再接続を試みること
-        - エラー時の待機時間が適切であること
+        pool, create_pool = fake_pool
+        create_pool.side_effect = [OSError("Connection refused"), pool]
+
+        with pytest.raises(OSError, match="Connection refused"):
+            await DatabaseConnection.get_pool()
+        assert DatabaseConnection._pool is None
+
+        assert await DatabaseConnection.get_pool() is pool
+
+    @pytest.mark.parametrize(
+        "rollback,raises,committed",
+        [(False, False, True), (True, False, False), (False, True, False)],
+        ids=["commit", "rollback", "error"],
+    )
+    async def test_transaction(self, fake_pool, rollback, raises, committed):
+        """ トランザクションテスト
+        - ブロック内のacquireはトランザクションの接続を返すこと
+        - 成功時はコミットし、rollback=Trueまたは例外の場合はロールバックすること
+        - ブロックを抜けた後のacquireはプールから接続を取得すること
         """
-        with patch("mysql.connector.connect") as mock_connect, \
-                patch("time.sleep") as mock_sleep:
-            # 接続失敗をシミュレート
-            mock_connect.side_effect = [
-                mysql.connector.Error("Connection failed"),
-                mysql.connector.Error("Connection failed"),
-                MagicMock()  # 3回目で成功
-            ]
-
-            # 接続の取得
-            DatabaseConnection.get_connection()
-
-            # リトライ回数と待機時間の検証
-            assert mock_connect.call_count == 3
-            assert mock_sleep.call_count == 2
-            mock_sleep.assert_any_call(2)  # 待機時間の検証
-
-    def test_close_connection(self):
-        """接続クローズテスト
-        - 接続が正しく閉じられること
-        - インスタンスがNoneにリセットされること
-        - コネクションプールが適切にクリーンアップされること
+        pool, _ = fake_pool
+
+        try:
+            async with DatabaseConnection.transaction(rollback=rollback) as conn:
+                async with DatabaseConnection.acquire() as inner:
+                    assert inner is conn
+                assert pool.acquired == 1
+                if raises:
+                    raise ValueError("Query failed")
+        except ValueError:
+            assert raises
+
+        conn.begin.assert_awaited_once()
+        assert conn.commit.await_count == int(committed)
+        assert conn.rollback.await_count == int(not committed)
+
+        async with DatabaseConnection.acquire():
+            pass
+        assert pool.acquired == 2
+
+    async def test_transaction_rejects_child_task(self, fake_pool):
+        """ トランザクション内で作成したタスクのテスト
+        - トランザクションの接続を別のタスクから取得するとRuntimeErrorになること
+        - プールから別の接続も取得しないこと
         """
-        with patch("mysql.connector.connect") as mock_connect:
-            # モック接続の準備
-            mock_connection = MagicMock()
-            mock_connect.return_value = mock_connection
-
-            # 接続の取得と終了
-            DatabaseConnection.get_connection()
-            DatabaseConnection.close_connection()
-
-            # クローズ処理の検証
-            mock_connection.close.assert_called_once()
-            assert DatabaseConnection._instance is None
-
-    def test_connection_with_default_values(self):
-        """デフォルト値テスト
-        - 環境変数が設定されていない場合、デフォルト値が使用されること
-        - デフォルトのコネクションプール設定が適用されること
+        pool, _ = fake_pool
+
+        async def query_in_child():
+            async with DatabaseConnection.acquire():
+                pass
+
+        async with DatabaseConnection.transaction(rollback=True):
+            with pytest.raises(RuntimeError, match="task created inside transaction"):
+                await asyncio.create_task(query_in_child())
+
+        assert pool.acquired == 1
+
+    async def test_close_pool(self, fake_pool):
+        """ プールのクローズテスト
+        - プールが閉じられ、Noneにリセットされること
+        - キープアライブのタスクがキャンセルされること
         """
-        with patch.dict(os.environ, clear=True), \
-                patch("mysql.connector.connect") as mock_connect:
-            # モック接続とカーソルの準備
-            mock_connection = MagicMock()
-            mock_connect.return_value = mock_connection
-            mock_cursor = MagicMock()
-            mock_connection.cursor.return_value = mock_cursor
-
-            # 接続の取得
-            DatabaseConnection.get_connection()
-
-            # デフォルト値での接続検証
-            mock_connect.assert_called_once_with(
-                host="mysql",
-                port=3306,
-                database="vrdb01",
-                user="db_user",
-                password="db_pass",
-                connection_timeout=10,
-                pool_name="vrdb_pool",
-                pool_size=5
-            )
+        pool, _ = fake_pool
+        await DatabaseConnection.get_pool()
+        keepalive_task = DatabaseConnection._keepalive_task
+
+        await DatabaseConnection.close_pool()
+
+        pool.close.assert_called_once()
+        pool.wait_closed.assert_awaited_once()
+        assert DatabaseConnection._pool is None
+        assert DatabaseConnection._keepalive_task is None
+        await asyncio.gather(keepalive_task, return_exceptions=True)
+        assert keepalive_task.cancelled()
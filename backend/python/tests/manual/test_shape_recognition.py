@@ -37,11 +37,9 @@ import uuid
 import json
 import logging
 from datetime import datetime
-from typing import Dict, Any, Optional
-import os
-from pathlib import Path
-from dataclasses import dataclass
-from typing import List, Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+
+import numpy as np
 
 from src.database.repositories.drawings_repository import DrawingsRepository
 from src.database.repositories.shape_repository import ShapeRepository
@@ -49,35 +47,55 @@ from src.database.repositories.features_repository import FeaturesRepository
 from src.database.repositories.results_repository import ResultsRepository
 from src.database.repositories.result_details_repository import ResultDetailsRepository
 from src.features.feature_extractor import FeatureExtractor
+from src.proto.drawing_pb2 import DrawingData, Color
+from src.ai_service.batch import BatchProcessor
 from src.ai_service.service_manager import AIServiceManager
 from src.database.connection import DatabaseConnection
+from src.utils import json_io
+from src.utils.ttl_cache import async_ttl_cache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-
-@dataclass
-class Position:
-    x: float
-    y: float
-    z: float
-
-
-@dataclass
-class DrawLine:
-    positions: List[Position]
-    width: float
-    color: Optional[Dict[str, float]]
-
-
-@dataclass
-class DrawingData:
-    draw_lines: List[DrawLine]
-    center: Position
+# run_batchで結果をまとめて保存する描画データの件数
+SAVE_BATCH_SIZE = 10
+# run_batchで同時に処理する描画データの最大数（コネクションプールを使い切らないように制限する）
+MAX_CONCURRENCY = 8
+
+# Lineメッセージのpositions（Vector3Proto）1件分のバイト列の構造（タグ・長さ・(タグ・float32)×3の17バイト）
+# 0の座標も省略せずに書き込むが、protobufのパーサーはそのまま読み込める
+_POSITION_RECORD = np.dtype([
+    ("tag", "u1"), ("size", "u1"),
+    ("x_tag", "u1"), ("x", "<f4"),
+    ("y_tag", "u1"), ("y", "<f4"),
+    ("z_tag", "u1"), ("z", "<f4"),
+])
+# 各項目の値（positions: フィールド1の埋め込みメッセージ、x・y・z: フィールド1〜3のfloat）
+_POSITION_TAGS = {"tag": 0x0A, "size": 15, "x_tag": 0x0D, "y_tag": 0x15, "z_tag": 0x1D}
+
+
+def _positions_to_bytes(positions: List[Dict[str, float]]) -> bytes:
+    """点列をLineメッセージのpositionsフィールドのバイト列に変換
+    float32の配列からまとめてシリアライズし、点ごとのVector3Protoの生成を避ける
+    """
+    pts = np.array([(p["x"], p["y"], p["z"]) for p in positions], dtype=np.float32)
+    records = np.empty(len(pts), dtype=_POSITION_RECORD)
+    for name, value in _POSITION_TAGS.items():
+        records[name] = value
+    records["x"] = pts[:, 0]
+    records["y"] = pts[:, 1]
+    records["z"] = pts[:, 2]
+    return records.tobytes()
 
 
 class ShapeRecognitionTester:
-    def __init__(self):
+    def __init__(self, rollback: bool = False):
+        """
+        Args:
+            rollback (bool): Trueの場合は描画データごとにトランザクション内で処理し、
+                書き込みをロールバックする（繰り返し実行してもDBに結果が残らない）
+        """
+        self.rollback = rollback
         self.drawings_repository = DrawingsRepository()
         self.shape_repository = ShapeRepository()
         self.features_repository = FeaturesRepository()
@@ -86,60 +104,100 @@ class ShapeRecognitionTester:
         self.feature_extractor = FeatureExtractor()
 
     async def setup(self):
-        """AIサービスマネージャーの初期化"""
+        """AIサービスマネージャーとコネクションプールの初期化
+        各リポジトリはDatabaseConnectionのプールを共有するため、最初の処理の前に一度だけ作成しておく
+        シーンごとの利用可能な形状も実行中は変わらないため、ここでまとめて読み込む
+        """
         self.ai_service_manager = await AIServiceManager.create()
-
-    def _convert_to_drawing_data(self, db_data: Dict[str, Any]) -> DrawingData:
-        """データベースから取得したデータを DrawingData 形式に変換"""
+        if self.rollback:
+            # AIサービスの判定結果・エラーログもロールバックされるよう、キューを使わずトランザクション内で保存する
+            for service in self.ai_service_manager.services.values():
+                service.write_through = True
+        await DatabaseConnection.get_pool()
+        self._shapes_by_scene = await self.shape_repository.get_shapes_by_scene()
+
+    # 同じdrawing_idを繰り返し処理する場合に、描画データの取得を1回にする（描画データは更新されない）
+    @async_ttl_cache(maxsize=256, ttl=3600)
+    async def _get_drawing(self, drawing_id: str) -> Optional[Dict[str, Any]]:
+        """描画データを取得（結果をキャッシュ）"""
+        return await self.drawings_repository.get_drawing(drawing_id)
+
+    def _convert_to_drawing_data(self, drawing_id: str, db_data: Dict[str, Any]):
+        """データベースから取得したデータを DrawingData（Protoメッセージ）に変換
+        特徴量の抽出とAI処理で同じメッセージを使い、draw_linesの走査を1回にする
+        """
         draw_lines_data = (
-            json.loads(db_data["draw_lines"])
-            if isinstance(db_data["draw_lines"], str)
+            json_io.loads(db_data["draw_lines"])
+            if isinstance(db_data["draw_lines"], (str, bytes))
             else db_data["draw_lines"]
         )
 
-        draw_lines = []
-        for line in draw_lines_data:
-            positions = [
-                Position(x=float(pos["x"]), y=float(pos["y"]), z=float(pos["z"]))
-                for pos in line["positions"]
-            ]
-
-            color = line.get("color")
-            if color:
-                color = {
-                    "r": float(color["r"]),
-                    "g": float(color["g"]),
-                    "b": float(color["b"]),
-                    "a": float(color.get("a", 1.0)),
-                }
-
-            draw_lines.append(
-                DrawLine(positions=positions, width=float(line.get("width", 1.0)), color=color)
+        drawing_data = DrawingData()
+        drawing_data.drawing_id = drawing_id
+        drawing_data.scene_id = db_data["scene_id"]
+        drawing_data.draw_timestamp = db_data["draw_timestamp"]
+        drawing_data.center.x = db_data["center_x"]
+        drawing_data.center.y = db_data["center_y"]
+        drawing_data.center.z = db_data["center_z"]
+        drawing_data.use_ai = True
+        drawing_data.client_id = db_data.get("client_id", "")
+
+        for line_data in draw_lines_data:
+            color_data = line_data.get("color")
+            line = drawing_data.draw_lines.add(
+                width=line_data.get("width", 1.0),
+                color=Color(
+                    r=color_data["r"],
+                    g=color_data["g"],
+                    b=color_data["b"],
+                    a=color_data.get("a", 1.0),
+                ) if color_data else None,
             )
-
-        center = Position(
-            x=float(db_data["center_x"]), y=float(db_data["center_y"]), z=float(db_data["center_z"])
-        )
-
-        return DrawingData(draw_lines=draw_lines, center=center)
-
-    async def process_drawing(self, drawing_id: str) -> Optional[Dict[str, Any]]:
+            if line_data["positions"]:
+                line.MergeFromString(_positions_to_bytes(line_data["positions"]))
+
+        return drawing_data
+
+    async def process_drawing(
+        self, drawing_id: str, pending: Optional[List[Dict[str, Any]]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """描画データの形状認識を実行し、結果を保存
+
+        Args:
+            drawing_id (str): 描画ID
+            pending (Optional[List[Dict[str, Any]]]): 指定した場合は結果を保存せず、
+                {"result": ..., "detail": ...}を追加する（run_batchでまとめて保存する）
+        Returns:
+            Optional[Dict[str, Any]]: 処理結果の概要（失敗した場合はNone）
+        """
+        if self.rollback:
+            # ロールバックする書き込みはまとめる必要がないため、トランザクション内で直接保存する
+            # （AIサービスの書き込みもsetupでwrite_throughにしてトランザクション内で行う）
+            async with DatabaseConnection.transaction(rollback=True):
+                return await self._process_drawing(drawing_id)
+        return await self._process_drawing(drawing_id, pending)
+
+    async def _process_drawing(
+        self, drawing_id: str, pending: Optional[List[Dict[str, Any]]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """process_drawingの処理本体"""
         try:
             # 描画データを取得
-            db_drawing_data = await self.drawings_repository.get_drawing(drawing_id)
+            db_drawing_data = await self._get_drawing(drawing_id)
             if not db_drawing_data:
                 logger.error(f"Drawing not found: {drawing_id}")
                 return None
 
-            # FeatureExtractor用のデータ形式に変換
-            converted_data = self._convert_to_drawing_data(db_drawing_data)
+            # drawing_dataをProtoメッセージとして作成（特徴量の抽出にも使用）
+            drawing_data = self._convert_to_drawing_data(drawing_id, db_drawing_data)
 
             # 特徴量を抽出
-            features = self.feature_extractor.extract_features(converted_data)
+            features = await self.feature_extractor.extract_features(drawing_data)
 
-            # 特徴量を保存
+            # 特徴量の保存とAI処理を並行実行
             feature_id = str(uuid.uuid4())
-            await self.features_repository.insert_features(
+            result_id = str(uuid.uuid4())
+            save_features = self.features_repository.insert_features(
                 {
                     "feature_id": feature_id,
                     "drawing_id": drawing_id,
@@ -148,45 +206,14 @@ class ShapeRecognitionTester:
                     "features": features,
                 }
             )
+            if self.rollback:
+                # トランザクションの接続は開始したタスクでしか使えないため、別タスクにせず先に保存する
+                await save_features
+                save_task = None
+            else:
+                save_task = asyncio.create_task(save_features)
 
-            # シーンで利用可能な形状を取得
-            shapes = await self.shape_repository.get_available_shapes(db_drawing_data["scene_id"])
-
-            # drawing_dataをProtoメッセージとして作成
-            from src.proto.drawing_pb2 import DrawingData, Vector3Proto, Line, Color
-
-            drawing_data = DrawingData()
-            drawing_data.drawing_id = drawing_id
-            drawing_data.scene_id = db_drawing_data["scene_id"]
-            drawing_data.draw_timestamp = db_drawing_data["draw_timestamp"]
-            drawing_data.center.x = db_drawing_data["center_x"]
-            drawing_data.center.y = db_drawing_data["center_y"]
-            drawing_data.center.z = db_drawing_data["center_z"]
-            drawing_data.use_ai = True
-            drawing_data.client_id = db_drawing_data.get("client_id", "")
-
-            draw_lines_data = (
-                json.loads(db_drawing_data["draw_lines"])
-                if isinstance(db_drawing_data["draw_lines"], str)
-                else db_drawing_data["draw_lines"]
-            )
-            for line_data in draw_lines_data:
-                line = Line()
-                for pos_data in line_data["positions"]:
-                    pos = Vector3Proto()
-                    pos.x = pos_data["x"]
-                    pos.y = pos_data["y"]
-                    pos.z = pos_data["z"]
-                    line.positions.append(pos)
-                line.width = line_data.get("width", 1.0)
-                if line_data.get("color"):
-                    color = Color()
-                    color.r = line_data["color"]["r"]
-                    color.g = line_data["color"]["g"]
-                    color.b = line_data["color"]["b"]
-                    color.a = line_data["color"].get("a", 1.0)
-                    line.color.CopyFrom(color)
-                drawing_data.draw_lines.append(line)
+            shapes = self._shapes_by_scene.get(db_drawing_data["scene_id"], [])
 
             # AI処理を実行
             start_time = datetime.now()
@@ -194,23 +221,19 @@ class ShapeRecognitionTester:
                 drawing_data, shapes, features
             )
             process_time = (datetime.now() - start_time).total_seconds() * 1000
+            if save_task is not None:
+                await save_task
 
             if not ai_result:
                 logger.error("No AI result")
                 return None
 
-            # resultsテーブルに保存
-            result_id = str(uuid.uuid4())
-            await self.results_repository.insert_result(
-                {
-                    "result_id": result_id,
-                    "drawing_id": drawing_id,
-                    "shape_id": ai_result.shape_id,
-                    "success": ai_result.success,
-                }
-            )
-
-            # result_detailsテーブルに保存
+            result = {
+                "result_id": result_id,
+                "drawing_id": drawing_id,
+                "shape_id": ai_result.shape_id,
+                "success": ai_result.success,
+            }
             api_response = {
                 "shape_id": ai_result.shape_id,
                 "score": ai_result.score,
@@ -220,22 +243,27 @@ class ShapeRecognitionTester:
                 "error_message": ai_result.error_message,
             }
 
-            await self.result_details_repository.insert_detail(
-                {
-                    "result_id": result_id,
-                    "drawing_id": drawing_id,
-                    "scene_id": db_drawing_data["scene_id"],
-                    "shape_id": ai_result.shape_id,
-                    "success": ai_result.success,
-                    "score": ai_result.score,
-                    "reasoning": ai_result.reasoning,
-                    "process_time_ms": int(process_time),
-                    "model_name": ai_result.model_name,
-                    "api_response": api_response,
-                    "error_message": ai_result.error_message,
-                    "client_id": db_drawing_data.get("client_id"),
-                }
-            )
+            detail = {
+                "result_id": result_id,
+                "drawing_id": drawing_id,
+                "scene_id": db_drawing_data["scene_id"],
+                "shape_id": ai_result.shape_id,
+                "success": ai_result.success,
+                "score": ai_result.score,
+                "reasoning": ai_result.reasoning,
+                "process_time_ms": int(process_time),
+                "model_name": ai_result.model_name,
+                "api_response": api_response,
+                "error_message": ai_result.error_message,
+                "client_id": db_drawing_data.get("client_id"),
+            }
+
+            if pending is not None:
+                pending.append({"result": result, "detail": detail})
+            else:
+                # resultsテーブルに保存（result_detailsが外部キーで参照するため先に保存する）
+                await self.results_repository.insert_result(result)
+                await self.result_details_repository.insert_detail(detail)
 
             return {
                 "result_id": result_id,
@@ -249,35 +277,86 @@ class ShapeRecognitionTester:
             logger.error(f"Error processing drawing {drawing_id}: {e}")
             raise
 
+    async def _flush(self, pending: List[Dict[str, Any]]) -> None:
+        """溜めた結果をまとめて保存（result_detailsが外部キーで参照するためresultsを先に保存する）"""
+        if not pending:
+            return
+        # 保存中に他のタスクが追加した結果を消さないよう、先にリストから取り出す
+        batch = pending[:]
+        pending.clear()
+        await self.results_repository.insert_results([p["result"] for p in batch])
+        await self.result_details_repository.insert_details([p["detail"] for p in batch])
+
+    async def run_batch(self, drawing_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """複数の描画データを最大MAX_CONCURRENCY件ずつ並行して処理し、
+        結果をSAVE_BATCH_SIZE件ごとにまとめて保存
+
+        Args:
+            drawing_ids (List[str]): 描画IDのリスト
+        Returns:
+            List[Optional[Dict[str, Any]]]: 描画IDごとの処理結果の概要（失敗した場合はNone）
+        """
+        pending: List[Dict[str, Any]] = []
+        batch_processor = BatchProcessor(max_concurrency=MAX_CONCURRENCY)
+
+        async def process(drawing_id: str) -> Optional[Dict[str, Any]]:
+            logger.info(f"Processing drawing: {drawing_id}")
+            result = await self.process_drawing(drawing_id, pending)
+            if len(pending) >= SAVE_BATCH_SIZE:
+                await self._flush(pending)
+            return result
+
+        try:
+            # 1件の失敗で他の描画データの処理を止めないよう、例外も結果として受け取る
+            outcomes = await batch_processor.run_batch(process, drawing_ids)
+        finally:
+            # 途中で失敗した場合も、それまでの結果は保存する
+            await self._flush(pending)
+
+        results = []
+        for drawing_id, outcome in zip(drawing_ids, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.error(f"Error processing drawing {drawing_id}: {outcome}")
+                outcome = None
+            results.append(outcome)
+        return results
+
 
 async def main():
     """メイン処理"""
-    # コマンドライン引数からdrawing_idを取得
+    # コマンドライン引数からdrawing_idを取得（複数指定した場合は結果をまとめて保存）
     import sys
 
-    if len(sys.argv) != 2:
-        print("Usage: python test_shape_recognition.py <drawing_id>")
-        sys.exit(1)
+    # --rollbackを指定した場合は結果を保存せずに実行する
+    rollback = "--rollback" in sys.argv[1:]
+    drawing_ids = [arg for arg in sys.argv[1:] if arg != "--rollback"]
 
-    drawing_id = sys.argv[1]
+    if not drawing_ids:
+        print("Usage: python test_shape_recognition.py [--rollback] <drawing_id> [<drawing_id> ...]")
+        sys.exit(1)
 
+    # テスター初期化
+    tester = ShapeRecognitionTester(rollback=rollback)
     try:
-        # テスター初期化
-        tester = ShapeRecognitionTester()
         await tester.setup()
 
         # 指定されたdrawing_idの処理
-        logger.info(f"Processing drawing: {drawing_id}")
-        result = await tester.process_drawing(drawing_id)
-
-        if result:
-            logger.info(f"Result: {json.dumps(result, indent=2)}")
+        if len(drawing_ids) == 1:
+            logger.info(f"Processing drawing: {drawing_ids[0]}")
+            results = [await tester.process_drawing(drawing_ids[0])]
         else:
-            logger.error(f"Failed to process drawing: {drawing_id}")
+            results = await tester.run_batch(drawing_ids)
+
+        for drawing_id, result in zip(drawing_ids, results):
+            if result:
+                logger.info(f"Result: {json.dumps(result, indent=2)}")
+            else:
+                logger.error(f"Failed to process drawing: {drawing_id}")
 
     except Exception as e:
         logger.error(f"Error: {e}")
     finally:
+        tester.feature_extractor.close()
         # データベース接続をクローズ
         await DatabaseConnection.close_pool()
 
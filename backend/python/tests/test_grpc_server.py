@@ -1,97 +1,142 @@
 # tests/grpc/test_grpc_server.py
 
+import os
 import pytest
 import uuid
-from unittest.mock import AsyncMock, patch, MagicMock
+from unittest.mock import AsyncMock, patch
 
-from src.proto.drawing_pb2 import GeneratedObject
+from src.proto.drawing_pb2 import ShapeRecognitionServer
 from src.proto.drawing_pb2 import (
     DrawingData, ClientInfo, Vector3Proto, Line, Color
     )
 from src.grpc_server import GrpcService
-
-
-class TestGrpcService:
-    @pytest.fixture
-    def mock_ai_service_manager(self):
-        mock_manager = AsyncMock()
-        mock_manager.process_drawing.return_value = GeneratedObject(
+from src.ai_service.service_manager import AIServiceManager
+from src.database.repositories.drawings_repository import DrawingsRepository
+from src.database.repositories.features_repository import FeaturesRepository
+from src.database.repositories.scene_repository import SceneRepository
+from src.database.repositories.shape_repository import ShapeRepository
+from src.features.feature_extractor import FeatureExtractor
+
+
+# テスト用の描画データ（各テストではコピーを使用する）
+_BASE_DRAWING = DrawingData(
+    drawing_id=str(uuid.uuid4()),
+    draw_timestamp=1705708800000,
+    scene_id="test_scene",  # 存在するシーンIDを指定
+    client_id="test_client",
+    client_info=ClientInfo(
+        type=ClientInfo.ClientType.DEVELOPMENT,
+        device_id="test_device",
+        device_name="Test Device",
+        system_info="Test System",
+        app_version="1.0.0",
+    ),
+    center=Vector3Proto(x=0.0, y=0.0, z=0.0),
+    draw_lines=[
+        Line(
+            positions=[Vector3Proto(x=0.0, y=0.0, z=0.0)],
+            width=0.1,
+            color=Color(r=1.0, g=0.0, b=0.0, a=1.0),
+        )
+    ],
+    metadata={"tag": "test"},
+    use_ai=True,
+)
+
+# 認識結果の形状情報（スコアが閾値以上の場合にプレハブ名が返される）
+_SHAPE_INFO = {"prefab_name": "test_prefab", "threshold": 80}
+
+
+# 以下のモックはクラス内のテストで共有し、呼び出し履歴はTestGrpcService._resetでリセットする
+@pytest.fixture(scope="class")
+def mock_ai_service_manager():
+    """ モック化されたAIServiceManagerを作成 """
+    mock_manager = AsyncMock(spec=AIServiceManager)
+    mock_manager.configure_mock(**{
+        "process_drawing.return_value": ShapeRecognitionServer(
             success=True,
-            object_id=str(uuid.uuid4()),
+            result_id=str(uuid.uuid4()),
             shape_id="test_shape",
             prefab_name="test_prefab",
-            score=0.95,
+            score=95,
             reasoning="Test reasoning"
-        )
-        return mock_manager
+        ),
+    })
+    return mock_manager
+
+
+@pytest.fixture(scope="class")
+def mock_drawings_repository():
+    """ モック化されたDrawingsRepositoryを作成 """
+    mock_repo = AsyncMock(spec=DrawingsRepository)
+    mock_repo.configure_mock(**{
+        "insert_drawings.return_value": str(uuid.uuid4()),
+    })
+    return mock_repo
+
+
+@pytest.fixture(scope="class")
+def mock_shape_repository():
+    """ モック化されたShapeRepositoryを作成 """
+    mock_repo = AsyncMock(spec=ShapeRepository)
+    mock_repo.configure_mock(**{
+        "get_available_shapes.return_value": [{"shape_id": "test_shape"}],
+        "get_shape_info_by_id.return_value": _SHAPE_INFO,
+    })
+    return mock_repo
+
+
+@pytest.fixture(scope="class")
+def mock_scene_repository():
+    """ モック化されたSceneRepositoryを作成 """
+    mock_repo = AsyncMock(spec=SceneRepository)
+    mock_repo.configure_mock(**{
+        "get_scene_by_id.return_value": {
+            "id": "test_scene",
+            "name_ja": "テストシーン",
+        },
+    })
+    return mock_repo
 
-    @pytest.fixture
-    def grpc_service(self, mock_drawings_repository, mock_ai_service_manager):
-        """GrpcServiceのインスタンスを作成"""
-        service = GrpcService()
-        service.repository = mock_drawings_repository
-        service.ai_service_manager = mock_ai_service_manager
-        return service
 
-    @pytest.fixture
-    def mock_drawings_repository(self):
-        """ モック化されたDrawingsRepositoryを作成 """
-        mock_repo = MagicMock()
-        # check_connectionメソッドを追加
-        mock_repo.check_connection.return_value = True
-        # insert_drawingsメソッドを追加
-        mock_repo.insert_drawings.return_value = str(uuid.uuid4())
-        # insert_resultメソッドを追加
-        mock_repo.insert_result.return_value = str(uuid.uuid4())
-
-        return mock_repo
+@pytest.fixture(scope="class")
+def feature_extractor():
+    """ クラスで共有する特徴量抽出器 """
+    extractor = FeatureExtractor()
+    yield extractor
+    extractor.close()
 
-    @pytest.fixture
-    def mock_scene_repository(self):
-        """ モック化されたSceneRepositoryを作成 """
-        mock_repo = MagicMock()
-        mock_repo.get_scene_by_id.return_value = {
-            "id": "test_scene",
-            "name_ja": "テストシーン",
-        }
-        return mock_repo
+
+class TestGrpcService:
+    @pytest.fixture(autouse=True)
+    def _reset(self, mock_drawings_repository, mock_shape_repository, mock_ai_service_manager):
+        """ クラスで共有するモックの呼び出し履歴を各テスト後にリセット """
+        yield
+        mock_drawings_repository.reset_mock()
+        mock_shape_repository.reset_mock()
+        mock_ai_service_manager.reset_mock()
 
     @pytest.fixture
-    def grpc_service(self, mock_drawings_repository):
+    def grpc_service(
+        self, mock_drawings_repository, mock_shape_repository, mock_ai_service_manager, feature_extractor
+    ):
         """ GrpcServiceのインスタンスを作成 """
-        # リポジトリを直接注入
+        # リポジトリとAIサービスマネージャーを直接注入
         service = GrpcService()
-        service.repository = mock_drawings_repository
+        service.drawings_repository = mock_drawings_repository
+        service.shape_repository = mock_shape_repository
+        service.features_repository = AsyncMock(spec=FeaturesRepository)
+        service.feature_extractor = feature_extractor
+        service.ai_service_manager = mock_ai_service_manager
         return service
 
     @pytest.fixture
     def sample_drawing_data(self):
-        """ テスト用の描画データを生成 """
-        return DrawingData(
-            uuid=str(uuid.uuid4()),
-            timestamp=1705708800000,
-            scene_id="test_scene",  # 存在するシーンIDを指定
-            client_id="test_client",
-            client_info=ClientInfo(
-                type=ClientInfo.ClientType.DEVELOPMENT,
-                device_id="test_device",
-                device_name="Test Device",
-                system_info="Test System",
-                app_version="1.0.0",
-            ),
-            center=Vector3Proto(x=0.0, y=0.0, z=0.0),
-            draw_lines=[
-                Line(
-                    positions=[Vector3Proto(x=0.0, y=0.0, z=0.0)],
-                    width=0.1,
-                    color=Color(r=1.0, g=0.0, b=0.0, a=1.0),
-                )
-            ],
-            metadata={"tag": "test"},
-            ai_processing=True,
-        )
+        """ テスト用の描画データを生成（作成済みのメッセージをコピー） """
+        drawing_data = DrawingData()
+        drawing_data.CopyFrom(_BASE_DRAWING)
+        return drawing_data
 
-    @pytest.mark.asyncio
     async def test_upload_drawing_success(
         self,
         grpc_service,
@@ -118,17 +163,15 @@ class TestGrpcService:
 
             assert response.success is True
             assert response.upload_id != ""
-            mock_drawings_repository.insert_drawings.assert_called_once()
+            mock_drawings_repository.insert_drawings.assert_awaited_once()
 
-    @pytest.mark.asyncio
     async def test_process_drawing_success(
-        self, grpc_service, mock_drawings_repository, sample_drawing_data
+        self, grpc_service, mock_ai_service_manager, sample_drawing_data
     ):
         """ 描画データの処理成功テスト
         - AI処理が正常に実行されること
-        - 処理結果のGeneratedObjectが返されること
-        - 推論された形状タイプが正確であること
-        - 信頼度スコアが期待値に近いこと
+        - 閾値以上のスコアで認識された形状のプレハブ名が返されること
+        - 特徴量が保存されること
         """
         mock_context = AsyncMock()
 
@@ -138,19 +181,20 @@ class TestGrpcService:
             )
 
         assert response.success is True
-        assert response.shape_id == "test_shape"
-        assert pytest.approx(response.score, 0.05) == 0.95
+        assert response.drawing_id == sample_drawing_data.drawing_id
+        assert response.prefab_name == _SHAPE_INFO["prefab_name"]
+        mock_ai_service_manager.process_drawing.assert_awaited_once()
+        grpc_service.features_repository.insert_features.assert_awaited_once()
 
-    @pytest.mark.asyncio
     async def test_process_drawing_ai_processing_disabled(
-        self, grpc_service, sample_drawing_data
+        self, grpc_service, mock_ai_service_manager, sample_drawing_data
     ):
         """ AI処理が無効な場合のテスト
         - AI処理がスキップされること
         - メソッドが何も返さないこと（Noneを返すこと）
         """
         mock_context = AsyncMock()
-        sample_drawing_data.ai_processing = False
+        sample_drawing_data.use_ai = False
 
         response = await grpc_service.ProcessDrawing(
             sample_drawing_data,
@@ -158,31 +202,33 @@ class TestGrpcService:
             )
 
         assert response is None
+        mock_ai_service_manager.process_drawing.assert_not_called()
 
-    @pytest.mark.asyncio
-    async def test_process_drawing_with_ai(
-            self,
-            grpc_service,
-            sample_drawing_data
-            ):
+    @pytest.mark.skipif(
+        not os.getenv("RUN_AI_TESTS"),
+        reason="実際のAI APIとデータベースを使用するため、RUN_AI_TESTSを設定した場合のみ実行",
+    )
+    async def test_process_drawing_with_ai(self, sample_drawing_data):
         """実際のAI処理を含む描画データの処理テスト
         - AI処理が正常に実行されること
-        - AIが適切な形状を認識すること
-        - 結果がデータベースに保存されること
+        - AIが認識した形状のレスポンスが返されること
         """
         mock_context = AsyncMock()
+        grpc_service = await GrpcService.create()
 
-        response = await grpc_service.ProcessDrawing(
-            sample_drawing_data,
-            mock_context
-            )
+        try:
+            response = await grpc_service.ProcessDrawing(
+                sample_drawing_data,
+                mock_context
+                )
+        finally:
+            await grpc_service.ai_service_manager.close()
+            grpc_service.feature_extractor.close()
 
         assert response.success is True
-        assert response.shape_id in ["円・丸", "四角", "三角"]  # 期待される形状
-        assert 0 <= response.score <= 100
-        assert response.reasoning != ""
+        assert response.drawing_id == sample_drawing_data.drawing_id
+        assert response.prefab_name != ""
 
-    @pytest.mark.asyncio
     async def test_process_drawing_ai_error(
             self,
             grpc_service,
@@ -192,8 +238,8 @@ class TestGrpcService:
         mock_context = AsyncMock()
 
         # モックを設定
-        mock_ai_service_manager = AsyncMock()
-        mock_ai_service_manager.process_drawing.return_value = None
+        mock_ai_service_manager = AsyncMock(spec=AIServiceManager)
+        mock_ai_service_manager.configure_mock(**{"process_drawing.return_value": None})
         grpc_service.ai_service_manager = mock_ai_service_manager
 
         response = await grpc_service.ProcessDrawing(
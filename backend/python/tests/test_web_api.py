@@ -1,143 +1,299 @@
 # tests/web_api/test_web_api.py
 
 import uuid
-from unittest.mock import patch
-from aiohttp.test_utils import AioHTTPTestCase
-
-from src.web_api import WebAPI
-
-
-class TestWebAPI(AioHTTPTestCase):
-    def assertMockPatched(self, target, *args, **kwargs):
-        """ モックパッチのためのコンテキストマネージャ """
-        return patch(target, *args, **kwargs)
-
-    async def get_application(self):
-        """ テスト用のWebアプリケーションを取得 """
-        self.web_api = WebAPI()
-        return self.web_api.app
-
-    async def test_fetch_drawings_success(self):
-        """ 描画データ一覧取得の成功テスト
-        - HTTPステータスコードが200であること
-        - レスポンスのsuccessフラグがTrueであること
-        - 取得したデータ件数が1件であること
-        - 取得したデータのIDが期待値と一致すること
-        """
-        # モックデータの準備
-        mock_drawings = [
-            {
-                "id": str(uuid.uuid4()),
-                "draw_timestamp": 1705708800000,
-                "created_at": "2024-01-21T00:00:00",
-                "ai_processing": True,
-                "processed": False,
-                "shape_id": "test_shape",
-            }
-        ]
-
-        # DrawingsRepositoryのget_drawingsをモック
-        with self.assertMockPatched(
-            "src.web_api.DrawingsRepository.get_drawings",
-            return_value=mock_drawings
-        ):
-
-            # GETリクエストを送信
-            resp = await self.client.request("GET", "/api/drawings")
-
-            # レスポンスの検証
-            self.assertEqual(resp.status, 200)
-            data = await resp.json()
-
-            self.assertTrue(data["success"])
-            self.assertEqual(len(data["data"]), 1)
-            self.assertEqual(data["data"][0]["id"], mock_drawings[0]["id"])
-
-    async def test_fetch_drawing_success(self):
-        """ 特定の描画データ取得の成功テスト
-        - HTTPステータスコードが200であること
-        - レスポンスのsuccessフラグがTrueであること
-        - 取得したデータ件数が1件であること
-        - 取得したデータのIDが期待値と一致すること
-        """
-        # モックデータの準備
-        test_drawing_id = str(uuid.uuid4())
-        mock_drawing = {
-            "id": test_drawing_id,
-            "draw_timestamp": 1705708800000,
-            "data": {"draw_lines": []},
-            "center_x": 0.0,
-            "center_y": 0.0,
-            "center_z": 0.0,
-            "shape_id": "test_shape",
-            "confidence_score": 0.95,
-            "reasoning": "Test reasoning",
-        }
-
-        # DrawingsRepositoryのget_drawingをモック
-        with self.assertMockPatched(
-            "src.web_api.DrawingsRepository.get_drawing",
-            return_value=mock_drawing
-        ):
-
-            # GETリクエストを送信
-            resp = await self.client.request(
-                "GET",
-                f"/api/drawings/{test_drawing_id}"
-                )
-
-            # レスポンスの検証
-            self.assertEqual(resp.status, 200)
-            data = await resp.json()
-
-            self.assertTrue(data["success"])
-            self.assertEqual(data["data"]["id"], test_drawing_id)
-            self.assertEqual(data["data"]["shape_id"], "test_shape")
-
-    async def test_fetch_drawing_not_found(self):
-        """ 存在しない描画データ取得のテスト
-        - HTTPステータスコードが404であること
-        - レスポンスのsuccessフラグがFalseであること
-        - エラーメッセージに「Drawing not found」が含まれること
-        """
-        # DrawingsRepositoryのget_drawingをモック
-        test_drawing_id = str(uuid.uuid4())
-        with self.assertMockPatched(
-            "src.web_api.DrawingsRepository.get_drawing",
-            return_value=None
-        ):
-
-            # GETリクエストを送信
-            resp = await self.client.request(
-                "GET",
-                f"/api/drawings/{test_drawing_id}"
-                )
-
-            # レスポンスの検証
-            self.assertEqual(resp.status, 404)
-            data = await resp.json()
-
-            self.assertFalse(data["success"])
-            self.assertIn("Drawing not found", data["error"])
-
-    async def test_fetch_drawings_repository_error(self):
-        """ リポジトリでのエラー発生時のテスト
-        - HTTPステータスコードが500であること
-        - レスポンスのsuccessフラグがFalseであること
-        - エラーメッセージに「Database error」が含まれること
-        """
-        # DrawingsRepositoryのget_drawingsをモック
-        with self.assertMockPatched(
-            "src.web_api.DrawingsRepository.get_drawings",
-            side_effect=Exception("Database error"),
-        ):
-
-            # GETリクエストを送信
-            resp = await self.client.request("GET", "/api/drawings")
-
-            # レスポンスの検証
-            self.assertEqual(resp.status, 500)
-            data = await resp.json()
-
-            self.assertFalse(data["success"])
-            self.assertIn("Database error", data["error"])
+from contextlib import contextmanager
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.abc import AbstractStreamWriter
+from aiohttp.test_utils import TestClient, TestServer, make_mocked_request
+
+from src.utils import json_io
+from src.web_api import STREAM_MIN_BYTES, DrawingsRepository, WebAPI
+
+# クライアントと同じイベントループでテストを実行する
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+# テストで使う描画ID（値は検証に影響しないため、import時に1回だけ生成する）
+_TEST_DRAWING_ID = str(uuid.uuid4())
+# 以下のテストデータはテスト間で共有するため、変更できない型にしておく
+# 一覧取得でDBから返される描画データ（各行はJSONに変換されるためdictのまま）
+_MOCK_DRAWINGS = (
+    {
+        "id": str(uuid.uuid4()),
+        "draw_timestamp": 1705708800000,
+        "created_at": "2024-01-21T00:00:00",
+        "ai_processing": True,
+        "processed": False,
+        "shape_id": "test_shape",
+    },
+)
+# 個別取得でDBから返される描画データ
+_MOCK_DRAWING = MappingProxyType({
+    "id": _TEST_DRAWING_ID,
+    "draw_timestamp": 1705708800000,
+    "data": {"draw_lines": []},
+    "center_x": 0.0,
+    "center_y": 0.0,
+    "center_z": 0.0,
+    "shape_id": "test_shape",
+    "confidence_score": 0.95,
+    "reasoning": "Test reasoning",
+})
+# STREAM_MIN_BYTESを超える大きいdraw_linesとそのJSON
+_LARGE_DRAW_LINES = (
+    {"positions": [{"x": 0.1, "y": 0.2, "z": 0.3}] * 1000, "width": 1.0},
+) * 50
+_LARGE_DRAW_LINES_JSON = json_io.dumps(_LARGE_DRAW_LINES).encode()
+
+
+class _BufferWriter(AbstractStreamWriter):
+    """ レスポンスをソケットに送らずメモリに溜めるライター """
+
+    def __init__(self):
+        self.buffer_size = 0
+        self.output_size = 0
+        self.length = 0
+        self.chunks = []
+
+    async def write(self, chunk) -> None:
+        self.chunks.append(bytes(chunk))
+
+    async def write_eof(self, chunk: bytes = b"") -> None:
+        if chunk:
+            self.chunks.append(bytes(chunk))
+
+    async def drain(self) -> None:
+        pass
+
+    def enable_compression(self, encoding: str = "deflate", strategy=None) -> None:
+        pass
+
+    def enable_chunking(self) -> None:
+        pass
+
+    async def write_headers(self, status_line: str, headers) -> None:
+        pass
+
+    def send_headers(self) -> None:
+        pass
+
+
+async def call_handler(
+    handler: Callable[[web.Request], Awaitable[web.StreamResponse]],
+    path: str,
+    match_info: Optional[Dict[str, str]] = None,
+) -> Tuple[int, bytes]:
+    """ ルーティングやTCPを使わずにハンドラを直接呼び出し、ステータスとボディを返す
+
+    Args:
+        handler (Callable[[web.Request], Awaitable[web.StreamResponse]]): WebAPIのハンドラ
+        path (str): リクエストパス
+        match_info (Optional[Dict[str, str]]): パスパラメータ
+    Returns:
+        Tuple[int, bytes]: ステータスコードとレスポンスボディ
+    """
+    writer = _BufferWriter()
+    request = make_mocked_request("GET", path, match_info=match_info or {}, writer=writer)
+    response = await handler(request)
+    if not response.prepared:
+        await response.prepare(request)
+        await response.write_eof()
+    return response.status, b"".join(writer.chunks)
+
+
+@pytest.fixture(scope="session")
+def web_api():
+    """ テスト全体で共有するWebアプリケーション
+    リポジトリのメソッドはクラス属性を差し替えるため、アプリケーションを共有しても各テストの設定が使われる
+    """
+    return WebAPI()
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def client(web_api):
+    """ 実際のHTTP通信で確認するテスト用のクライアント """
+    async with TestClient(TestServer(web_api.app)) as client:
+        yield client
+
+
+@contextmanager
+def swap(obj: Any, attr: str, value: Any):
+    """ 属性を一時的に差し替える（戻り値が固定のメソッドにMagicMockは不要なため） """
+    old = getattr(obj, attr)
+    setattr(obj, attr, value)
+    try:
+        yield
+    finally:
+        setattr(obj, attr, old)
+
+
+async def _iterate(items):
+    """ リストを非同期イテレータに変換 """
+    for item in items:
+        yield item
+
+
+def _yields(items):
+    """ 非同期イテレータでitemsを返すメソッドを作成 """
+    def method(self, *args, **kwargs):
+        return _iterate(items)
+    return method
+
+
+def _returns(value):
+    """ valueを返すコルーチンのメソッドを作成
+    ハンドラは取得したdictを変更するため、DBと同じく呼び出しごとに新しいdictを返す
+    """
+    async def method(self, *args, **kwargs):
+        return dict(value) if value is not None else None
+    return method
+
+
+def _raises(error: Exception):
+    """ 呼び出すとerrorが発生するメソッドを作成 """
+    def method(self, *args, **kwargs):
+        raise error
+    return method
+
+
+class _Case(NamedTuple):
+    """ ハンドラのテストケース """
+    # 呼び出すWebAPIのハンドラ名とパスパラメータ
+    handler: str
+    path: str
+    match_info: Dict[str, str]
+    # 差し替えるDrawingsRepositoryのメソッド名と、差し替え後のメソッド
+    attr: str
+    method: Callable[..., Any]
+    status: int
+    # 成功時のレスポンスのdata（エラー時はNone）
+    data: Any = None
+    # エラー時のメッセージに含まれる文字列
+    error: Optional[str] = None
+
+
+_CASES = [
+    # 描画データ一覧取得の成功：取得したデータがそのまま返されること
+    _Case(
+        "fetch_drawings",
+        "/api/drawings",
+        {},
+        "iter_drawings",
+        _yields(_MOCK_DRAWINGS),
+        200,
+        data=list(_MOCK_DRAWINGS),
+    ),
+    # 特定の描画データ取得の成功：取得したデータがそのまま返されること
+    _Case(
+        "fetch_drawing",
+        f"/api/drawings/{_TEST_DRAWING_ID}",
+        {"id": _TEST_DRAWING_ID},
+        "get_drawing",
+        _returns(_MOCK_DRAWING),
+        200,
+        data=_MOCK_DRAWING,
+    ),
+    # 存在しない描画データ取得：404と「Drawing not found」が返されること
+    _Case(
+        "fetch_drawing",
+        f"/api/drawings/{_TEST_DRAWING_ID}",
+        {"id": _TEST_DRAWING_ID},
+        "get_drawing",
+        _returns(None),
+        404,
+        error="Drawing not found",
+    ),
+    # リポジトリでのエラー発生：500とエラーメッセージが返されること
+    _Case(
+        "fetch_drawings",
+        "/api/drawings",
+        {},
+        "iter_drawings",
+        _raises(Exception("Database error")),
+        500,
+        error="Database error",
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    "case",
+    _CASES,
+    ids=["fetch_drawings", "fetch_drawing", "drawing_not_found", "repository_error"],
+)
+async def test_handler(case, web_api):
+    """ ハンドラのテスト（ハンドラを直接呼び出し、ルーティングとHTTP通信は通さない）
+    - HTTPステータスコードが期待値と一致すること
+    - 成功時はsuccessフラグがTrueで、取得したデータが返されること
+    - エラー時はsuccessフラグがFalseで、エラーメッセージが含まれること
+    """
+    with swap(DrawingsRepository, case.attr, case.method):
+        status, body = await call_handler(
+            getattr(web_api, case.handler), case.path, case.match_info
+        )
+
+    assert status == case.status
+    if case.error is None:
+        data = json_io.loads(body)
+        assert data["success"] is True
+        assert data["data"] == case.data
+    else:
+        # エラー時は項目の値を確認するだけのため、JSONをパースせずに確認する
+        assert b'"success":false' in body
+        assert case.error.encode() in body
+
+
+async def test_fetch_drawings_closes_rows_on_write_error(web_api):
+    """ 一覧送信中の失敗のテスト
+    - レスポンスの送信に失敗した場合、例外が送出されること
+    - 読み残した行があっても、DBの行の取得がすぐに終了されること
+    """
+    closed = []
+
+    async def rows():
+        try:
+            for _ in range(3):
+                yield dict(_MOCK_DRAWINGS[0])
+        finally:
+            closed.append(True)
+
+    class _FailingWriter(_BufferWriter):
+        async def write(self, chunk) -> None:
+            raise ConnectionResetError("Client disconnected")
+
+    request = make_mocked_request("GET", "/api/drawings", writer=_FailingWriter())
+    with swap(DrawingsRepository, "iter_drawings", lambda self: rows()):
+        with pytest.raises(ConnectionResetError):
+            await web_api.fetch_drawings(request)
+
+    assert closed == [True]
+
+
+async def test_fetch_drawing_streams_large_draw_lines(client):
+    """ draw_linesの大きい描画データ取得のテスト（実際のHTTP通信で確認）
+    - HTTPステータスコードが200であること
+    - 分割して送信したレスポンスが正しいJSONであること
+    - draw_lines以外の項目も含まれること
+    """
+    # モックデータの準備（STREAM_MIN_BYTESを超えるdraw_lines）
+    mock_drawing = {
+        "drawing_id": _TEST_DRAWING_ID,
+        "draw_lines": _LARGE_DRAW_LINES_JSON,
+    }
+    assert len(mock_drawing["draw_lines"]) >= STREAM_MIN_BYTES
+
+    # DrawingsRepositoryのget_drawingを差し替えてGETリクエストを送信
+    with swap(DrawingsRepository, "get_drawing", _returns(mock_drawing)):
+        resp = await client.request("GET", f"/api/drawings/{_TEST_DRAWING_ID}")
+
+    # レスポンスの検証
+    assert resp.status == 200
+    data = json_io.loads(await resp.read())
+
+    assert data["success"]
+    assert data["data"]["drawing_id"] == _TEST_DRAWING_ID
+    assert data["data"]["draw_lines"] == list(_LARGE_DRAW_LINES)
@@ -32,7 +32,7 @@ CREATE TABLE IF NOT EXISTS drawings (
     drawing_id VARCHAR(36) PRIMARY KEY COMMENT '描画ID',
     scene_id VARCHAR(100) NOT NULL COMMENT 'シーンID',
     draw_timestamp BIGINT NOT NULL COMMENT '描画タイムスタンプ',
-    draw_lines JSON NOT NULL COMMENT '描画ラインデータ',
+    draw_lines MEDIUMBLOB NOT NULL COMMENT '描画ラインデータ（zstdで圧縮したJSON）',
     center_x FLOAT COMMENT '中心座標X',
     center_y FLOAT COMMENT '中心座標Y',
     center_z FLOAT COMMENT '中心座標Z',
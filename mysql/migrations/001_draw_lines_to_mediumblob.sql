@@ -0,0 +1,16 @@
+-- mysql/migrations/001_draw_lines_to_mediumblob.sql
+-- drawings.draw_lines をJSON型からMEDIUMBLOB型（zstdで圧縮したJSON）に変更する
+-- init/01_create_tables.sql は新しいボリュームでしか実行されないため、既存のデータベースにはこのスクリプトを一度だけ実行する
+--
+-- 既存の行はJSON文字列のまま（圧縮せずに）移行する
+-- 読み込み時はzstdのマジックナンバーで圧縮の有無を判定するため、移行前の行もそのまま読み込める
+
+ALTER TABLE drawings
+    ADD COLUMN draw_lines_blob MEDIUMBLOB NULL AFTER draw_lines;
+
+UPDATE drawings
+SET draw_lines_blob = CAST(draw_lines AS CHAR CHARACTER SET utf8mb4);
+
+ALTER TABLE drawings
+    DROP COLUMN draw_lines,
+    CHANGE COLUMN draw_lines_blob draw_lines MEDIUMBLOB NOT NULL COMMENT '描画ラインデータ（zstdで圧縮したJSON）';